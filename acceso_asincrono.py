@@ -0,0 +1,441 @@
+"""
+============================================================
+ACCESO ASÍNCRONO - MIDDLEWARE DE PARTICIONAMIENTO
+============================================================
+
+Versión asyncio de las operaciones del middleware, para
+usarlo dentro de un servicio web asíncrono y atender muchas
+consultas y reportes concurrentes desde un solo proceso:
+
+  • PostgreSQL con asyncpg (pool propio de conexiones)
+  • SQL Server con pyodbc en un grupo de hilos dedicado,
+    usando el pool de conexiones del middleware
+  • Las particiones de una consulta se esperan a la vez
+    (asyncio.gather) con el tiempo límite de cada una
+  • Mismo caché de resultados, mismo mapa de particiones,
+    mismas métricas y mismo SQL que la versión síncrona
+
+Sin asyncpg instalado, PostgreSQL también se atiende en el
+grupo de hilos (dependencia opcional: pip install asyncpg).
+
+    async with AccesoAsincrono() as acceso:
+        reporte = await acceso.reporte_consolidado()
+
+    python acceso_asincrono.py [--concurrencia 50]
+============================================================
+"""
+
+import asyncio
+import functools
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+import main_ministerio_actualizado as middleware
+from cache_resultados import CacheResultados
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+from metricas import METRICAS
+from registro_compacto import Credito, CreditoAnual, copiar
+from resumenes import MOTOR_PG, MOTOR_SQL, aplicar_delta, calcular_delta
+
+_SQL_INSERT = {
+    MOTOR_POSTGRESQL: (
+        f"INSERT INTO creditos_historicos ({', '.join(middleware.COLUMNAS_CREDITO)}) "
+        f"VALUES ({', '.join(['%s'] * len(middleware.COLUMNAS_CREDITO))})"
+    ),
+    MOTOR_SQLSERVER: middleware.SQL_INSERT_ACTUAL,
+}
+
+_RESUMEN_POR_MOTOR = {MOTOR_POSTGRESQL: MOTOR_PG, MOTOR_SQLSERVER: MOTOR_SQL}
+
+
+def _posicionales(sql: str) -> str:
+    """Parámetros de psycopg2 (%s) → parámetros numerados de asyncpg ($1, $2...)."""
+    numero = count(1)
+    return re.sub(r'%s', lambda _: f'${next(numero)}', sql)
+
+
+def _insertar_sincrono(particion: str, fila: Tuple):
+    """Inserción con el pool síncrono del motor (se ejecuta en el grupo de hilos)."""
+    motor = MAPA_PARTICIONES.motor(particion)
+    with middleware._POOL_POR_MOTOR[motor].conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_SQL_INSERT[motor], fila)
+        aplicar_delta(cursor, _RESUMEN_POR_MOTOR[motor], [fila])
+        conn.commit()
+        cursor.close()
+
+
+class AccesoAsincrono:
+    """
+    Operaciones del middleware como corrutinas.
+
+    Args:
+        max_conexiones_pg: Máximo de conexiones asyncpg a PostgreSQL
+        hilos: Hilos para las llamadas bloqueantes (por defecto, uno por
+               conexión posible en los pools síncronos)
+        cache: Caché de resultados (por defecto el del middleware, compartido
+               con las llamadas síncronas)
+    """
+
+    def __init__(self, max_conexiones_pg: int = 10, hilos: Optional[int] = None,
+                 cache: CacheResultados = None):
+        self.max_conexiones_pg = max_conexiones_pg
+        self.cache = cache or middleware.CACHE_RESULTADOS
+        self._hilos = hilos or (middleware.POOL_SQLSERVER.max_conexiones
+                                + middleware.POOL_POSTGRESQL.max_conexiones)
+        self._ejecutor: Optional[ThreadPoolExecutor] = None
+        self._pool_pg = None
+
+    # --------------------------------------------------------
+    # Ciclo de vida
+    # --------------------------------------------------------
+
+    async def iniciar(self):
+        """Abre el pool de asyncpg (si está instalado) y el grupo de hilos."""
+        self._ejecutor = ThreadPoolExecutor(max_workers=self._hilos, thread_name_prefix='acceso')
+        if asyncpg is not None:
+            config = dict(middleware.CONFIG_POSTGRESQL)
+            config['database'] = config.pop('dbname')
+            with METRICAS.medir(middleware.PARTICION_HISTORICO, 'conectar'):
+                self._pool_pg = await asyncpg.create_pool(
+                    min_size=1, max_size=self.max_conexiones_pg, **config)
+
+    async def cerrar(self):
+        if self._pool_pg is not None:
+            await self._pool_pg.close()
+            self._pool_pg = None
+        if self._ejecutor is not None:
+            self._ejecutor.shutdown(wait=True)
+            self._ejecutor = None
+
+    async def __aenter__(self):
+        await self.iniciar()
+        return self
+
+    async def __aexit__(self, *excepcion):
+        await self.cerrar()
+
+    # --------------------------------------------------------
+    # Ejecución por partición
+    # --------------------------------------------------------
+
+    def _usa_asyncpg(self, particion: str) -> bool:
+        return self._pool_pg is not None and MAPA_PARTICIONES.motor(particion) == MOTOR_POSTGRESQL
+
+    async def _en_hilo(self, funcion, *args):
+        if self._ejecutor is None:
+            raise RuntimeError("AccesoAsincrono no iniciado (usa 'async with' o iniciar())")
+        return await asyncio.get_running_loop().run_in_executor(
+            self._ejecutor, functools.partial(funcion, *args))
+
+    async def _consultar(self, particion: str, sql: str, parametros: Tuple = ()) -> List:
+        """
+        Filas de una consulta en una partición. El SQL es el del motor de la
+        partición (parámetros %s para PostgreSQL, ? para SQL Server).
+        """
+        if self._usa_asyncpg(particion):
+            with METRICAS.medir(particion, 'fetch') as medida:
+                async with self._pool_pg.acquire() as conn:
+                    filas = await conn.fetch(_posicionales(sql), *parametros)
+                medida.filas = len(filas)
+            return filas
+        return await self._en_hilo(middleware._consultar_en, middleware._pool_de(particion),
+                                   sql, parametros)
+
+    async def _por_particion(self, consultas: Dict[str, object]) -> Tuple[Dict, Dict]:
+        """
+        Espera las corrutinas de varias particiones a la vez, cada una con su
+        tiempo límite. Igual que consultar_particiones: las que fallan o
+        vencen se devuelven como faltantes en lugar de abortar el resto.
+
+        Returns:
+            Tuple[Dict, Dict]: (resultados por partición, {partición faltante: motivo})
+        """
+        async def medida(particion, corrutina):
+            with METRICAS.medir(particion, 'consulta'):
+                return await asyncio.wait_for(
+                    corrutina, middleware.TIEMPO_LIMITE_PARTICION.get(particion))
+
+        particiones = list(consultas)
+        respuestas = await asyncio.gather(
+            *(medida(p, consultas[p]) for p in particiones), return_exceptions=True)
+
+        resultados, faltantes = {}, {}
+        for particion, respuesta in zip(particiones, respuestas):
+            if isinstance(respuesta, asyncio.TimeoutError):
+                faltantes[particion] = (f"tiempo límite de "
+                                        f"{middleware.TIEMPO_LIMITE_PARTICION[particion]}s excedido")
+            elif isinstance(respuesta, Exception):
+                faltantes[particion] = str(respuesta)
+            else:
+                resultados[particion] = respuesta
+        return resultados, faltantes
+
+    async def _cacheado(self, clave, particiones, calcular, guardar_si=None):
+        """
+        Igual que CacheResultados.cacheado, para corrutinas. Con la clave de
+        la función síncrona equivalente, ambas versiones comparten resultados.
+        """
+        encontrado, valor = self.cache.obtener(clave)
+        if encontrado:
+            return valor
+        particiones = tuple(particiones)
+        marca = self.cache.generaciones(particiones)
+        valor = await calcular()
+        if guardar_si is None or guardar_si(valor):
+            self.cache.guardar(clave, valor, particiones, marca)
+        return valor
+
+    # --------------------------------------------------------
+    # Inserción
+    # --------------------------------------------------------
+
+    async def insert_credito(self, genero: str, edad: int, etnia: str, zona: str,
+                             distrito_mies: str, provincia: str, canton: str,
+                             parroquia: str, tipo_zona: str, tipo_credito: str,
+                             tipo_actividad: str, actividad: str, numero_cdh: int,
+                             tipo_subsidio: str, cdh_activos: int, anio: int) -> bool:
+        """
+        Inserta un crédito en la partición de su año, con el delta del
+        resumen en la misma transacción (como insert_credito).
+
+        Returns:
+            bool: True si la inserción fue exitosa
+        """
+        fila = (genero, edad, etnia, zona, distrito_mies, provincia, canton,
+                parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
+                numero_cdh, tipo_subsidio, cdh_activos, anio)
+
+        particion = MAPA_PARTICIONES.particion_de(anio)
+        if particion is None:
+            print(f"✗ Año {anio} no válido. Debe ser {MAPA_PARTICIONES.describir()}.")
+            return False
+        METRICAS.contar(particion, 'enrutar', 1)
+
+        try:
+            if self._usa_asyncpg(particion):
+                delta = [clave + tuple(valores) for clave, valores in calcular_delta([fila]).items()]
+                with METRICAS.medir(particion, 'execute') as medida:
+                    async with self._pool_pg.acquire() as conn:
+                        async with conn.transaction():
+                            await conn.execute(_posicionales(_SQL_INSERT[MOTOR_POSTGRESQL]), *fila)
+                            await conn.executemany(_posicionales(MOTOR_PG['upsert']), delta)
+                    medida.filas = 1
+            else:
+                await self._en_hilo(_insertar_sincrono, particion, fila)
+        except Exception as e:
+            print(f"✗ Error insertando crédito: {e}")
+            return False
+
+        self.cache.invalidar(particion)
+        return True
+
+    # --------------------------------------------------------
+    # Consultas
+    # --------------------------------------------------------
+
+    async def consultar_por_anio(self, anio: int, como_dict: bool = False) -> List[CreditoAnual]:
+        """Créditos de un año (comparte caché con consultar_por_anio)."""
+        particion = MAPA_PARTICIONES.particion_de(anio)
+        if particion is None:
+            return []
+
+        async def leer():
+            motor = MAPA_PARTICIONES.motor(particion)
+            filas = await self._consultar(particion, middleware.SQL_POR_ANIO.format(
+                tabla=middleware._TABLA_POR_MOTOR[motor],
+                p=middleware._PARAMETRO_POR_MOTOR[motor]), (anio,))
+            convertir = middleware._constructor_credito(CreditoAnual, particion, como_dict)
+            return [convertir(row) for row in filas]
+
+        try:
+            creditos = await self._cacheado(('_leer_anio', (anio, como_dict), ()), (particion,), leer)
+        except Exception as e:
+            print(f"✗ Error consultando año {anio}: {e}")
+            return []
+        return [copiar(credito) for credito in creditos]
+
+    async def consultar_todos_creditos(self, como_dict: bool = False,
+                                       anios: Optional[List[int]] = None) -> List[Credito]:
+        """
+        Créditos de todas las particiones (o de los años indicados), leídas
+        a la vez; si una falla se devuelven los de las demás.
+        """
+        async def leer(particion, anios_particion):
+            convertir = middleware._constructor_credito(
+                Credito, middleware._origen_de(particion), como_dict)
+            filas = await self._consultar(particion, middleware._sql_todos(particion, anios_particion))
+            return [convertir(row) for row in filas]
+
+        seleccion = middleware._seleccionar_particiones(anios)
+        resultados, faltantes = await self._por_particion(
+            {particion: leer(particion, anios_particion)
+             for particion, anios_particion in seleccion.items()})
+
+        for particion, motivo in faltantes.items():
+            print(f"✗ Error consultando créditos en {particion}: {motivo}")
+
+        creditos = []
+        for particion in seleccion:
+            creditos.extend(resultados.get(particion, []))
+        return creditos
+
+    async def consultar_pagina(self, filtros: Optional[Dict] = None,
+                               despues_de: Optional[Tuple[int, int]] = None,
+                               limite: int = 10) -> Tuple[List[Credito], Optional[Tuple[int, int]]]:
+        """Una página por clave (anio, id), como consultar_pagina."""
+        filtros = dict(filtros or {})
+        anios = [filtros.pop('anio')] if 'anio' in filtros else None
+        desconocidas = set(filtros) - set(middleware.COLUMNAS_FILTRO)
+        if desconocidas:
+            raise ValueError(f"No se puede filtrar por: {', '.join(sorted(desconocidas))}")
+
+        anio_desde, id_desde = despues_de or (None, 0)
+        candidatos = MAPA_PARTICIONES.anios_validos if anios is None else sorted(set(anios))
+
+        # Los años van en orden: cada uno depende de cuántas filas faltan
+        pagina = []
+        for anio in candidatos:
+            if anio_desde is not None and anio < anio_desde:
+                continue
+            particion = MAPA_PARTICIONES.particion_de(anio)
+            if particion is None:
+                continue
+
+            motor = MAPA_PARTICIONES.motor(particion)
+            p = middleware._PARAMETRO_POR_MOTOR[motor]
+            filtro = ''.join(f" AND {columna} = {p}" for columna in filtros)
+            faltan = limite - len(pagina)
+            ultimo_id = id_desde if anio == anio_desde else 0
+            if motor == MOTOR_POSTGRESQL:
+                parametros = (anio, ultimo_id, *filtros.values(), faltan)
+            else:
+                parametros = (faltan, anio, ultimo_id, *filtros.values())
+
+            convertir = middleware._constructor_credito(Credito, middleware._origen_de(particion), False)
+            filas = await self._consultar(
+                particion, middleware.SQL_PAGINA[motor].format(filtro=filtro), parametros)
+            pagina.extend(convertir(row) for row in filas)
+
+            if len(pagina) >= limite:
+                return pagina, (pagina[-1]['anio'], pagina[-1]['id'])
+
+        return pagina, None
+
+    # --------------------------------------------------------
+    # Reportes
+    # --------------------------------------------------------
+
+    async def obtener_totales(self) -> Dict:
+        """
+        Returns:
+            Dict: {partición: (total, activos)} desde las tablas de resumen
+        """
+        if middleware.ANALITICA_LOCAL is not None:
+            return middleware.obtener_totales()  # en memoria, no bloquea
+
+        async def leer():
+            consultas = {}
+            for particion, motor in ((middleware.PARTICION_HISTORICO, MOTOR_PG),
+                                     (middleware.PARTICION_ACTUAL, MOTOR_SQL)):
+                consultas[particion] = self._consultar(
+                    particion,
+                    f"SELECT COALESCE(SUM(total), 0), SUM(activos) FROM {motor['tabla_resumen']} "
+                    f"WHERE {MAPA_PARTICIONES.filtro_sql(particion)}")
+            resultados, faltantes = await self._por_particion(consultas)
+            if faltantes:
+                raise RuntimeError('; '.join(f"{p}: {m}" for p, m in faltantes.items()))
+            return {particion: tuple(filas[0]) for particion, filas in resultados.items()}
+
+        return await self._cacheado(('_totales_resumen', (), ()),
+                                    MAPA_PARTICIONES.particiones, leer)
+
+    async def obtener_estadisticas_por_provincia(self) -> Dict:
+        """Totales por provincia de cada partición, leídos a la vez de los resúmenes."""
+        if middleware.ANALITICA_LOCAL is not None:
+            return middleware.obtener_estadisticas_por_provincia()
+
+        columna = {middleware.PARTICION_HISTORICO: 'historico', middleware.PARTICION_ACTUAL: 'actual'}
+
+        async def leer():
+            consultas = {
+                particion: self._consultar(particion, f"""
+                    SELECT provincia, SUM(total) as total, SUM(activos) as total_activos
+                    FROM {motor['tabla_resumen']}
+                    WHERE {MAPA_PARTICIONES.filtro_sql(particion)}
+                    GROUP BY provincia
+                """)
+                for particion, motor in ((middleware.PARTICION_HISTORICO, MOTOR_PG),
+                                         (middleware.PARTICION_ACTUAL, MOTOR_SQL))
+            }
+            resultados, faltantes = await self._por_particion(consultas)
+            stats = {}
+            for particion, filas in resultados.items():
+                for provincia, total, total_activos in filas:
+                    datos = stats.setdefault(provincia, {'historico': 0, 'actual': 0, 'total_activos': 0})
+                    datos[columna[particion]] = total
+                    datos['total_activos'] += total_activos or 0
+            return stats, faltantes
+
+        stats, faltantes = await self._cacheado(('_estadisticas_por_provincia', (), ()),
+                                                MAPA_PARTICIONES.particiones, leer,
+                                                guardar_si=lambda resultado: not resultado[1])
+        for particion, motivo in faltantes.items():
+            print(f"✗ Error obteniendo estadísticas de {particion}: {motivo}")
+        return {provincia: dict(datos) for provincia, datos in stats.items()}
+
+    async def reporte_consolidado(self, top: int = 10) -> Dict:
+        """
+        Datos del reporte consolidado (totales y principales provincias),
+        con ambas lecturas en curso al mismo tiempo.
+
+        Returns:
+            Dict: {'totales': {partición: (total, activos)}, 'total': int,
+                   'provincias': [(provincia, datos), ...]}
+        """
+        totales, provincias = await asyncio.gather(self.obtener_totales(),
+                                                   self.obtener_estadisticas_por_provincia())
+        return {
+            'totales': totales,
+            'total': sum(total for total, _ in totales.values()),
+            'provincias': sorted(provincias.items(),
+                                 key=lambda x: x[1]['historico'] + x[1]['actual'],
+                                 reverse=True)[:top],
+        }
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+async def _demostracion(concurrencia: int):
+    """Atiende `concurrencia` reportes y consultas por año a la vez."""
+    async with AccesoAsincrono() as acceso:
+        print(f"→ PostgreSQL con {'asyncpg' if acceso._pool_pg else 'hilos (asyncpg no instalado)'}, "
+              f"SQL Server con hilos")
+        anios = MAPA_PARTICIONES.anios_validos
+        inicio = time.perf_counter()
+        tareas = [acceso.reporte_consolidado() if i % 2 == 0 else
+                  acceso.consultar_pagina({'anio': anios[i % len(anios)]}, limite=20)
+                  for i in range(concurrencia)]
+        respuestas = await asyncio.gather(*tareas, return_exceptions=True)
+        fallidas = [r for r in respuestas if isinstance(r, Exception)]
+        print(f"✓ {concurrencia - len(fallidas)} de {concurrencia} solicitudes en "
+              f"{time.perf_counter() - inicio:.2f} s")
+        for error in fallidas[:3]:
+            print(f"✗ {error}")
+
+
+if __name__ == "__main__":
+    concurrencia = 50
+    if '--concurrencia' in sys.argv:
+        concurrencia = int(sys.argv[sys.argv.index('--concurrencia') + 1])
+    asyncio.run(_demostracion(concurrencia))
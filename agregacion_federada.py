@@ -0,0 +1,183 @@
+"""
+============================================================
+AGREGACIÓN FEDERADA - REPORTES SOBRE AMBAS PARTICIONES
+============================================================
+
+Capa de agregación que recibe una definición declarativa de
+métricas y dimensiones, la compila en UNA consulta
+GROUPING SETS por motor (PostgreSQL y SQL Server usan la misma
+sintaxis), ejecuta las consultas de todas las particiones a la
+vez y combina los agregados parciales.
+
+Solo se admiten agregados descomponibles, que se pueden
+combinar a partir de los parciales de cada partición:
+
+  • COUNT(*) / COUNT(col) / SUM(col)  → se suman
+  • MIN(col) / MAX(col)               → mínimo / máximo
+
+Ejemplo:
+
+    consulta = ConsultaAgregada(
+        conjuntos=[(), ('provincia',), ('anio',)],
+        metricas={'total': 'COUNT(*)', 'activos': 'SUM(cdh_activos)'}
+    )
+    resultado = consulta.ejecutar({
+        'historico': (conn_pg, 'creditos_historicos'),
+        'actual': (conn_sql, 'CreditosActuales'),
+    })
+    resultado.grupo('provincia')                  # combinado
+    resultado.grupo('provincia', 'historico')     # solo una partición
+============================================================
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from consulta_distribuida import consultar_particiones, POLITICA_ESTRICTA
+
+# Agregado SQL → función que combina los parciales de cada partición
+_COMBINADORES = {
+    'COUNT': lambda valores: sum(v or 0 for v in valores),
+    'SUM': lambda valores: sum(v for v in valores if v is not None)
+                           if any(v is not None for v in valores) else None,
+    'MIN': lambda valores: min((v for v in valores if v is not None), default=None),
+    'MAX': lambda valores: max((v for v in valores if v is not None), default=None),
+}
+
+_AGREGADO = re.compile(r'^\s*(COUNT|SUM|MIN|MAX)\s*\(\s*(\*|[A-Za-z_][A-Za-z0-9_]*)\s*\)\s*$',
+                       re.IGNORECASE)
+_COLUMNA = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class ResultadoAgregado:
+    """
+    Agregados por partición y combinados.
+
+    Estructura interna: {conjunto: {clave: {métrica: valor}}}, donde
+    conjunto es la tupla de dimensiones (p. ej. ('provincia',)) y clave la
+    tupla de valores (p. ej. ('GUAYAS',)). El total general es el conjunto ().
+    """
+
+    def __init__(self, parciales: Dict[str, Dict], combinado: Dict,
+                 faltantes: Dict[str, str]):
+        self.parciales = parciales
+        self.combinado = combinado
+        self.faltantes = faltantes
+
+    def _datos(self, particion: Optional[str]) -> Dict:
+        return self.combinado if particion is None else self.parciales.get(particion, {})
+
+    def grupo(self, dimension: str, particion: Optional[str] = None) -> Dict:
+        """
+        Returns:
+            Dict: {valor de la dimensión: {métrica: valor}}
+        """
+        filas = self._datos(particion).get((dimension,), {})
+        return {clave[0]: metricas for clave, metricas in filas.items()}
+
+    def total(self, particion: Optional[str] = None) -> Dict:
+        """
+        Returns:
+            Dict: {métrica: valor} del conjunto vacío (total general)
+        """
+        return self._datos(particion).get((), {}).get((), {})
+
+
+class ConsultaAgregada:
+    """
+    Definición declarativa de un reporte.
+
+    Args:
+        conjuntos: Conjuntos de agrupación; () es el total general
+        metricas: {nombre: agregado SQL descomponible}
+    """
+
+    def __init__(self, conjuntos: Sequence[Tuple[str, ...]], metricas: Dict[str, str]):
+        self.conjuntos = [tuple(c) for c in conjuntos]
+        self.dimensiones: List[str] = []
+        for conjunto in self.conjuntos:
+            for dimension in conjunto:
+                if not _COLUMNA.match(dimension):
+                    raise ValueError(f"Dimensión inválida: {dimension}")
+                if dimension not in self.dimensiones:
+                    self.dimensiones.append(dimension)
+
+        self.metricas = dict(metricas)
+        self._combinadores = {}
+        for nombre, expresion in self.metricas.items():
+            coincidencia = _AGREGADO.match(expresion)
+            if not coincidencia or not _COLUMNA.match(nombre):
+                raise ValueError(f"Métrica no descomponible o inválida: {nombre} = {expresion}")
+            self._combinadores[nombre] = _COMBINADORES[coincidencia.group(1).upper()]
+
+    def compilar(self, tabla: str, filtro: Optional[str] = None) -> str:
+        """
+        Genera la consulta GROUPING SETS para una tabla.
+
+        Las columnas GROUPING(dim) indican qué dimensiones agrupan cada
+        fila, para distinguir un total de un valor NULL real.
+
+        Args:
+            filtro: Condición WHERE opcional (SQL de confianza, no parámetros)
+        """
+        columnas = list(self.dimensiones)
+        columnas += [f"GROUPING({d}) AS g_{d}" for d in self.dimensiones]
+        columnas += [f"{expresion} AS {nombre}" for nombre, expresion in self.metricas.items()]
+        conjuntos = ', '.join(f"({', '.join(c)})" for c in self.conjuntos)
+        donde = f"\nWHERE {filtro}" if filtro else ""
+        return (f"SELECT {', '.join(columnas)}\n"
+                f"FROM {tabla}{donde}\n"
+                f"GROUP BY GROUPING SETS ({conjuntos})")
+
+    def _leer_filas(self, filas) -> Dict:
+        """Convierte las filas GROUPING SETS en {conjunto: {clave: {métrica: valor}}}."""
+        n = len(self.dimensiones)
+        nombres = list(self.metricas)
+        datos = {conjunto: {} for conjunto in self.conjuntos}
+        for fila in filas:
+            valores, banderas, medidas = fila[:n], fila[n:2 * n], fila[2 * n:]
+            conjunto = tuple(d for d, g in zip(self.dimensiones, banderas) if not g)
+            clave = tuple(v for v, g in zip(valores, banderas) if not g)
+            datos.setdefault(conjunto, {})[clave] = dict(zip(nombres, medidas))
+        return datos
+
+    def _combinar(self, parciales: List[Dict]) -> Dict:
+        combinado = {}
+        for conjunto in self.conjuntos:
+            claves = {}
+            for datos in parciales:
+                for clave, metricas in datos.get(conjunto, {}).items():
+                    claves.setdefault(clave, []).append(metricas)
+            combinado[conjunto] = {
+                clave: {nombre: combinar([m[nombre] for m in lista])
+                        for nombre, combinar in self._combinadores.items()}
+                for clave, lista in claves.items()
+            }
+        return combinado
+
+    def ejecutar(self, particiones: Dict[str, Tuple], politica: str = POLITICA_ESTRICTA,
+                 tiempo_limite: Optional[Dict[str, float]] = None) -> ResultadoAgregado:
+        """
+        Ejecuta la consulta en todas las particiones a la vez: un solo viaje
+        al servidor por partición.
+
+        Args:
+            particiones: {nombre: (conexión, tabla)} o {nombre: (conexión, tabla, filtro)}
+            politica: 'estricto' (por defecto) o 'parcial'
+        """
+
+        def consulta(conn, tabla, filtro=None):
+            def ejecutar_en_particion():
+                cursor = conn.cursor()
+                cursor.execute(self.compilar(tabla, filtro))
+                filas = cursor.fetchall()
+                cursor.close()
+                return self._leer_filas(filas)
+            return ejecutar_en_particion
+
+        resultados, faltantes = consultar_particiones(
+            {nombre: consulta(*definicion) for nombre, definicion in particiones.items()},
+            tiempo_limite=tiempo_limite,
+            politica=politica
+        )
+        return ResultadoAgregado(resultados, self._combinar(list(resultados.values())), faltantes)
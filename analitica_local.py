@@ -0,0 +1,382 @@
+"""
+============================================================
+ANALÍTICA LOCAL - INSTANTÁNEA COLUMNAR EN MEMORIA
+============================================================
+
+Copia en memoria de las columnas que usan los reportes, de
+todas las particiones, como arreglos NumPy:
+
+  • Dimensiones (anio, provincia, genero, tipo_credito,
+    tipo_subsidio) como códigos enteros de un diccionario
+  • cdh_activos como arreglo numérico
+  • Un bloque por año; se refresca de forma incremental
+    leyendo solo los id nuevos de cada año
+
+Las agrupaciones se calculan con np.bincount sobre un índice
+combinado de las dimensiones: el reporte consolidado responde
+en milisegundos sin consultar las bases.
+
+Cada refresco compara los conteos de cada año con las tablas
+de resumen; si un año tiene filas de más (borrados, traspaso)
+o sigue con filas de menos, se vuelve a leer completo.
+
+Requiere numpy (dependencia opcional: pip install numpy).
+
+    python analitica_local.py   → carga la instantánea y
+                                  muestra el reporte
+============================================================
+"""
+
+import threading
+import time
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from agregacion_federada import ResultadoAgregado
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+from resumenes import MOTOR_PG, MOTOR_SQL
+
+DIMENSIONES = ('anio', 'provincia', 'genero', 'tipo_credito', 'tipo_subsidio')
+
+# Columnas leídas de la tabla base, en el orden de DIMENSIONES (sin anio)
+_SQL_BLOQUE = {
+    MOTOR_POSTGRESQL: """
+        SELECT id, provincia, genero, tipo_credito, tipo_subsidio, cdh_activos
+        FROM creditos_historicos
+        WHERE anio = %s AND id > %s
+        ORDER BY id
+    """,
+    MOTOR_SQLSERVER: """
+        SELECT id, provincia, genero, tipo_credito, tipo_subsidio, cdh_activos
+        FROM CreditosActuales
+        WHERE anio = ? AND id > ?
+        ORDER BY id
+    """,
+}
+
+_RESUMEN_POR_MOTOR = {MOTOR_POSTGRESQL: MOTOR_PG, MOTOR_SQLSERVER: MOTOR_SQL}
+
+
+class _Diccionario:
+    """Valor ↔ código de una dimensión; los códigos nunca cambian."""
+
+    def __init__(self):
+        self.codigos: Dict = {}
+        self.valores: List = []
+
+    def codificar(self, valores: Iterable):
+        codigos = []
+        for valor in valores:
+            # NULL se agrupa como '' (igual que en las tablas de resumen)
+            valor = '' if valor is None else valor
+            codigo = self.codigos.get(valor)
+            if codigo is None:
+                codigo = self.codigos[valor] = len(self.valores)
+                self.valores.append(valor)
+            codigos.append(codigo)
+        return np.array(codigos, dtype=np.int32)
+
+
+class _BloqueAnio:
+    """Columnas de un año, leídas de una partición hasta ultimo_id."""
+
+    __slots__ = ('particion', 'ultimo_id', 'codigos', 'activos', 'faltan_filas')
+
+    def __init__(self, particion: str):
+        self.particion = particion
+        self.ultimo_id = 0
+        self.codigos = {d: np.empty(0, dtype=np.int32) for d in DIMENSIONES[1:]}
+        self.activos = np.empty(0, dtype=np.int64)
+        self.faltan_filas = False
+
+    def __len__(self):
+        return len(self.activos)
+
+    def copia(self) -> '_BloqueAnio':
+        # Los arreglos no se modifican, solo se reemplazan: basta copiar las referencias
+        otro = _BloqueAnio(self.particion)
+        otro.ultimo_id = self.ultimo_id
+        otro.codigos = dict(self.codigos)
+        otro.activos = self.activos
+        otro.faltan_filas = self.faltan_filas
+        return otro
+
+
+class InstantaneaColumnar:
+    """
+    Instantánea columnar de los créditos de todas las particiones.
+
+    Args:
+        conexiones: {motor: función que devuelve un context manager con
+                     una conexión}, p. ej. {MOTOR_POSTGRESQL: pool.conexion}
+        tamano_lote: Filas por viaje al servidor al leer
+    """
+
+    def __init__(self, conexiones: Dict[str, Callable[[], ContextManager]],
+                 tamano_lote: int = 20000):
+        if np is None:
+            raise RuntimeError("La analítica local requiere numpy: pip install numpy")
+        self.conexiones = conexiones
+        self.tamano_lote = tamano_lote
+
+        self._lock = threading.Lock()
+        self._refresco = threading.Lock()
+        self._diccionarios = {d: _Diccionario() for d in DIMENSIONES}
+        self._particiones = _Diccionario()
+        self._bloques: Dict[int, _BloqueAnio] = {}
+        self._vista = None  # columnas concatenadas, se arma al consultar
+
+        self._hilo: Optional[threading.Thread] = None
+        self._detener = threading.Event()
+        self.actualizada = None
+        self.duracion_refresco = 0.0
+        self.anios_recargados = 0
+
+    # --------------------------------------------------------
+    # Refresco
+    # --------------------------------------------------------
+
+    def _leer(self, particion: str, anio: int, bloque: _BloqueAnio):
+        """Agrega al bloque las filas del año con id mayor que ultimo_id."""
+        motor = MAPA_PARTICIONES.motor(particion)
+        with self.conexiones[motor]() as conn:
+            if motor == MOTOR_POSTGRESQL:
+                cursor = conn.cursor(name=f'instantanea_{anio}')
+                cursor.itersize = self.tamano_lote
+            else:
+                cursor = conn.cursor()
+                cursor.arraysize = self.tamano_lote
+            cursor.execute(_SQL_BLOQUE[motor], (anio, bloque.ultimo_id))
+            partes = []
+            while True:
+                filas = cursor.fetchmany(self.tamano_lote)
+                if not filas:
+                    break
+                columnas = list(zip(*filas))
+                partes.append((
+                    {d: self._diccionarios[d].codificar(columnas[i])
+                     for i, d in enumerate(DIMENSIONES[1:], 1)},
+                    np.array([v or 0 for v in columnas[5]], dtype=np.int64),
+                ))
+                bloque.ultimo_id = columnas[0][-1]
+            cursor.close()
+
+        if partes:
+            for d in DIMENSIONES[1:]:
+                bloque.codigos[d] = np.concatenate([bloque.codigos[d]] + [p[0][d] for p in partes])
+            bloque.activos = np.concatenate([bloque.activos] + [p[1] for p in partes])
+
+    def _conteos_resumen(self, particion: str) -> Dict[int, int]:
+        """Créditos por año según la tabla de resumen de la partición."""
+        motor = MAPA_PARTICIONES.motor(particion)
+        with self.conexiones[motor]() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT anio, SUM(total) FROM {_RESUMEN_POR_MOTOR[motor]['tabla_resumen']} "
+                           f"WHERE {MAPA_PARTICIONES.filtro_sql(particion)} GROUP BY anio")
+            conteos = {anio: int(total) for anio, total in cursor.fetchall()}
+            cursor.close()
+        return conteos
+
+    def refrescar(self) -> int:
+        """
+        Lee las filas nuevas de cada año y recarga los años que ya no
+        cuadran con su tabla de resumen.
+
+        Returns:
+            int: Filas en la instantánea
+        """
+        with self._refresco:
+            inicio = time.perf_counter()
+            # Se trabaja sobre copias: las consultas siguen viendo la versión anterior
+            bloques = {anio: bloque.copia() for anio, bloque in self._bloques.items()}
+            recargados = 0
+
+            # Años que salieron del mapa o cambiaron de partición
+            for anio in list(bloques):
+                if MAPA_PARTICIONES.particion_de(anio) != bloques[anio].particion:
+                    del bloques[anio]
+
+            for particion in MAPA_PARTICIONES.particiones:
+                for anio in MAPA_PARTICIONES.anios(particion):
+                    bloque = bloques.get(anio)
+                    if bloque is None:
+                        bloque = bloques[anio] = _BloqueAnio(particion)
+                    self._leer(particion, anio, bloque)
+
+                # Conteos tomados después de leer: si el resumen tiene menos
+                # filas hubo borrados; si tiene más pueden ser inserciones en
+                # curso, pero si siguen faltando en el refresco siguiente hay
+                # filas con id por debajo de ultimo_id que no se leyeron
+                conteos = self._conteos_resumen(particion)
+                for anio in MAPA_PARTICIONES.anios(particion):
+                    bloque, esperado = bloques[anio], conteos.get(anio, 0)
+                    if len(bloque) > esperado or (len(bloque) < esperado and bloque.faltan_filas):
+                        bloque = bloques[anio] = _BloqueAnio(particion)
+                        self._leer(particion, anio, bloque)
+                        recargados += 1
+                    bloque.faltan_filas = len(bloque) < esperado
+
+            with self._lock:
+                self._bloques = bloques
+                self._vista = None
+            self.actualizada = time.time()
+            self.duracion_refresco = time.perf_counter() - inicio
+            self.anios_recargados += recargados
+            return sum(len(b) for b in bloques.values())
+
+    def iniciar_refresco(self, intervalo: float = 60.0):
+        """Refresca la instantánea en segundo plano cada `intervalo` segundos."""
+
+        def ciclo():
+            while not self._detener.wait(intervalo):
+                try:
+                    self.refrescar()
+                except Exception as e:
+                    print(f"\n✗ Error refrescando la instantánea local: {e}")
+
+        self._detener.clear()
+        self._hilo = threading.Thread(target=ciclo, name='instantanea_columnar', daemon=True)
+        self._hilo.start()
+
+    def detener_refresco(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    # --------------------------------------------------------
+    # Consultas
+    # --------------------------------------------------------
+
+    def _columnas(self) -> Dict[str, 'np.ndarray']:
+        """Columnas de todos los años concatenadas (se arman una vez por refresco)."""
+        with self._lock:
+            if self._vista is None:
+                bloques = [(anio, b) for anio, b in sorted(self._bloques.items())]
+                anios = self._diccionarios['anio']
+                vista = {
+                    'anio': np.concatenate([np.full(len(b), anios.codificar([a])[0], np.int32)
+                                            for a, b in bloques] or [np.empty(0, np.int32)]),
+                    'particion': np.concatenate(
+                        [np.full(len(b), self._particiones.codificar([b.particion])[0], np.int32)
+                         for _, b in bloques] or [np.empty(0, np.int32)]),
+                    'activos': np.concatenate([b.activos for _, b in bloques]
+                                              or [np.empty(0, np.int64)]),
+                }
+                for d in DIMENSIONES[1:]:
+                    vista[d] = np.concatenate([b.codigos[d] for _, b in bloques]
+                                              or [np.empty(0, np.int32)])
+                self._vista = vista
+            return self._vista
+
+    def _diccionario(self, dimension: str) -> _Diccionario:
+        return self._particiones if dimension == 'particion' else self._diccionarios[dimension]
+
+    def agrupar(self, dimensiones: Sequence[str]) -> Dict[Tuple, Tuple[int, int]]:
+        """
+        Conteo de créditos y suma de cdh_activos por combinación de
+        dimensiones, con un único np.bincount sobre el índice combinado.
+
+        Returns:
+            Dict: {(valores de las dimensiones): (total, activos)}
+        """
+        columnas = self._columnas()
+        if not dimensiones:
+            return {(): (len(columnas['activos']), int(columnas['activos'].sum()))}
+        if not len(columnas['activos']):
+            return {}
+
+        tamanos = [len(self._diccionario(d).valores) for d in dimensiones]
+        indice = np.zeros(len(columnas['activos']), dtype=np.int64)
+        for dimension, tamano in zip(dimensiones, tamanos):
+            indice = indice * tamano + columnas[dimension]
+
+        celdas = int(np.prod(tamanos))
+        totales = np.bincount(indice, minlength=celdas)
+        activos = np.bincount(indice, weights=columnas['activos'], minlength=celdas)
+
+        ocupadas = np.nonzero(totales)[0]
+        codigos = np.unravel_index(ocupadas, tamanos)
+        valores = [self._diccionario(d).valores for d in dimensiones]
+        return {
+            tuple(valores[i][codigos[i][k]] for i in range(len(dimensiones))):
+                (int(totales[celda]), int(round(activos[celda])))
+            for k, celda in enumerate(ocupadas)
+        }
+
+    def agregar(self, conjuntos: Sequence[Tuple[str, ...]],
+                nombres: Optional[Dict[str, str]] = None) -> ResultadoAgregado:
+        """
+        Equivalente local de ConsultaAgregada.ejecutar con las métricas
+        total y activos: mismos conjuntos, mismo formato de resultado.
+
+        Args:
+            conjuntos: Conjuntos de agrupación; () es el total general
+            nombres: {partición: nombre en el resultado}; por defecto el de
+                     la partición
+        """
+        nombres = nombres or {}
+        parciales: Dict[str, Dict] = {}
+        combinado: Dict = {}
+        for conjunto in conjuntos:
+            conjunto = tuple(conjunto)
+            combinado[conjunto] = {}
+            for (particion, *clave), (total, activos) in self.agrupar(('particion',) + conjunto).items():
+                clave = tuple(clave)
+                parcial = parciales.setdefault(nombres.get(particion, particion), {})
+                parcial.setdefault(conjunto, {})[clave] = {'total': total, 'activos': activos}
+                acumulado = combinado[conjunto].setdefault(clave, {'total': 0, 'activos': 0})
+                acumulado['total'] += total
+                acumulado['activos'] += activos
+        return ResultadoAgregado(parciales, combinado, {})
+
+    def estadisticas(self) -> Dict:
+        """
+        Returns:
+            Dict: filas, anios, bytes, actualizada (epoch), duracion_refresco,
+                  anios_recargados
+        """
+        with self._lock:
+            bloques = list(self._bloques.values())
+        return {
+            'filas': sum(len(b) for b in bloques),
+            'anios': len(bloques),
+            'bytes': sum(b.activos.nbytes + sum(c.nbytes for c in b.codigos.values())
+                         for b in bloques),
+            'actualizada': self.actualizada,
+            'duracion_refresco': self.duracion_refresco,
+            'anios_recargados': self.anios_recargados,
+        }
+
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+if __name__ == "__main__":
+    import contextlib
+    import sys
+
+    from migrar_y_reportar import (
+        CONFIG_PG_HISTORICO, conectar_postgresql, conectar_sqlserver, generar_reporte
+    )
+
+    if np is None:
+        print("✗ La analítica local requiere numpy: pip install numpy")
+        sys.exit(1)
+
+    instantanea = InstantaneaColumnar({
+        MOTOR_POSTGRESQL: lambda: contextlib.closing(conectar_postgresql(CONFIG_PG_HISTORICO)),
+        MOTOR_SQLSERVER: lambda: contextlib.closing(conectar_sqlserver()),
+    })
+    filas = instantanea.refrescar()
+    print(f"✓ Instantánea: {filas:,} registros en {instantanea.duracion_refresco:.1f} s "
+          f"({instantanea.estadisticas()['bytes'] / 1024 / 1024:.1f} MB)")
+
+    inicio = time.perf_counter()
+    generar_reporte(instantanea)
+    print(f"\nReporte calculado en {(time.perf_counter() - inicio) * 1000:.1f} ms")
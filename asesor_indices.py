@@ -0,0 +1,420 @@
+"""
+============================================================
+ASESOR DE ÍNDICES - TABLAS MIGRADAS
+============================================================
+
+Índices secundarios de creditos_historicos (PostgreSQL) y
+CreditosActuales (SQL Server) pensados para la carga real:
+
+  • Agrupaciones por anio, provincia, genero, tipo_credito y
+    tipo_subsidio (resúmenes y verificación) resueltas solo
+    con el índice, sin leer la tabla
+  • Lecturas por año y recorridos por id dentro de un año
+    (traspasos y paginación)
+
+Los índices se crean DESPUÉS de la carga masiva: insertar en
+una tabla sin índices y construirlos al final es mucho más
+rápido que mantenerlos fila por fila.
+
+Además:
+  • Sugiere índices a partir de las estadísticas de consultas
+    del motor (pg_stat_statements / DMV de índices faltantes)
+  • Mide la carga de consultas sin y con los índices
+
+    python asesor_indices.py              → sugerencias
+    python asesor_indices.py --crear      → crea los índices
+    python asesor_indices.py --comparar   → antes / después
+============================================================
+"""
+
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+
+TABLA_POR_MOTOR = {
+    MOTOR_POSTGRESQL: 'creditos_historicos',
+    MOTOR_SQLSERVER: 'CreditosActuales',
+}
+
+COLUMNAS_TABLA = (
+    'id', 'genero', 'edad', 'etnia', 'zona', 'distrito_mies', 'provincia', 'canton',
+    'parroquia', 'tipo_zona', 'tipo_credito', 'tipo_actividad', 'actividad',
+    'numero_cdh', 'tipo_subsidio', 'cdh_activos', 'anio', 'fecha_migracion'
+)
+
+# ============================================================
+# ÍNDICES DE LA CARGA DE TRABAJO
+# ============================================================
+
+# En PostgreSQL los índices se declaran en la tabla madre y cada
+# partición por año recibe el suyo. La clave primaria (id, anio) ya
+# sirve para los recorridos por id dentro de una partición.
+# En SQL Server la clave del índice agrupado (id) va implícita en
+# cada índice secundario.
+INDICES = {
+    MOTOR_POSTGRESQL: [
+        {
+            'nombre': 'idx_creditos_historicos_dimensiones',
+            'columnas': ('anio', 'provincia', 'genero', 'tipo_credito', 'tipo_subsidio'),
+            'incluir': ('cdh_activos', 'edad', 'id'),
+        },
+    ],
+    MOTOR_SQLSERVER: [
+        {
+            'nombre': 'IX_CreditosActuales_Dimensiones',
+            'columnas': ('anio', 'provincia', 'genero', 'tipo_credito', 'tipo_subsidio'),
+            'incluir': ('cdh_activos', 'edad'),
+        },
+        {
+            'nombre': 'IX_CreditosActuales_Anio_Id',
+            'columnas': ('anio', 'id'),
+            'incluir': (),
+        },
+    ],
+}
+
+# Consultas representativas para medir los índices ({tabla}, {p} = año)
+CONSULTAS_CARGA = {
+    'Resumen por dimensiones': """
+        SELECT anio, provincia, genero, tipo_credito, tipo_subsidio,
+               COUNT(*), SUM(cdh_activos)
+        FROM {tabla}
+        GROUP BY anio, provincia, genero, tipo_credito, tipo_subsidio
+    """,
+    'Créditos de un año': """
+        SELECT id, genero, edad, provincia, tipo_credito, tipo_subsidio, cdh_activos, anio
+        FROM {tabla}
+        WHERE anio = {p}
+    """,
+    'Provincias de un año': """
+        SELECT provincia, COUNT(*), SUM(cdh_activos)
+        FROM {tabla}
+        WHERE anio = {p}
+        GROUP BY provincia
+    """,
+}
+
+# ============================================================
+# CREACIÓN
+# ============================================================
+
+def ddl_indice(motor: str, indice: Dict, tabla: Optional[str] = None) -> str:
+    """Sentencia CREATE INDEX (idempotente) para el motor indicado."""
+    tabla = tabla or TABLA_POR_MOTOR[motor]
+    columnas = ', '.join(indice['columnas'])
+    incluir = f" INCLUDE ({', '.join(indice['incluir'])})" if indice.get('incluir') else ''
+    if motor == MOTOR_POSTGRESQL:
+        return f"CREATE INDEX IF NOT EXISTS {indice['nombre']} ON {tabla} ({columnas}){incluir}"
+    return (f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{indice['nombre']}' "
+            f"AND object_id = OBJECT_ID('dbo.{tabla}')) "
+            f"CREATE INDEX {indice['nombre']} ON dbo.{tabla} ({columnas}){incluir}")
+
+def crear_indices(cursor, motor: str) -> List[str]:
+    """
+    Crea los índices de la carga de trabajo y actualiza las estadísticas
+    del planificador. No confirma la transacción.
+
+    Returns:
+        List[str]: Nombres de los índices asegurados
+    """
+    tabla = TABLA_POR_MOTOR[motor]
+    for indice in INDICES[motor]:
+        cursor.execute(ddl_indice(motor, indice))
+    if motor == MOTOR_POSTGRESQL:
+        cursor.execute(f"ANALYZE {tabla}")
+    else:
+        cursor.execute(f"UPDATE STATISTICS dbo.{tabla}")
+    return [indice['nombre'] for indice in INDICES[motor]]
+
+def eliminar_indices(cursor, motor: str):
+    """Elimina los índices de la carga de trabajo (solo los definidos aquí)."""
+    tabla = TABLA_POR_MOTOR[motor]
+    for indice in INDICES[motor]:
+        if motor == MOTOR_POSTGRESQL:
+            cursor.execute(f"DROP INDEX IF EXISTS {indice['nombre']}")
+        else:
+            cursor.execute(f"DROP INDEX IF EXISTS {indice['nombre']} ON dbo.{tabla}")
+
+def indexar(conn, motor: str) -> float:
+    """
+    Crea los índices tras una carga masiva y confirma.
+
+    Returns:
+        float: Segundos empleados
+    """
+    inicio = time.perf_counter()
+    cursor = conn.cursor()
+    crear_indices(cursor, motor)
+    conn.commit()
+    cursor.close()
+    return time.perf_counter() - inicio
+
+# ============================================================
+# SUGERENCIAS A PARTIR DE LAS ESTADÍSTICAS DE CONSULTAS
+# ============================================================
+
+_PATRON_COLUMNA = re.compile(r'\b(' + '|'.join(COLUMNAS_TABLA) + r')\b')
+
+def _columnas(texto: str) -> List[str]:
+    """Columnas de la tabla en el orden en que aparecen, sin repetir."""
+    vistas = []
+    for columna in _PATRON_COLUMNA.findall(texto):
+        if columna not in vistas:
+            vistas.append(columna)
+    return vistas
+
+def columnas_de_consulta(consulta: str) -> Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]]:
+    """
+    Índice que serviría a una consulta SELECT: primero las columnas
+    comparadas por igualdad, luego las de GROUP BY / ORDER BY y por
+    último una columna de rango; las demás columnas leídas se incluyen
+    si son pocas.
+
+    Returns:
+        (columnas, incluir) o None si la consulta no filtra ni agrupa
+    """
+    texto = ' '.join(consulta.lower().split())
+    seleccion = re.search(r'^select\s+(.*?)\s+from\s', texto)
+    if not seleccion:
+        return None
+
+    donde = re.search(r'\swhere\s+(.*?)(?=\s+group\s+by\s|\s+order\s+by\s|\s+limit\s|\s+offset\s|$)', texto)
+    donde = donde.group(1) if donde else ''
+    igualdad = [c for c in _columnas(donde)
+                if re.search(rf'\b{c}\s*(=|in\s*\()', donde)]
+    rango = [c for c in _columnas(donde)
+             if c not in igualdad and re.search(rf'\b{c}\s*(<|>|between\b)', donde)]
+
+    orden = []
+    for clausula in re.findall(r'\s(?:group|order)\s+by\s+(.*?)(?=\s+order\s+by\s|\s+limit\s|\s+offset\s|$)', texto):
+        orden += [c for c in _columnas(clausula) if c not in orden]
+
+    columnas = igualdad + [c for c in orden if c not in igualdad] + rango[:1]
+    if not columnas:
+        return None
+
+    leidas = _columnas(seleccion.group(1)) if '*' not in seleccion.group(1).replace('(*)', '') else []
+    incluir = [c for c in leidas + _columnas(donde) if c not in columnas]
+    incluir = list(dict.fromkeys(incluir)) if len(set(incluir)) <= 6 else []
+    return tuple(columnas), tuple(incluir)
+
+def indices_existentes(cursor, motor: str) -> List[Tuple[str, ...]]:
+    """Columnas clave (en orden) de cada índice de la tabla."""
+    tabla = TABLA_POR_MOTOR[motor]
+    if motor == MOTOR_POSTGRESQL:
+        cursor.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s", (tabla,))
+        existentes = []
+        for (definicion,) in cursor.fetchall():
+            clave = re.search(r'\((.*?)\)', definicion).group(1)
+            existentes.append(tuple(c.strip().strip('"') for c in clave.split(',')))
+        return existentes
+
+    cursor.execute("""
+        SELECT i.name, c.name
+        FROM sys.indexes i
+        JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+        JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+        WHERE i.object_id = OBJECT_ID(?) AND ic.key_ordinal > 0
+        ORDER BY i.name, ic.key_ordinal
+    """, f"dbo.{tabla}")
+    por_indice: Dict[str, List[str]] = {}
+    for indice, columna in cursor.fetchall():
+        por_indice.setdefault(indice, []).append(columna.lower())
+    return [tuple(columnas) for columnas in por_indice.values()]
+
+def _cubierto(columnas: Tuple[str, ...], existentes: List[Tuple[str, ...]]) -> bool:
+    """True si algún índice existente empieza por las mismas columnas."""
+    return any(existente[:len(columnas)] == columnas for existente in existentes)
+
+def _estadisticas_pg(cursor, minimo_llamadas: int) -> List[Tuple[str, int, float]]:
+    """(consulta, llamadas, milisegundos totales) de pg_stat_statements sobre la tabla."""
+    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+    if cursor.fetchone() is None:
+        print("✗ pg_stat_statements no está habilitada "
+              "(shared_preload_libraries + CREATE EXTENSION pg_stat_statements)")
+        return []
+
+    # total_exec_time desde PostgreSQL 13; total_time en versiones anteriores
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = 'pg_stat_statements' AND column_name IN ('total_exec_time', 'total_time')
+    """)
+    tiempo = cursor.fetchone()[0]
+    cursor.execute(f"""
+        SELECT query, calls, {tiempo}
+        FROM pg_stat_statements
+        WHERE query ~* '(^|[^a-z_])creditos_historicos(_[0-9]{{4}})?([^a-z_0-9]|$)'
+          AND query ~* '^\\s*select' AND calls >= %s
+        ORDER BY {tiempo} DESC
+        LIMIT 100
+    """, (minimo_llamadas,))
+    return cursor.fetchall()
+
+def _sugerencias_sqlserver(cursor) -> List[Dict]:
+    """Índices faltantes que SQL Server registró para CreditosActuales."""
+    cursor.execute("""
+        SELECT d.equality_columns, d.inequality_columns, d.included_columns,
+               s.user_seeks + s.user_scans,
+               (s.user_seeks + s.user_scans) * s.avg_total_user_cost * s.avg_user_impact
+        FROM sys.dm_db_missing_index_details d
+        JOIN sys.dm_db_missing_index_groups g ON g.index_handle = d.index_handle
+        JOIN sys.dm_db_missing_index_group_stats s ON s.group_handle = g.index_group_handle
+        WHERE d.object_id = OBJECT_ID(?)
+        ORDER BY 5 DESC
+    """, f"dbo.{TABLA_POR_MOTOR[MOTOR_SQLSERVER]}")
+
+    def lista(texto):
+        return tuple(c.strip(' []').lower() for c in texto.split(',')) if texto else ()
+
+    return [{'columnas': lista(igualdad) + lista(desigualdad), 'incluir': lista(incluidas),
+             'usos': usos, 'peso': float(peso)}
+            for igualdad, desigualdad, incluidas, usos, peso in cursor.fetchall()]
+
+def sugerir_indices(conn, motor: str, minimo_llamadas: int = 5) -> List[Dict]:
+    """
+    Propone índices para las consultas más costosas registradas por el
+    motor que ningún índice existente cubre.
+
+    PostgreSQL: analiza las consultas de pg_stat_statements sobre
+    creditos_historicos. SQL Server: lee los índices faltantes que el
+    optimizador registró en sys.dm_db_missing_index_*.
+
+    Returns:
+        List[Dict]: columnas, incluir, usos, peso (coste acumulado), ddl;
+                    de mayor a menor peso
+    """
+    cursor = conn.cursor()
+    if motor == MOTOR_POSTGRESQL:
+        agrupadas: Dict[Tuple, Dict] = {}
+        for consulta, llamadas, milisegundos in _estadisticas_pg(cursor, minimo_llamadas):
+            indice = columnas_de_consulta(consulta)
+            if indice is None:
+                continue
+            sugerencia = agrupadas.setdefault(indice[0], {
+                'columnas': indice[0], 'incluir': (), 'usos': 0, 'peso': 0.0
+            })
+            sugerencia['incluir'] = tuple(dict.fromkeys(sugerencia['incluir'] + indice[1]))
+            sugerencia['usos'] += llamadas
+            sugerencia['peso'] += float(milisegundos)
+        sugerencias = list(agrupadas.values())
+    else:
+        sugerencias = _sugerencias_sqlserver(cursor)
+
+    existentes = indices_existentes(cursor, motor)
+    conn.commit()
+    cursor.close()
+
+    tabla = TABLA_POR_MOTOR[motor].lower()
+    resultado = []
+    for sugerencia in sorted(sugerencias, key=lambda s: s['peso'], reverse=True):
+        if _cubierto(sugerencia['columnas'], existentes):
+            continue
+        nombre = f"idx_{tabla}_{'_'.join(sugerencia['columnas'])}"[:63]
+        sugerencia['ddl'] = ddl_indice(motor, {'nombre': nombre, **sugerencia})
+        resultado.append(sugerencia)
+        existentes.append(sugerencia['columnas'])
+    return resultado
+
+# ============================================================
+# COMPARACIÓN ANTES / DESPUÉS
+# ============================================================
+
+def medir_consultas(conn, motor: str, anio: int, repeticiones: int = 3) -> Dict[str, float]:
+    """
+    Ejecuta CONSULTAS_CARGA (una vez para calentar la caché y luego
+    `repeticiones` veces) y devuelve el mejor tiempo de cada una.
+
+    Returns:
+        Dict: {consulta: segundos}
+    """
+    parametro = '%s' if motor == MOTOR_POSTGRESQL else '?'
+    tabla = TABLA_POR_MOTOR[motor]
+    tiempos = {}
+    cursor = conn.cursor()
+    for nombre, plantilla in CONSULTAS_CARGA.items():
+        sql = plantilla.format(tabla=tabla, p=parametro)
+        argumentos = (anio,) if '{p}' in plantilla else ()
+
+        def ejecutar():
+            inicio = time.perf_counter()
+            if motor == MOTOR_POSTGRESQL:
+                cursor.execute(sql, argumentos)
+            else:
+                cursor.execute(sql, *argumentos)
+            cursor.fetchall()
+            return time.perf_counter() - inicio
+
+        ejecutar()  # calentamiento
+        tiempos[nombre] = min(ejecutar() for _ in range(max(repeticiones, 1)))
+    conn.commit()
+    cursor.close()
+    return tiempos
+
+def comparar(conn, motor: str, anio: int, repeticiones: int = 3) -> List[Dict]:
+    """
+    Mide CONSULTAS_CARGA sin los índices de la carga de trabajo, los crea
+    y vuelve a medir. Al terminar los índices quedan creados.
+
+    Returns:
+        List[Dict]: consulta, antes, despues (segundos), mejora (veces)
+    """
+    cursor = conn.cursor()
+    eliminar_indices(cursor, motor)
+    conn.commit()
+    cursor.close()
+    antes = medir_consultas(conn, motor, anio, repeticiones)
+
+    indexar(conn, motor)
+    despues = medir_consultas(conn, motor, anio, repeticiones)
+
+    return [{'consulta': nombre, 'antes': antes[nombre], 'despues': despues[nombre],
+             'mejora': antes[nombre] / despues[nombre] if despues[nombre] else float('inf')}
+            for nombre in CONSULTAS_CARGA]
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+if __name__ == "__main__":
+    from migrar_y_reportar import CONFIG_PG_HISTORICO, conectar_postgresql, conectar_sqlserver
+
+    conexiones = {
+        MOTOR_POSTGRESQL: conectar_postgresql(CONFIG_PG_HISTORICO),
+        MOTOR_SQLSERVER: conectar_sqlserver(),
+    }
+    if not all(conexiones.values()):
+        sys.exit(1)
+
+    for motor, conn in conexiones.items():
+        particion = MAPA_PARTICIONES.particion_de_motor(motor)
+        print("\n" + "="*80)
+        print(f"{TABLA_POR_MOTOR[motor]} ({particion})")
+        print("="*80)
+
+        if '--crear' in sys.argv:
+            segundos = indexar(conn, motor)
+            print(f"✓ Índices creados en {segundos:.1f} s: "
+                  f"{', '.join(i['nombre'] for i in INDICES[motor])}")
+
+        elif '--comparar' in sys.argv:
+            anios = MAPA_PARTICIONES.anios(particion) if particion else ()
+            if not anios:
+                print("  Sin años asignados, se omite")
+                continue
+            print(f"{'Consulta':<28}{'Sin índices':>14}{'Con índices':>14}{'Mejora':>10}")
+            for fila in comparar(conn, motor, anios[-1]):
+                print(f"{fila['consulta']:<28}{fila['antes'] * 1000:>11.1f} ms"
+                      f"{fila['despues'] * 1000:>11.1f} ms{fila['mejora']:>9.1f}x")
+
+        else:
+            sugerencias = sugerir_indices(conn, motor)
+            if not sugerencias:
+                print("✓ Las consultas registradas ya están cubiertas por índices")
+            for sugerencia in sugerencias:
+                print(f"• {sugerencia['usos']:,} usos, peso {sugerencia['peso']:,.0f}")
+                print(f"  {sugerencia['ddl']}")
+
+        conn.close()
@@ -0,0 +1,186 @@
+"""
+============================================================
+CACHÉ DE RESULTADOS - MIDDLEWARE DE PARTICIONAMIENTO
+============================================================
+
+Caché en memoria para las consultas de lectura, indexado por
+función y argumentos:
+
+  • TTL por partición: las entradas viven lo que permita la
+    partición más volátil de la que dependen (None = sin
+    vencimiento, p. ej. años históricos)
+  • Tamaño máximo con expulsión LRU
+  • Invalidación explícita cuando se escribe en una partición
+  • Contadores de aciertos y fallos
+  • Seguro para uso concurrente (threading)
+============================================================
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+
+class CacheResultados:
+    """
+    Caché LRU con vencimiento por partición.
+
+    Args:
+        ttl_por_particion: {partición: segundos o None para no vencer}
+        max_entradas: Máximo de resultados guardados; al superarlo se
+                      expulsa el usado hace más tiempo
+    """
+
+    def __init__(self, ttl_por_particion: Dict[str, Optional[float]],
+                 max_entradas: int = 256):
+        if max_entradas < 1:
+            raise ValueError("max_entradas debe ser al menos 1")
+
+        self.ttl_por_particion = dict(ttl_por_particion)
+        self.max_entradas = max_entradas
+
+        self._lock = threading.Lock()
+        # clave → (valor, vencimiento o None, particiones)
+        self._entradas: OrderedDict = OrderedDict()
+        # Se incrementa con cada invalidación; un resultado calculado antes
+        # de una invalidación de su partición no se guarda
+        self._generaciones = {p: 0 for p in self.ttl_por_particion}
+
+        # Estadísticas
+        self._aciertos = 0
+        self._fallos = 0
+        self._expiradas = 0
+        self._expulsadas = 0
+        self._invalidadas = 0
+
+    # --------------------------------------------------------
+    # Lectura y escritura
+    # --------------------------------------------------------
+
+    def _vencimiento(self, particiones: Iterable[str]) -> Optional[float]:
+        ttls = [self.ttl_por_particion.get(p) for p in particiones]
+        ttls = [t for t in ttls if t is not None]
+        return time.monotonic() + min(ttls) if ttls else None
+
+    def obtener(self, clave):
+        """
+        Returns:
+            Tuple[bool, object]: (encontrado, valor)
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                valor, vence, _ = entrada
+                if vence is None or time.monotonic() < vence:
+                    self._entradas.move_to_end(clave)
+                    self._aciertos += 1
+                    return True, valor
+                del self._entradas[clave]
+                self._expiradas += 1
+            self._fallos += 1
+            return False, None
+
+    def generaciones(self, particiones: Iterable[str]) -> tuple:
+        """Marca de las particiones, para pasarla a guardar() tras calcular el valor."""
+        with self._lock:
+            return tuple(self._generaciones.get(p, 0) for p in particiones)
+
+    def guardar(self, clave, valor, particiones: Iterable[str], generaciones: tuple = None):
+        """
+        Guarda un resultado que depende de las particiones indicadas.
+
+        Args:
+            generaciones: Valor de generaciones() tomado antes de calcular;
+                          si alguna partición se invalidó desde entonces el
+                          resultado ya está desactualizado y se descarta
+        """
+        particiones = tuple(particiones)
+        with self._lock:
+            actuales = tuple(self._generaciones.get(p, 0) for p in particiones)
+            if generaciones is not None and generaciones != actuales:
+                return
+            self._entradas[clave] = (valor, self._vencimiento(particiones), particiones)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self._expulsadas += 1
+
+    def invalidar(self, particion: str):
+        """Descarta los resultados que dependen de una partición."""
+        with self._lock:
+            self._generaciones[particion] = self._generaciones.get(particion, 0) + 1
+            claves = [c for c, (_, _, particiones) in self._entradas.items()
+                      if particion in particiones]
+            for clave in claves:
+                del self._entradas[clave]
+            self._invalidadas += len(claves)
+
+    def limpiar(self):
+        """Descarta todos los resultados guardados."""
+        with self._lock:
+            for particion in self._generaciones:
+                self._generaciones[particion] += 1
+            self._entradas.clear()
+
+    # --------------------------------------------------------
+    # Decorador
+    # --------------------------------------------------------
+
+    def cacheado(self, particiones: Callable[..., Iterable[str]],
+                 guardar_si: Callable[[object], bool] = None):
+        """
+        Decorador que guarda el resultado de la función por argumentos.
+
+        Las excepciones no se guardan: la siguiente llamada vuelve a consultar.
+
+        Args:
+            particiones: Función que recibe los mismos argumentos y devuelve
+                         las particiones de las que depende el resultado
+            guardar_si: Función opcional sobre el resultado; si devuelve False
+                        (p. ej. resultado parcial) no se guarda
+        """
+
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                clave = (funcion.__qualname__, args, tuple(sorted(kwargs.items())))
+                encontrado, valor = self.obtener(clave)
+                if encontrado:
+                    return valor
+
+                dependencias = tuple(particiones(*args, **kwargs))
+                marca = self.generaciones(dependencias)
+                valor = funcion(*args, **kwargs)
+                if guardar_si is None or guardar_si(valor):
+                    self.guardar(clave, valor, dependencias, marca)
+                return valor
+            return envoltura
+        return decorador
+
+    # --------------------------------------------------------
+    # Estadísticas
+    # --------------------------------------------------------
+
+    def estadisticas(self) -> Dict:
+        """
+        Devuelve las métricas del caché.
+
+        Returns:
+            Dict: solicitudes, aciertos, fallos, tasa_aciertos, entradas,
+                  expiradas, expulsadas, invalidadas
+        """
+
+        with self._lock:
+            solicitudes = self._aciertos + self._fallos
+            return {
+                'solicitudes': solicitudes,
+                'aciertos': self._aciertos,
+                'fallos': self._fallos,
+                'tasa_aciertos': self._aciertos / solicitudes if solicitudes else 0.0,
+                'entradas': len(self._entradas),
+                'expiradas': self._expiradas,
+                'expulsadas': self._expulsadas,
+                'invalidadas': self._invalidadas,
+            }
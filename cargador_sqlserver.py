@@ -0,0 +1,269 @@
+"""
+============================================================
+CARGADOR MASIVO - SQL SERVER (REPOSITORIO OPERACIONAL)
+============================================================
+
+Carga masiva de créditos en CreditosActuales usando
+fast_executemany de pyodbc:
+
+  • Lotes de tamaño configurable
+  • Una transacción por lote
+  • En recargas completas se deshabilitan los índices
+    no agrupados y se reconstruyen al terminar
+
+Ejecutar este archivo directamente prueba el cargador contra
+una conexión local simulada (sqlite3), sin SQL Server:
+
+    python cargador_sqlserver.py
+============================================================
+"""
+
+import sqlite3
+import sys
+import time
+from itertools import islice
+from typing import Callable, Iterable, List, Optional, Tuple
+
+COLUMNAS_ACTUALES = (
+    'genero', 'edad', 'etnia', 'zona', 'distrito_mies', 'provincia', 'canton',
+    'parroquia', 'tipo_zona', 'tipo_credito', 'tipo_actividad', 'actividad',
+    'numero_cdh', 'tipo_subsidio', 'cdh_activos', 'anio'
+)
+
+
+class CargadorSQLServer:
+    """
+    Inserta registros en una tabla de SQL Server por lotes.
+
+    Args:
+        conn: Conexión pyodbc (o un objeto compatible)
+        tabla: Tabla destino
+        columnas: Columnas en el orden de los registros
+        tamano_lote: Registros enviados y confirmados por transacción
+    """
+
+    def __init__(self, conn, tabla: str = 'CreditosActuales',
+                 columnas: Tuple[str, ...] = COLUMNAS_ACTUALES,
+                 tamano_lote: int = 10000):
+        if tamano_lote < 1:
+            raise ValueError("tamano_lote debe ser mayor a 0")
+
+        self.conn = conn
+        self.tabla = tabla
+        self.columnas = columnas
+        self.tamano_lote = tamano_lote
+        self.sql_insert = (
+            f"INSERT INTO {tabla} ({', '.join(columnas)}) "
+            f"VALUES ({', '.join('?' * len(columnas))})"
+        )
+
+    def cargar(self, registros: Iterable[Tuple], recarga_completa: bool = False,
+               progreso: bool = True,
+               al_confirmar: Optional[Callable] = None) -> int:
+        """
+        Carga los registros en lotes de tamano_lote.
+
+        Args:
+            registros: Tuplas en el orden de columnas (puede ser un cursor)
+            recarga_completa: Deshabilitar índices no agrupados durante la carga
+            progreso: Mostrar el avance por consola
+            al_confirmar: Función (cursor, lote) ejecutada dentro de la
+                          transacción de cada lote, justo antes del commit
+
+        Returns:
+            int: Registros cargados
+        """
+
+        indices = self.deshabilitar_indices() if recarga_completa else []
+        cursor = self.conn.cursor()
+        cursor.fast_executemany = True
+        total = 0
+
+        try:
+            iterador = iter(registros)
+            while True:
+                lote = list(islice(iterador, self.tamano_lote))
+                if not lote:
+                    break
+                try:
+                    cursor.executemany(self.sql_insert, lote)
+                    if al_confirmar:
+                        al_confirmar(cursor, lote)
+                    self.conn.commit()
+                except Exception:
+                    self.conn.rollback()
+                    raise
+                total += len(lote)
+                if progreso:
+                    print(f"  ✓ {total:,} registros...", end='\r')
+        finally:
+            cursor.close()
+            if indices:
+                self.reconstruir_indices(indices)
+
+        if progreso:
+            print()
+        return total
+
+    def deshabilitar_indices(self) -> List[str]:
+        """
+        Deshabilita los índices no agrupados de la tabla (el agrupado/PK se
+        mantiene, de lo contrario la tabla queda inaccesible).
+
+        Returns:
+            List[str]: Nombres de los índices deshabilitados
+        """
+
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT i.name
+            FROM sys.indexes i
+            WHERE i.object_id = OBJECT_ID(?)
+              AND i.type_desc = 'NONCLUSTERED'
+              AND i.is_disabled = 0
+        """, (self.tabla,))
+        indices = [row[0] for row in cursor.fetchall()]
+
+        for indice in indices:
+            cursor.execute(f"ALTER INDEX [{indice}] ON {self.tabla} DISABLE")
+        self.conn.commit()
+        cursor.close()
+        return indices
+
+    def reconstruir_indices(self, indices: List[str]):
+        """Reconstruye (y con ello rehabilita) los índices indicados."""
+
+        cursor = self.conn.cursor()
+        for indice in indices:
+            cursor.execute(f"ALTER INDEX [{indice}] ON {self.tabla} REBUILD")
+        self.conn.commit()
+        cursor.close()
+
+
+# ============================================================
+# CONEXIÓN LOCAL SIMULADA (PRUEBAS SIN SQL SERVER)
+# ============================================================
+
+class _CursorODBCLocal:
+    """Cursor estilo pyodbc sobre sqlite3; registra las sentencias de índices."""
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+        self._cursor = conexion._sqlite.cursor()
+        self.fast_executemany = False
+
+    def execute(self, sql, parametros=()):
+        texto = sql.strip()
+        if texto.startswith('ALTER INDEX'):
+            self._conexion.sentencias_indices.append(texto)
+            return self
+        if 'sys.indexes' in texto:
+            self._filas_indices = [(nombre,) for nombre in self._conexion.indices]
+            return self
+        self._filas_indices = None
+        self._cursor.execute(sql, parametros)
+        return self
+
+    def executemany(self, sql, filas):
+        self._conexion.lotes.append((len(filas), self.fast_executemany))
+        self._cursor.executemany(sql, filas)
+
+    def fetchall(self):
+        if self._filas_indices is not None:
+            return self._filas_indices
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionODBCLocal:
+    """
+    Sustituto local de una conexión pyodbc para probar el cargador.
+
+    Guarda los datos en sqlite3 en memoria (que también usa parámetros '?')
+    y registra cada lote enviado y cada sentencia ALTER INDEX.
+    """
+
+    def __init__(self, tabla: str = 'CreditosActuales',
+                 columnas: Tuple[str, ...] = COLUMNAS_ACTUALES,
+                 indices: Tuple[str, ...] = ()):
+        self._sqlite = sqlite3.connect(':memory:')
+        self._sqlite.execute(f"CREATE TABLE {tabla} ({', '.join(columnas)})")
+        self.indices = list(indices)
+        self.lotes: List[Tuple[int, bool]] = []
+        self.sentencias_indices: List[str] = []
+        self.commits = 0
+
+    def cursor(self):
+        return _CursorODBCLocal(self)
+
+    def commit(self):
+        self.commits += 1
+        self._sqlite.commit()
+
+    def rollback(self):
+        self._sqlite.rollback()
+
+    def close(self):
+        self._sqlite.close()
+
+
+class VerificacionFallida(Exception):
+    """La carga simulada no produjo el resultado esperado."""
+
+
+def _comprobar(condicion: bool, mensaje: str):
+    # Explícito en lugar de assert: python -O elimina los assert
+    if not condicion:
+        raise VerificacionFallida(mensaje)
+
+
+def _probar_cargador(total: int = 234513, tamano_lote: int = 10000):
+    """
+    Carga registros sintéticos en la conexión simulada y verifica el resultado.
+
+    Raises:
+        VerificacionFallida: si alguna comprobación no se cumple
+    """
+
+    conn = ConexionODBCLocal(indices=('IX_CreditosActuales_Provincia',))
+    cargador = CargadorSQLServer(conn, tamano_lote=tamano_lote)
+    registros = (
+        ('FEMENINO', 30 + i % 40, 'MESTIZO', 'ZONA 8', 'GUAYAQUIL', 'GUAYAS',
+         'GUAYAQUIL', 'TARQUI', 'URBANA', 'INDIVIDUAL', 'COMERCIO', 'VENTA',
+         1, 'BDH', 1, 2025)
+        for i in range(total)
+    )
+
+    inicio = time.perf_counter()
+    cargados = cargador.cargar(registros, recarga_completa=True)
+    segundos = time.perf_counter() - inicio
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM CreditosActuales")
+    en_tabla = cursor.fetchall()[0][0]
+    lotes_esperados = -(-total // tamano_lote)
+
+    _comprobar(cargados == total == en_tabla,
+               f"{total:,} registros enviados, {cargados:,} informados, {en_tabla:,} en la tabla")
+    _comprobar(len(conn.lotes) == lotes_esperados,
+               f"{len(conn.lotes)} lotes; se esperaban {lotes_esperados}")
+    _comprobar(conn.commits >= lotes_esperados,
+               f"{conn.commits} commits para {lotes_esperados} lotes")
+    _comprobar(all(fast for _, fast in conn.lotes), "fast_executemany no activado")
+    _comprobar(conn.sentencias_indices == [
+        'ALTER INDEX [IX_CreditosActuales_Provincia] ON CreditosActuales DISABLE',
+        'ALTER INDEX [IX_CreditosActuales_Provincia] ON CreditosActuales REBUILD',
+    ], f"sentencias de índices inesperadas: {conn.sentencias_indices}")
+
+    print(f"✓ {cargados:,} registros en {len(conn.lotes)} lotes ({segundos:.2f} s)")
+    print(f"✓ Índices deshabilitados y reconstruidos: {len(conn.indices)}")
+
+
+if __name__ == "__main__":
+    try:
+        _probar_cargador()
+    except VerificacionFallida as e:
+        print(f"✗ Verificación del cargador: {e}")
+        sys.exit(1)
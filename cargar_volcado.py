@@ -0,0 +1,516 @@
+"""
+============================================================
+CARGA DIRECTA DESDE EL VOLCADO bonoleccion.sql
+============================================================
+
+bonoleccion.sql es un volcado de pg_dump en formato custom
+(PGDMP) con los datos de public.table1. En lugar de
+restaurarlo en una base bonoleccion y volver a leerlo, este
+cargador lee el bloque COPY del archivo y envía cada fila
+directamente a su partición según "AÑO":
+
+  • Lector nativo del formato custom (cabecera, TOC y
+    bloques de datos comprimidos con zlib), sin dependencias
+  • Alternativa: pg_restore --data-only -f - (--pg-restore),
+    para versiones del formato que el lector no admite
+  • Las filas del histórico pasan a COPY en PostgreSQL sin
+    convertirse (mismo formato de texto); las del año actual
+    se convierten y van al cargador por lotes de SQL Server
+  • Una sola lectura del volcado, con un hilo y una cola
+    acotada por partición: memoria constante
+
+    python cargar_volcado.py [bonoleccion.sql] [--pg-restore]
+============================================================
+"""
+
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from cargador_sqlserver import CargadorSQLServer
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+from migrar_y_reportar import (
+    CONFIG_PG_HISTORICO, COLUMNAS_FUENTE, COLUMNAS_DESTINO,
+    conectar_postgresql, conectar_sqlserver,
+    crear_tabla_historica_pg, crear_tabla_actual_sql,
+    indexar_tablas, reconstruir_resumenes
+)
+
+RUTA_VOLCADO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bonoleccion.sql')
+TABLA_FUENTE = 'table1'
+
+# Versiones del formato custom (pg_backup_archiver.h)
+_VERSION_MINIMA = (1, 12)
+_VERSION_TABLEAM = (1, 14)
+_VERSION_ALGORITMO = (1, 15)
+_VERSION_RELKIND = (1, 16)
+
+_BLOQUE_DATOS = 1
+_POSICION_CONOCIDA = 2
+
+# Columnas numéricas de COLUMNAS_DESTINO (se convierten para SQL Server)
+_ENTEROS = {1, 12, 14, 15}  # edad, numero_cdh, cdh_activos, anio
+
+_ESCAPES_COPY = {b'b': b'\b', b'f': b'\f', b'n': b'\n', b'r': b'\r',
+                 b't': b'\t', b'v': b'\v', b'\\': b'\\'}
+
+
+# ============================================================
+# LECTOR DEL FORMATO CUSTOM
+# ============================================================
+
+class ArchivoVolcado:
+    """
+    Lectura de un volcado pg_dump en formato custom (-Fc).
+
+    Args:
+        ruta: Archivo del volcado
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._archivo = open(ruta, 'rb')
+        try:
+            self._leer_cabecera()
+            self.entradas = self._leer_toc()
+        except Exception:
+            self._archivo.close()
+            raise
+
+    def cerrar(self):
+        self._archivo.close()
+
+    # --------------------------------------------------------
+    # Tipos básicos
+    # --------------------------------------------------------
+
+    def _byte(self) -> int:
+        dato = self._archivo.read(1)
+        if not dato:
+            raise ValueError("Fin inesperado del volcado")
+        return dato[0]
+
+    def _entero(self) -> int:
+        """Entero con byte de signo y magnitud little-endian de tamano_entero bytes."""
+        negativo = self._byte()
+        valor = int.from_bytes(self._archivo.read(self.tamano_entero), 'little')
+        return -valor if negativo else valor
+
+    def _texto(self) -> Optional[str]:
+        largo = self._entero()
+        if largo < 0:
+            return None
+        return self._archivo.read(largo).decode('utf-8')
+
+    def _posicion(self) -> Tuple[int, int]:
+        bandera = self._byte()
+        return bandera, int.from_bytes(self._archivo.read(self.tamano_posicion), 'little')
+
+    # --------------------------------------------------------
+    # Cabecera y tabla de contenidos
+    # --------------------------------------------------------
+
+    def _leer_cabecera(self):
+        if self._archivo.read(5) != b'PGDMP':
+            raise ValueError(f"{self.ruta} no es un volcado de pg_dump en formato custom")
+        self.version = (self._byte(), self._byte())
+        self._byte()  # revisión
+        if self.version < _VERSION_MINIMA:
+            raise ValueError(f"Versión de volcado {self.version} no admitida; usa --pg-restore")
+        self.tamano_entero = self._byte()
+        self.tamano_posicion = self._byte()
+        if self._byte() != 1:
+            raise ValueError("Solo se admite el formato custom (pg_dump -Fc)")
+
+        if self.version >= _VERSION_ALGORITMO:
+            algoritmo = self._byte()  # 0 = ninguno, 1 = gzip, 2 = lz4, 3 = zstd
+            if algoritmo not in (0, 1):
+                raise ValueError(f"Compresión {algoritmo} no admitida; usa --pg-restore")
+            self.comprimido = algoritmo == 1
+        else:
+            self.comprimido = self._entero() != 0
+
+        for _ in range(7):  # fecha del volcado
+            self._entero()
+        self.base_datos = self._texto()
+        self.version_servidor = self._texto()
+        self.version_pg_dump = self._texto()
+
+    def _leer_toc(self) -> List[Dict]:
+        entradas = []
+        for _ in range(self._entero()):
+            entrada = {'id': self._entero(), 'tiene_datos': bool(self._entero())}
+            self._texto(), self._texto()  # tableoid, oid
+            entrada['nombre'] = self._texto()
+            entrada['tipo'] = self._texto()
+            self._entero()  # sección
+            self._texto(), self._texto()  # definición, DROP
+            entrada['copy'] = self._texto()
+            entrada['esquema'] = self._texto()
+            self._texto()  # tablespace
+            if self.version >= _VERSION_TABLEAM:
+                self._texto()
+            if self.version >= _VERSION_RELKIND:
+                self._entero()
+            self._texto(), self._texto()  # dueño, with oids
+            while self._texto() is not None:  # dependencias
+                pass
+            bandera, posicion = self._posicion()
+            entrada['posicion'] = posicion if bandera == _POSICION_CONOCIDA else None
+            entradas.append(entrada)
+        self._inicio_datos = self._archivo.tell()
+        return entradas
+
+    # --------------------------------------------------------
+    # Datos
+    # --------------------------------------------------------
+
+    def _buscar_bloque(self, entrada: Dict):
+        """Deja el archivo al inicio de los fragmentos del bloque de la entrada."""
+        if entrada['posicion'] is not None:
+            self._archivo.seek(entrada['posicion'])
+            if self._byte() != _BLOQUE_DATOS or self._entero() != entrada['id']:
+                raise ValueError(f"Posición inválida para los datos de {entrada['nombre']}")
+            return
+
+        # Volcado escrito a un pipe: sin posiciones, recorrer los bloques en orden
+        self._archivo.seek(self._inicio_datos)
+        while True:
+            tipo = self._byte()
+            identificador = self._entero()
+            if tipo == _BLOQUE_DATOS and identificador == entrada['id']:
+                return
+            while True:
+                largo = self._entero()
+                if largo == 0:
+                    break
+                self._archivo.seek(largo, os.SEEK_CUR)
+
+    def _fragmentos(self) -> Iterator[bytes]:
+        descompresor = zlib.decompressobj() if self.comprimido else None
+        while True:
+            largo = self._entero()
+            if largo == 0:
+                break
+            datos = self._archivo.read(largo)
+            yield descompresor.decompress(datos) if descompresor else datos
+        if descompresor:
+            yield descompresor.flush()
+
+    def datos_tabla(self, tabla: str) -> Tuple[List[str], Iterator[bytes]]:
+        """
+        Columnas y líneas COPY (texto, sin el salto de línea) de una tabla.
+
+        Returns:
+            Tuple: (columnas en el orden de las líneas, iterador de líneas)
+        """
+        for entrada in self.entradas:
+            if entrada['tipo'] == 'TABLE DATA' and entrada['nombre'] == tabla:
+                break
+        else:
+            raise ValueError(f"El volcado no contiene datos de {tabla}")
+
+        self._buscar_bloque(entrada)
+        return columnas_copy(entrada['copy']), _lineas(self._fragmentos())
+
+
+def columnas_copy(sentencia: str) -> List[str]:
+    """'COPY public.t ("A", "B") FROM stdin;' → ['A', 'B']."""
+    coincidencia = re.search(r'\((.*)\)\s+FROM\s+stdin', sentencia, re.IGNORECASE)
+    if not coincidencia:
+        raise ValueError(f"Sentencia COPY inesperada: {sentencia[:80]}")
+    return [c.strip().strip('"') for c in coincidencia.group(1).split(',')]
+
+
+def _lineas(fragmentos: Iterator[bytes]) -> Iterator[bytes]:
+    """Parte los fragmentos en líneas y se detiene en el terminador \\."""
+    resto = b''
+    for fragmento in fragmentos:
+        lineas = (resto + fragmento).split(b'\n')
+        resto = lineas.pop()
+        for linea in lineas:
+            if linea == b'\\.':
+                return
+            yield linea
+    if resto and resto != b'\\.':
+        yield resto
+
+
+def datos_pg_restore(ruta: str, tabla: str) -> Tuple[List[str], Iterator[bytes]]:
+    """Igual que ArchivoVolcado.datos_tabla, leyendo la salida de pg_restore."""
+    proceso = subprocess.Popen(
+        ['pg_restore', '--data-only', f'--table={tabla}', '-f', '-', ruta],
+        stdout=subprocess.PIPE
+    )
+    for linea in proceso.stdout:
+        if linea.startswith(b'COPY '):
+            columnas = columnas_copy(linea.decode('utf-8'))
+            break
+    else:
+        proceso.wait()
+        raise ValueError(f"pg_restore no devolvió datos de {tabla} (código {proceso.returncode})")
+
+    def lineas():
+        try:
+            for linea in proceso.stdout:
+                linea = linea.rstrip(b'\n')
+                if linea == b'\\.':
+                    return
+                yield linea
+        finally:
+            proceso.stdout.close()
+            proceso.wait()
+
+    return columnas, lineas()
+
+
+# ============================================================
+# CARGA EN LAS PARTICIONES
+# ============================================================
+
+def _valor_copy(campo: bytes):
+    """Campo de texto COPY → str o None (\\N)."""
+    if campo == b'\\N':
+        return None
+    if b'\\' in campo:
+        campo = re.sub(rb'\\(.)', lambda m: _ESCAPES_COPY.get(m.group(1), m.group(1)), campo)
+    return campo.decode('utf-8')
+
+
+def _fila_sqlserver(campos: List[bytes]) -> Tuple:
+    valores = [_valor_copy(c) for c in campos]
+    for i in _ENTEROS:
+        if valores[i] is not None:
+            valores[i] = int(valores[i])
+    return tuple(valores)
+
+
+class CargaCancelada(Exception):
+    """El otro consumidor o el lector del volcado falló: se descarta esta carga."""
+
+
+class _ColaComoArchivo:
+    """Expone una cola de lotes de líneas COPY como archivo para copy_expert."""
+
+    def __init__(self, cola: queue.Queue, fin, cancelar):
+        self._cola = cola
+        self._fin = fin
+        self._cancelar = cancelar
+        self._pendiente = b''
+        self._desplazamiento = 0
+        self._terminado = False
+
+    def read(self, tamano=-1):
+        # Devuelve a lo sumo un lote por llamada: sin recortar un búfer creciente
+        if self._desplazamiento >= len(self._pendiente):
+            if self._terminado:
+                return b''
+            lote = self._cola.get()
+            if lote is self._cancelar:
+                raise CargaCancelada()
+            if lote is self._fin:
+                self._terminado = True
+                return b''
+            self._pendiente = b'\n'.join(lote) + b'\n'
+            self._desplazamiento = 0
+        final = len(self._pendiente) if tamano < 0 else self._desplazamiento + tamano
+        datos = self._pendiente[self._desplazamiento:final]
+        self._desplazamiento += len(datos)
+        return datos
+
+    readline = read
+
+
+def cargar_volcado(ruta: str = RUTA_VOLCADO, usar_pg_restore: bool = False,
+                   tamano_lote: int = 10000, lotes_en_cola: int = 4) -> bool:
+    """
+    Recrea las tablas destino y las llena leyendo el volcado una sola vez.
+
+    Args:
+        ruta: Volcado pg_dump -Fc con public.table1
+        usar_pg_restore: Leer los datos con pg_restore en lugar del lector nativo
+        tamano_lote: Filas por lote en las colas y en SQL Server
+        lotes_en_cola: Lotes máximos en espera por partición
+
+    Returns:
+        bool: True si la carga terminó
+    """
+    print("\n" + "="*80)
+    print("CARGA DIRECTA DESDE EL VOLCADO")
+    print("="*80)
+
+    conn_pg_historico = conectar_postgresql(CONFIG_PG_HISTORICO)
+    if not conn_pg_historico:
+        return False
+
+    conn_sql_actual = conectar_sqlserver()
+    if not conn_sql_actual:
+        conn_pg_historico.close()
+        return False
+
+    volcado = None
+    try:
+        if usar_pg_restore:
+            columnas, lineas = datos_pg_restore(ruta, TABLA_FUENTE)
+        else:
+            volcado = ArchivoVolcado(ruta)
+            print(f"  Volcado de {volcado.base_datos} (PostgreSQL {volcado.version_servidor}, "
+                  f"formato {volcado.version[0]}.{volcado.version[1]})")
+            columnas, lineas = volcado.datos_tabla(TABLA_FUENTE)
+        posiciones = [columnas.index(c.strip().strip('"')) for c in COLUMNAS_FUENTE.split(',')]
+    except (OSError, ValueError) as e:
+        print(f"✗ No se pudo leer el volcado: {e}")
+        conn_pg_historico.close()
+        conn_sql_actual.close()
+        return False
+    posicion_anio = posiciones[-1]
+
+    print("\n→ Creando tablas...")
+    crear_tabla_historica_pg(conn_pg_historico)
+    crear_tabla_actual_sql(conn_sql_actual)
+
+    # Un consumidor por motor, cada uno con su cola acotada
+    fin, cancelar = object(), object()
+    colas = {motor: queue.Queue(maxsize=lotes_en_cola) for motor in (MOTOR_POSTGRESQL, MOTOR_SQLSERVER)}
+    cargados = {MOTOR_POSTGRESQL: 0, MOTOR_SQLSERVER: 0}
+    errores = []
+    detener = threading.Event()
+
+    def cargar_pg():
+        try:
+            cursor = conn_pg_historico.cursor()
+            cursor.copy_expert(f"COPY creditos_historicos ({COLUMNAS_DESTINO}) FROM STDIN",
+                               _ColaComoArchivo(colas[MOTOR_POSTGRESQL], fin, cancelar))
+            cargados[MOTOR_POSTGRESQL] = cursor.rowcount
+            conn_pg_historico.commit()
+            cursor.close()
+        except Exception as e:
+            conn_pg_historico.rollback()
+            if not isinstance(e, CargaCancelada):
+                errores.append(e)
+            detener.set()
+
+    def cargar_sql():
+        def filas():
+            while True:
+                lote = colas[MOTOR_SQLSERVER].get()
+                if lote is cancelar:
+                    raise CargaCancelada()
+                if lote is fin:
+                    return
+                yield from (_fila_sqlserver(linea.split(b'\t')) for linea in lote)
+        try:
+            cargador = CargadorSQLServer(conn_sql_actual, tamano_lote=tamano_lote)
+            cargados[MOTOR_SQLSERVER] = cargador.cargar(filas(), recarga_completa=True, progreso=False)
+        except Exception as e:
+            if not isinstance(e, CargaCancelada):
+                errores.append(e)
+            detener.set()
+
+    def poner(motor, elemento):
+        # Si un consumidor falló nadie vacía su cola: abandonar en lugar de bloquearse
+        while not detener.is_set():
+            try:
+                colas[motor].put(elemento, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def terminar(motor):
+        # La marca final siempre llega, aunque la cola esté llena y su
+        # consumidor ya no lea: si la carga se abortó se vacía la cola y el
+        # consumidor que sigue vivo recibe `cancelar` en lugar de `fin`
+        while True:
+            marca = cancelar if detener.is_set() else fin
+            try:
+                colas[motor].put(marca, timeout=0.1)
+                return
+            except queue.Full:
+                if detener.is_set():
+                    try:
+                        while True:
+                            colas[motor].get_nowait()
+                    except queue.Empty:
+                        pass
+
+    hilos = [threading.Thread(target=cargar_pg, daemon=True),
+             threading.Thread(target=cargar_sql, daemon=True)]
+    for hilo in hilos:
+        hilo.start()
+
+    print("\n→ Leyendo el volcado y enviando cada fila a su partición...")
+    inicio = time.perf_counter()
+    lotes = {MOTOR_POSTGRESQL: [], MOTOR_SQLSERVER: []}
+    motor_de_anio: Dict[bytes, Optional[str]] = {}
+    omitidas = leidas = 0
+    try:
+        for linea in lineas:
+            if detener.is_set():
+                break
+            leidas += 1
+            campos = linea.split(b'\t')
+            anio = campos[posicion_anio]
+            if anio not in motor_de_anio:
+                particion = None if anio == b'\\N' else MAPA_PARTICIONES.particion_de(int(anio))
+                motor_de_anio[anio] = MAPA_PARTICIONES.motor(particion) if particion else None
+            motor = motor_de_anio[anio]
+            if motor is None:
+                omitidas += 1
+                continue
+
+            lote = lotes[motor]
+            lote.append(b'\t'.join(campos[i] for i in posiciones))
+            if len(lote) >= tamano_lote:
+                poner(motor, lote)
+                lotes[motor] = []
+                print(f"\r  {leidas:,} registros leídos", end='', flush=True)
+    except Exception as e:
+        errores.append(e)
+        detener.set()
+    finally:
+        for motor, lote in lotes.items():
+            if lote:
+                poner(motor, lote)
+            terminar(motor)
+        for hilo in hilos:
+            hilo.join()
+        if volcado is not None:
+            volcado.cerrar()
+
+    if errores:
+        print(f"\n✗ Error en la carga: {errores[0]}")
+        conn_pg_historico.close()
+        conn_sql_actual.close()
+        return False
+
+    print(f"\r  {leidas:,} registros leídos en {time.perf_counter() - inicio:.1f} s")
+    for motor, cantidad in cargados.items():
+        print(f"  ✓ {MAPA_PARTICIONES.particion_de_motor(motor)}: {cantidad:,}")
+    if omitidas:
+        print(f"  {omitidas:,} registros sin partición para su año (omitidos)")
+
+    indexar_tablas(conn_pg_historico, conn_sql_actual)
+    reconstruir_resumenes(conn_pg_historico, conn_sql_actual)
+    conn_pg_historico.close()
+    conn_sql_actual.close()
+
+    print("\n✓ CARGA COMPLETADA")
+    return True
+
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+if __name__ == "__main__":
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not cargar_volcado(argumentos[0] if argumentos else RUTA_VOLCADO,
+                          usar_pg_restore='--pg-restore' in sys.argv):
+        print("\n✗ La carga falló")
+        sys.exit(1)
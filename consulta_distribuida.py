@@ -0,0 +1,131 @@
+"""
+============================================================
+CONSULTA DISTRIBUIDA (SCATTER-GATHER)
+============================================================
+
+Ejecuta la consulta de cada partición al mismo tiempo, cada
+una en el pool de hilos de su partición, y entrega los
+resultados a medida que llegan.
+La latencia total pasa a ser max(PostgreSQL, SQL Server) en
+lugar de PostgreSQL + SQL Server.
+
+  • Tiempo límite por partición. Una consulta que lo excede
+    se abandona pero su hilo sigue ocupado hasta que el
+    servidor responde: por eso cada partición tiene sus
+    propios hilos y una partición lenta no demora a las demás
+  • Política de resultados parciales: 'parcial' devuelve lo
+    que haya llegado; 'estricto' lanza ConsultaIncompletaError
+  • Latencia de cada partición en METRICAS (operación
+    'consulta'), incluidos los tiempos límite excedidos
+============================================================
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Optional, Tuple
+
+from metricas import METRICAS
+
+# Hilos de cada partición, compartidos por todas las consultas distribuidas
+# (por encima del máximo de conexiones de cada pool)
+HILOS_POR_PARTICION = 16
+
+_EJECUTORES: Dict[str, ThreadPoolExecutor] = {}
+_LOCK_EJECUTORES = threading.Lock()
+
+
+def _ejecutor(particion: str) -> ThreadPoolExecutor:
+    with _LOCK_EJECUTORES:
+        if particion not in _EJECUTORES:
+            _EJECUTORES[particion] = ThreadPoolExecutor(
+                max_workers=HILOS_POR_PARTICION,
+                thread_name_prefix=f"particion-{particion.replace(' ', '_')}")
+        return _EJECUTORES[particion]
+
+
+POLITICA_PARCIAL = 'parcial'
+POLITICA_ESTRICTA = 'estricto'
+
+
+class ConsultaIncompletaError(Exception):
+    """Una o más particiones fallaron o excedieron su tiempo límite."""
+
+    def __init__(self, faltantes: Dict[str, str]):
+        self.faltantes = faltantes
+        detalle = ', '.join(f"{p}: {motivo}" for p, motivo in faltantes.items())
+        super().__init__(f"Consulta incompleta ({detalle})")
+
+
+def consultar_particiones(consultas: Dict[str, Callable[[], object]],
+                          al_llegar: Optional[Callable[[str, object], None]] = None,
+                          tiempo_limite: Optional[Dict[str, float]] = None,
+                          politica: str = POLITICA_PARCIAL) -> Tuple[Dict, Dict]:
+    """
+    Lanza una consulta por partición en paralelo y recoge los resultados.
+
+    Args:
+        consultas: {partición: función sin argumentos que devuelve su resultado}
+        al_llegar: Función (partición, resultado) llamada apenas llega cada
+                   resultado, para ir combinándolos
+        tiempo_limite: {partición: segundos}; las particiones ausentes no tienen límite
+        politica: 'parcial' o 'estricto'
+
+    Returns:
+        Tuple[Dict, Dict]: (resultados por partición, {partición faltante: motivo})
+
+    Raises:
+        ConsultaIncompletaError: con politica='estricto', si falta alguna partición
+    """
+
+    def medida(particion, funcion):
+        def ejecutar():
+            with METRICAS.medir(particion, 'consulta'):
+                return funcion()
+        return ejecutar
+
+    tiempo_limite = tiempo_limite or {}
+    inicio = time.monotonic()
+    futuros = {_ejecutor(particion).submit(medida(particion, funcion)): particion
+               for particion, funcion in consultas.items()}
+    vencimientos = {futuro: inicio + tiempo_limite[particion]
+                    for futuro, particion in futuros.items()
+                    if particion in tiempo_limite}
+
+    resultados = {}
+    faltantes = {}
+    pendientes = set(futuros)
+
+    while pendientes:
+        limites = [vencimientos[f] for f in pendientes if f in vencimientos]
+        espera = max(0.0, min(limites) - time.monotonic()) if limites else None
+        terminados, pendientes = wait(pendientes, timeout=espera,
+                                      return_when=FIRST_COMPLETED)
+
+        for futuro in terminados:
+            particion = futuros[futuro]
+            try:
+                resultados[particion] = futuro.result()
+            except Exception as e:
+                faltantes[particion] = str(e)
+                continue
+            if al_llegar:
+                al_llegar(particion, resultados[particion])
+
+        # Abandonar las particiones que vencieron (el hilo termina por su cuenta)
+        ahora = time.monotonic()
+        for futuro in [f for f in pendientes if vencimientos.get(f, ahora + 1) <= ahora]:
+            pendientes.discard(futuro)
+            particion = futuros[futuro]
+            # cancel() solo tiene éxito si la consulta no llegó a empezar
+            en_cola = futuro.cancel()
+            faltantes[particion] = (f"tiempo límite de {tiempo_limite[particion]}s excedido"
+                                    + (" sin hilo libre (consultas anteriores abandonadas)"
+                                       if en_cola else ""))
+            # Lo que esperó el llamador; el hilo abandonado registra su duración al terminar
+            METRICAS.observar(particion, 'consulta', ahora - inicio, error='TiempoLimite')
+
+    if faltantes and politica == POLITICA_ESTRICTA:
+        raise ConsultaIncompletaError(faltantes)
+
+    return resultados, faltantes
@@ -0,0 +1,395 @@
+"""
+============================================================
+ESCRITURA DIFERIDA - COLA DE INSERCIONES CON COMMIT AGRUPADO
+============================================================
+
+Modo opcional de insert_credito para ráfagas de inserciones:
+la fila se acepta en una cola en memoria y se confirma al
+llamador sin esperar el commit del servidor.
+
+  • Un escritor (hilo) por partición confirma en un solo
+    lote cada `tamano_grupo` filas o cada `intervalo_ms`
+    milisegundos, lo que ocurra primero
+  • Capacidad máxima por partición: si la cola está llena
+    encolar() espera (o lanza ColaLlenaError al vencer su
+    tiempo límite) en lugar de acumular sin límite
+  • Diario en disco opcional: las filas aceptadas se anotan
+    antes de confirmarlas y las pendientes se recuperan al
+    reiniciar tras una caída
+  • Si el servidor no responde (error de conexión) el lote
+    se reintenta sin límite y sus filas siguen pendientes;
+    si el servidor rechaza los datos se inserta fila por
+    fila y las rechazadas quedan en `fallidas` (y en
+    <diario>.fallidas)
+  • vaciar() espera a que todo lo aceptado esté confirmado;
+    cerrar() además deja de aceptar y detiene los escritores
+
+Una fila aceptada todavía no es visible en las consultas
+hasta que su grupo se confirma.
+============================================================
+"""
+
+import json
+import os
+import threading
+import time
+from itertools import count
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class ColaLlenaError(Exception):
+    """La cola de la partición siguió llena durante todo el tiempo de espera."""
+
+
+class _Abandonado(Exception):
+    """cerrar() dejó de esperar a un servidor caído."""
+
+
+class ColaEscritura:
+    """
+    Cola de inserciones diferidas con un escritor por partición.
+
+    Args:
+        escritores: {partición: función(filas)} que inserta las filas en una
+                    sola transacción y lanza una excepción si falla
+        tamano_grupo: Filas máximas por commit
+        intervalo_ms: Espera máxima de una fila antes de confirmarse
+        capacidad: Filas pendientes (en cola o en escritura) por partición
+        ruta_diario: Archivo del diario en disco (None = solo memoria)
+        sincronizar: fsync del diario en cada fila (sobrevive a una caída
+                     del sistema operativo, no solo del proceso; más lento)
+        errores_transitorios: Excepciones de conexión: el lote se reintenta
+                              (sin límite) en lugar de separarlo fila por fila
+        espera_max: Segundos máximos entre reintentos de un lote
+    """
+
+    def __init__(self, escritores: Dict[str, Callable[[List[Tuple]], None]],
+                 tamano_grupo: int = 500, intervalo_ms: float = 50.0,
+                 capacidad: int = 10000, ruta_diario: Optional[str] = None,
+                 sincronizar: bool = False,
+                 errores_transitorios: Tuple[type, ...] = (ConnectionError,),
+                 espera_max: float = 5.0):
+        if tamano_grupo < 1 or capacidad < tamano_grupo:
+            raise ValueError("Se requiere 1 <= tamano_grupo <= capacidad")
+
+        self.escritores = dict(escritores)
+        self.tamano_grupo = tamano_grupo
+        self.intervalo = intervalo_ms / 1000
+        self.capacidad = capacidad
+        self.ruta_diario = ruta_diario
+        self.sincronizar = sincronizar
+        self.errores_transitorios = errores_transitorios
+        self.espera_max = espera_max
+
+        self._condicion = threading.Condition()
+        self._pendientes: Dict[str, List[Tuple[int, Tuple]]] = {p: [] for p in self.escritores}
+        self._cupos = {p: threading.BoundedSemaphore(capacidad) for p in self.escritores}
+        self._orden = {p: threading.Lock() for p in self.escritores}
+        self._secuencia = count(1)
+        self._forzar = threading.Event()
+        self._detener = threading.Event()
+        self._cerrada = False
+        self.fallidas: List[Tuple[str, Tuple, str]] = []  # (partición, fila, error)
+
+        # Estadísticas
+        self._encoladas = {p: 0 for p in self.escritores}
+        self._procesadas = {p: 0 for p in self.escritores}
+        self._grupos = 0
+        self._reintentos_hechos = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+        self._diario = None
+        self._confirmado: Dict[str, int] = {}
+        recuperadas = self._abrir_diario() if ruta_diario else []
+
+        self._escritores = [
+            threading.Thread(target=self._escribir, args=(particion,), daemon=True,
+                             name=f'escritura-{particion}')
+            for particion in self.escritores
+        ]
+        for hilo in self._escritores:
+            hilo.start()
+
+        for secuencia, particion, fila in recuperadas:
+            self._aceptar(particion, fila, None, secuencia=secuencia)
+        if recuperadas:
+            print(f"✓ {len(recuperadas):,} filas pendientes recuperadas del diario")
+
+    # --------------------------------------------------------
+    # Aceptación
+    # --------------------------------------------------------
+
+    def encolar(self, particion: str, fila: Tuple, timeout: Optional[float] = None):
+        """
+        Acepta una fila para su partición. Al volver la fila está en la cola
+        (y en el diario, si lo hay); se confirmará en segundo plano.
+
+        Args:
+            particion: Partición destino (ver MAPA_PARTICIONES)
+            fila: Valores en el orden de COLUMNAS_CREDITO
+            timeout: Segundos máximos esperando lugar (None = sin límite)
+
+        Raises:
+            ColaLlenaError: si no hubo lugar dentro de timeout
+            KeyError: si la partición no tiene escritor
+        """
+        if self._cerrada:
+            raise RuntimeError("La cola de escritura está cerrada")
+        self._aceptar(particion, tuple(fila), timeout)
+
+    def _aceptar(self, particion: str, fila: Tuple, timeout: Optional[float],
+                 secuencia: Optional[int] = None):
+        cupos = self._cupos[particion]
+        inicio = time.monotonic()
+        if not cupos.acquire(timeout=timeout):
+            raise ColaLlenaError(f"Cola de {particion} llena ({self.capacidad:,} filas) "
+                                 f"tras {timeout}s")
+        espera = time.monotonic() - inicio
+
+        # Secuencia, diario y cola en el mismo orden dentro de la partición:
+        # el punto de control de una partición es la última secuencia confirmada
+        with self._orden[particion]:
+            if secuencia is None:
+                secuencia = next(self._secuencia)
+                if self._diario is not None:
+                    self._anotar(secuencia, particion, fila)
+            with self._condicion:
+                self._pendientes[particion].append((secuencia, fila))
+                self._encoladas[particion] += 1
+                self._espera_total += espera
+                self._espera_max = max(self._espera_max, espera)
+                self._condicion.notify_all()
+
+    # --------------------------------------------------------
+    # Escritores
+    # --------------------------------------------------------
+
+    def _siguiente_grupo(self, particion: str) -> List[Tuple[int, Tuple]]:
+        """Espera la primera fila y junta más hasta tamano_grupo o intervalo_ms."""
+        pendientes = self._pendientes[particion]
+        with self._condicion:
+            while not pendientes or self._detener.is_set():
+                if self._detener.is_set():
+                    return []
+                self._condicion.wait(0.1)
+            limite = time.monotonic() + self.intervalo
+            while len(pendientes) < self.tamano_grupo and not self._forzar.is_set():
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._condicion.wait(restante)
+            grupo = pendientes[:self.tamano_grupo]
+            del pendientes[:self.tamano_grupo]
+            return grupo
+
+    def _escribir(self, particion: str):
+        while True:
+            grupo = self._siguiente_grupo(particion)
+            if not grupo:
+                return
+            filas = [fila for _, fila in grupo]
+            rechazadas = []
+
+            try:
+                self._insertar(particion, filas)
+            except _Abandonado:
+                return  # cerrar() venció con el servidor caído: las filas quedan en el diario
+            except Exception:
+                try:
+                    rechazadas = self._escribir_de_a_una(particion, filas)
+                except _Abandonado:
+                    return
+
+            with self._condicion:
+                self._grupos += 1
+                self._procesadas[particion] += len(grupo)
+                self.fallidas.extend(rechazadas)
+                self._condicion.notify_all()
+            if self._diario is not None:
+                self._marcar_confirmado(particion, grupo[-1][0], rechazadas)
+            for _ in grupo:
+                self._cupos[particion].release()
+
+    def _insertar(self, particion: str, filas: List[Tuple]):
+        """
+        Inserta las filas; ante un error de conexión espera y reintenta hasta
+        que el servidor vuelva. Cualquier otro error se propaga.
+        """
+        escribir = self.escritores[particion]
+        intento = 0
+        while True:
+            try:
+                escribir(filas)
+                if intento:
+                    print(f"✓ {particion} respondió de nuevo tras {intento} reintentos")
+                return
+            except self.errores_transitorios as e:
+                if intento == 0:
+                    print(f"✗ {particion} no responde ({e}); las filas siguen pendientes")
+                if self._detener.is_set():
+                    raise _Abandonado()
+                with self._condicion:
+                    self._reintentos_hechos += 1
+                self._detener.wait(min(0.1 * 2 ** intento, self.espera_max))
+                intento += 1
+
+    def _escribir_de_a_una(self, particion: str, filas: List[Tuple]) -> List[Tuple[str, Tuple, str]]:
+        """Aísla las filas con datos inválidos de un lote que el servidor rechazó."""
+        rechazadas = []
+        for fila in filas:
+            try:
+                self._insertar(particion, [fila])
+            except _Abandonado:
+                raise
+            except Exception as e:
+                rechazadas.append((particion, fila, str(e)))
+        if rechazadas:
+            print(f"✗ {len(rechazadas):,} filas rechazadas por {particion}: {rechazadas[0][2]}")
+        return rechazadas
+
+    # --------------------------------------------------------
+    # Diario en disco
+    # --------------------------------------------------------
+
+    def _ruta_punto(self) -> str:
+        return f"{self.ruta_diario}.punto"
+
+    def _abrir_diario(self) -> List[Tuple[int, str, Tuple]]:
+        """
+        Lee las filas del diario no confirmadas según el punto de control,
+        reescribe el diario solo con ellas y lo deja abierto para anotar.
+        """
+        if os.path.exists(self._ruta_punto()):
+            with open(self._ruta_punto(), encoding='utf-8') as archivo:
+                self._confirmado = json.load(archivo)
+
+        recuperadas = []
+        if os.path.exists(self.ruta_diario):
+            with open(self.ruta_diario, encoding='utf-8') as archivo:
+                for linea in archivo:
+                    try:
+                        secuencia, particion, fila = json.loads(linea)
+                    except ValueError:
+                        break  # última línea a medio escribir al caer el proceso
+                    if particion in self.escritores and secuencia > self._confirmado.get(particion, 0):
+                        recuperadas.append((secuencia, particion, tuple(fila)))
+
+        # Numeración nueva desde 1: el diario compactado empieza de cero
+        recuperadas = [(i, particion, fila) for i, (_, particion, fila) in enumerate(recuperadas, 1)]
+        self._secuencia = count(len(recuperadas) + 1)
+        self._confirmado = {}
+        self._reescribir_diario(recuperadas)
+        return recuperadas
+
+    def _reescribir_diario(self, filas: Iterable[Tuple[int, str, Tuple]]):
+        temporal = f"{self.ruta_diario}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            for secuencia, particion, fila in filas:
+                archivo.write(json.dumps([secuencia, particion, fila], ensure_ascii=False) + '\n')
+        os.replace(temporal, self.ruta_diario)
+        self._guardar_punto()
+        self._diario = open(self.ruta_diario, 'a', encoding='utf-8')
+
+    def _anotar(self, secuencia: int, particion: str, fila: Tuple):
+        self._diario.write(json.dumps([secuencia, particion, fila], ensure_ascii=False) + '\n')
+        self._diario.flush()
+        if self.sincronizar:
+            os.fsync(self._diario.fileno())
+
+    def _guardar_punto(self):
+        temporal = f"{self._ruta_punto()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(self._confirmado, archivo)
+        os.replace(temporal, self._ruta_punto())
+
+    def _marcar_confirmado(self, particion: str, secuencia: int, rechazadas: List):
+        with self._condicion:
+            self._confirmado[particion] = secuencia
+            self._guardar_punto()
+            if rechazadas:
+                with open(f"{self.ruta_diario}.fallidas", 'a', encoding='utf-8') as archivo:
+                    for particion_fila, fila, error in rechazadas:
+                        archivo.write(json.dumps([particion_fila, fila, error], ensure_ascii=False) + '\n')
+
+    # --------------------------------------------------------
+    # Vaciado y cierre
+    # --------------------------------------------------------
+
+    def vaciar(self, timeout: Optional[float] = None) -> bool:
+        """
+        Confirma ya lo aceptado hasta ahora (sin esperar intervalo_ms) y
+        espera a que termine.
+
+        Returns:
+            bool: True si todo quedó confirmado dentro de timeout
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._condicion:
+            objetivo = dict(self._encoladas)
+            self._forzar.set()
+            self._condicion.notify_all()
+            try:
+                while any(self._procesadas[p] < objetivo[p] for p in objetivo):
+                    restante = None if limite is None else limite - time.monotonic()
+                    if restante is not None and restante <= 0:
+                        return False
+                    self._condicion.wait(restante)
+                return True
+            finally:
+                self._forzar.clear()
+
+    def cerrar(self, timeout: Optional[float] = None) -> bool:
+        """
+        Deja de aceptar filas, confirma las pendientes y detiene los
+        escritores. Con diario, lo compacta (queda vacío si todo se confirmó);
+        si timeout vence con un servidor caído, las filas no confirmadas
+        quedan en el diario para el próximo arranque.
+
+        Returns:
+            bool: True si todo quedó confirmado dentro de timeout
+        """
+        self._cerrada = True
+        completo = self.vaciar(timeout)
+        self._detener.set()
+        with self._condicion:
+            self._condicion.notify_all()
+        for hilo in self._escritores:
+            # Un escritor bloqueado dentro de una inserción termina al volver de ella
+            hilo.join(None if completo else 1.0)
+
+        if self._diario is not None:
+            with self._condicion:
+                self._diario.close()
+                if completo:
+                    self._secuencia = count(1)
+                    self._confirmado = {}
+                    self._reescribir_diario([])
+                    self._diario.close()
+                self._diario = None
+        return completo
+
+    # --------------------------------------------------------
+    # Estadísticas
+    # --------------------------------------------------------
+
+    def estadisticas(self) -> Dict:
+        """
+        Returns:
+            Dict: encoladas, confirmadas, fallidas, pendientes, grupos,
+                  filas_por_grupo, reintentos, espera de lugar promedio/máxima (ms)
+        """
+        with self._condicion:
+            encoladas = sum(self._encoladas.values())
+            procesadas = sum(self._procesadas.values())
+            return {
+                'encoladas': encoladas,
+                'confirmadas': procesadas - len(self.fallidas),
+                'fallidas': len(self.fallidas),
+                'pendientes': encoladas - procesadas,
+                'grupos': self._grupos,
+                'filas_por_grupo': procesadas / self._grupos if self._grupos else 0.0,
+                'reintentos': self._reintentos_hechos,
+                'espera_promedio_ms': self._espera_total / encoladas * 1000 if encoladas else 0.0,
+                'espera_max_ms': self._espera_max * 1000,
+            }
@@ -0,0 +1,251 @@
+"""
+============================================================
+EXPORTACIÓN COLUMNAR DE CRÉDITOS (PARQUET / ARROW)
+============================================================
+
+Vuelca los créditos de todas las particiones a un archivo
+columnar para análisis, en lugar de consultar las dos bases
+y procesar listas de diccionarios:
+
+  • Un lector por partición, en paralelo, con cursores de
+    servidor (ver iterar_lotes_creditos)
+  • Memoria acotada: colas limitadas y grupos de filas de
+    tamaño máximo fijo
+  • Grupos de filas por partición y año: un grupo nunca
+    mezcla años, así un lector puede saltar años completos
+  • Columnas categóricas codificadas como diccionario, con
+    el mismo diccionario (creciente) en todo el archivo
+
+    python exportar_columnar.py creditos.parquet
+    python exportar_columnar.py creditos.arrow --arrow
+    python exportar_columnar.py 2024.parquet --anios 2024
+
+Requiere pyarrow (dependencia opcional: pip install pyarrow).
+============================================================
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from main_ministerio_actualizado import iterar_lotes_creditos
+from mapa_particiones import MAPA_PARTICIONES
+from registro_compacto import CAMPOS_CREDITO
+
+# Columnas de texto con pocos valores distintos: se guardan como diccionario
+COLUMNAS_CATEGORICAS = (
+    'genero', 'etnia', 'zona', 'distrito_mies', 'provincia', 'canton', 'parroquia',
+    'tipo_zona', 'tipo_credito', 'tipo_actividad', 'actividad', 'tipo_subsidio', 'origen'
+)
+
+FILAS_POR_GRUPO = 65536
+
+
+def esquema_creditos():
+    """Esquema Arrow de un crédito (mismo orden que CAMPOS_CREDITO)."""
+    tipos = {
+        'id': pa.int64(),
+        'edad': pa.int32(),
+        'numero_cdh': pa.int32(),
+        'cdh_activos': pa.int32(),
+        'anio': pa.int32(),
+        'fecha_migracion': pa.timestamp('us'),
+    }
+    categoria = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        (campo, tipos.get(campo, categoria if campo in COLUMNAS_CATEGORICAS else pa.string()))
+        for campo in CAMPOS_CREDITO
+    ])
+
+
+class _Diccionario:
+    """Códigos estables para una columna categórica en todo el archivo."""
+
+    def __init__(self):
+        self.codigos: Dict[str, int] = {}
+        self.valores: List[str] = []
+
+    def codificar(self, valores: Iterable[Optional[str]]):
+        codigos = []
+        for valor in valores:
+            if valor is None:
+                codigos.append(None)
+                continue
+            codigo = self.codigos.get(valor)
+            if codigo is None:
+                codigo = self.codigos[valor] = len(self.valores)
+                self.valores.append(valor)
+            codigos.append(codigo)
+        # El diccionario solo crece: cada grupo es una extensión del anterior
+        return pa.DictionaryArray.from_arrays(pa.array(codigos, pa.int32()),
+                                              pa.array(self.valores, pa.string()))
+
+
+class _EscritorColumnar:
+    """Convierte créditos en grupos de filas y los escribe (un solo hilo)."""
+
+    def __init__(self, ruta: str, arrow: bool):
+        self.esquema = esquema_creditos()
+        self.diccionarios = {c: _Diccionario() for c in COLUMNAS_CATEGORICAS}
+        self.grupos = 0
+        self.filas = 0
+        if arrow:
+            opciones = pa.ipc.IpcWriteOptions(compression='zstd', emit_dictionary_deltas=True)
+            self._archivo = pa.ipc.new_file(ruta, self.esquema, options=opciones)
+            self._escribir = lambda tabla: self._archivo.write_table(tabla, max_chunksize=len(tabla))
+        else:
+            self._archivo = pq.ParquetWriter(ruta, self.esquema, compression='zstd')
+            self._escribir = lambda tabla: self._archivo.write_table(tabla, row_group_size=len(tabla))
+
+    def escribir(self, creditos: List):
+        columnas = []
+        for campo in self.esquema.names:
+            valores = [c[campo] for c in creditos]
+            if campo in self.diccionarios:
+                columnas.append(self.diccionarios[campo].codificar(valores))
+            else:
+                columnas.append(pa.array(valores, self.esquema.field(campo).type))
+        self._escribir(pa.Table.from_arrays(columnas, schema=self.esquema))
+        self.grupos += 1
+        self.filas += len(creditos)
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+def exportar(ruta: str, arrow: bool = False, anios: Optional[Iterable[int]] = None,
+             tamano_lote: int = 10000, filas_por_grupo: int = FILAS_POR_GRUPO,
+             lotes_en_cola: int = 4) -> bool:
+    """
+    Exporta los créditos a un archivo Parquet (o Arrow IPC con arrow=True).
+
+    Cada partición se lee en su propio hilo, año por año, y entrega lotes
+    a una cola acotada; el hilo principal arma los grupos de filas de cada
+    (partición, año) y los escribe. En memoria hay como mucho lotes_en_cola
+    lotes y un grupo en construcción por partición.
+
+    Args:
+        ruta: Archivo de salida
+        arrow: Escribir Arrow IPC en lugar de Parquet
+        anios: Exportar solo estos años (por defecto todos)
+        tamano_lote: Filas por viaje al servidor
+        filas_por_grupo: Máximo de filas por grupo; un año grande ocupa
+                         varios grupos consecutivos
+        lotes_en_cola: Lotes máximos en espera entre lectores y escritor
+
+    Returns:
+        bool: True si el archivo quedó completo
+    """
+    if pa is None:
+        print("✗ La exportación columnar requiere pyarrow: pip install pyarrow")
+        return False
+
+    seleccion = MAPA_PARTICIONES.particiones_de_anios(
+        MAPA_PARTICIONES.anios_validos if anios is None else anios
+    )
+    if not seleccion:
+        print("✗ Ningún año pedido pertenece a una partición")
+        return False
+
+    cola = queue.Queue(maxsize=lotes_en_cola)
+    detener = threading.Event()
+    fin = object()
+
+    def poner(elemento):
+        # Espera con tiempo límite para poder abandonar si el escritor falló
+        while not detener.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def leer(particion, anios_particion):
+        try:
+            for anio in anios_particion:
+                for lote in iterar_lotes_creditos(tamano_lote, anios=[anio]):
+                    if detener.is_set():
+                        return
+                    poner((particion, anio, lote))
+                poner((particion, anio, None))  # fin del año
+        finally:
+            poner((particion, None, fin))
+
+    print(f"\n→ Exportando a {ruta}:")
+    for particion, anios_particion in seleccion.items():
+        print(f"  • {particion}: {', '.join(str(a) for a in anios_particion)}")
+    inicio = time.perf_counter()
+    escritor = _EscritorColumnar(ruta, arrow)
+    pendientes: Dict[str, List] = {particion: [] for particion in seleccion}
+    por_anio: Dict[int, int] = {}
+
+    def vaciar(particion):
+        if pendientes[particion]:
+            escritor.escribir(pendientes[particion])
+            pendientes[particion] = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(seleccion)) as executor:
+            futuros = [executor.submit(leer, p, a) for p, a in seleccion.items()]
+            activas = len(seleccion)
+            try:
+                while activas:
+                    particion, anio, lote = cola.get()
+                    if lote is fin:
+                        activas -= 1
+                    elif lote is None:
+                        vaciar(particion)
+                        print(f"  ✓ {particion} {anio}: {por_anio.get(anio, 0):,} registros")
+                    else:
+                        por_anio[anio] = por_anio.get(anio, 0) + len(lote)
+                        pendientes[particion].extend(lote)
+                        if len(pendientes[particion]) >= filas_por_grupo:
+                            vaciar(particion)
+            finally:
+                detener.set()
+            for futuro in futuros:
+                futuro.result()
+        escritor.cerrar()
+    except Exception as e:
+        print(f"\n✗ Error exportando: {e}")
+        try:
+            escritor.cerrar()
+        except Exception:
+            pass
+        os.remove(ruta)
+        return False
+
+    tamano = os.path.getsize(ruta)
+    print(f"\n✓ {escritor.filas:,} registros en {escritor.grupos} grupos de filas, "
+          f"{tamano / 1024 / 1024:.1f} MB en {time.perf_counter() - inicio:.1f} s")
+    return True
+
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+if __name__ == "__main__":
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not argumentos:
+        print("Uso: python exportar_columnar.py <archivo> [--arrow] [--anios 2023,2024]")
+        sys.exit(1)
+
+    anios = None
+    if '--anios' in sys.argv:
+        valor = sys.argv[sys.argv.index('--anios') + 1]
+        argumentos.remove(valor)
+        anios = [int(a) for a in valor.split(',')]
+
+    if not exportar(argumentos[0], arrow='--arrow' in sys.argv, anios=anios):
+        sys.exit(1)
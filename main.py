@@ -8,10 +8,14 @@
 # - Datos ACTUALES (2025) → SQL Server
 # ============================================================
 
+import heapq
+
 import pyodbc
 import psycopg2
 from datetime import date
 
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+
 
 # ============================================================
 # 1. CONEXIÓN A POSTGRESQL (REPOSITORIO HISTÓRICO)
@@ -64,8 +68,9 @@ def insert_credito(credito_id, anio, mes, beneficiario, monto, estado="ACTIVO"):
           f"Beneficiario={beneficiario}, Monto=${monto:,.2f}, Estado={estado} ---")
     
     # Validar año
-    if anio not in [2022, 2023, 2024, 2025]:
-        print(f"✗ Error: El año {anio} no está en el rango válido (2022-2025)")
+    particion = MAPA_PARTICIONES.particion_de(anio)
+    if particion is None:
+        print(f"✗ Error: El año {anio} no está en el rango válido ({MAPA_PARTICIONES.describir()})")
         return
     
     # Validar monto
@@ -74,9 +79,9 @@ def insert_credito(credito_id, anio, mes, beneficiario, monto, estado="ACTIVO"):
         return
     
     # Decidir destino según el año
-    if anio in [2022, 2023, 2024]:
+    if MAPA_PARTICIONES.motor(particion) == MOTOR_POSTGRESQL:
         # Insertar en PostgreSQL (histórico)
-        print(f"→ El año {anio} es HISTÓRICO (2022-2024) → Insertando en PostgreSQL")
+        print(f"→ El año {anio} es HISTÓRICO ({MAPA_PARTICIONES.describir(particion)}) → Insertando en PostgreSQL")
         try:
             cursor_pg = conn_postgres.cursor()
             cursor_pg.execute(
@@ -91,9 +96,9 @@ def insert_credito(credito_id, anio, mes, beneficiario, monto, estado="ACTIVO"):
             conn_postgres.rollback()
             print(f"✗ Error al insertar en PostgreSQL: {e}")
     
-    elif anio == 2025:
+    elif MAPA_PARTICIONES.motor(particion) == MOTOR_SQLSERVER:
         # Insertar en SQL Server (operacional)
-        print(f"→ El año {anio} es ACTUAL (2025) → Insertando en SQL Server")
+        print(f"→ El año {anio} es ACTUAL ({MAPA_PARTICIONES.describir(particion)}) → Insertando en SQL Server")
         try:
             cursor_sql = conn_sqlserver.cursor()
             cursor_sql.execute(
@@ -121,10 +126,12 @@ def consultar_todos_creditos():
     print("CONSULTANDO TODOS LOS CRÉDITOS (HISTÓRICOS + ACTUALES)")
     print("="*80 + "\n")
     
-    todos_los_creditos = []
+    creditos_historicos = []
+    creditos_actuales = []
     
-    # Consultar PostgreSQL (créditos históricos 2022-2024)
-    print("→ Consultando PostgreSQL (créditos históricos 2022-2024)...")
+    # Consultar PostgreSQL (créditos históricos)
+    print(f"→ Consultando PostgreSQL (créditos históricos "
+          f"{MAPA_PARTICIONES.describir_motor(MOTOR_POSTGRESQL)})...")
     try:
         cursor_pg = conn_postgres.cursor()
         cursor_pg.execute(
@@ -135,7 +142,7 @@ def consultar_todos_creditos():
         creditos_postgres = cursor_pg.fetchall()
         
         for credito in creditos_postgres:
-            todos_los_creditos.append({
+            creditos_historicos.append({
                 'id': credito[0],
                 'anio': credito[1],
                 'mes': credito[2],
@@ -148,8 +155,9 @@ def consultar_todos_creditos():
     except Exception as e:
         print(f"✗ Error al consultar PostgreSQL: {e}")
     
-    # Consultar SQL Server (créditos actuales 2025)
-    print("→ Consultando SQL Server (créditos actuales 2025)...")
+    # Consultar SQL Server (créditos actuales)
+    print(f"→ Consultando SQL Server (créditos actuales "
+          f"{MAPA_PARTICIONES.describir_motor(MOTOR_SQLSERVER)})...")
     try:
         cursor_sql = conn_sqlserver.cursor()
         cursor_sql.execute(
@@ -160,7 +168,7 @@ def consultar_todos_creditos():
         creditos_sqlserver = cursor_sql.fetchall()
         
         for credito in creditos_sqlserver:
-            todos_los_creditos.append({
+            creditos_actuales.append({
                 'id': credito[0],
                 'anio': credito[1],
                 'mes': credito[2],
@@ -173,8 +181,9 @@ def consultar_todos_creditos():
     except Exception as e:
         print(f"✗ Error al consultar SQL Server: {e}")
     
-    # Ordenar por año y mes
-    todos_los_creditos.sort(key=lambda x: (x['anio'], x['mes']))
+    # Ambas listas ya vienen ordenadas por año y mes: basta mezclarlas
+    todos_los_creditos = list(heapq.merge(creditos_historicos, creditos_actuales,
+                                          key=lambda x: (x['anio'], x['mes'])))
     
     return todos_los_creditos
 
@@ -213,7 +222,8 @@ def imprimir_reporte_consolidado(creditos):
     print(f"\n{'RESUMEN POR AÑO:':<50}")
     print("-"*50)
     for anio in sorted(totales_por_anio.keys()):
-        origen = "PostgreSQL (Histórico)" if anio < 2025 else "SQL Server (Actual)"
+        particion = MAPA_PARTICIONES.particion_de(anio)
+        origen = f"{particion} ({MAPA_PARTICIONES.rol(particion)})" if particion else "Sin partición"
         print(f"  Año {anio}: ${totales_por_anio[anio]:>15,.2f}  ({origen})")
     
     print("-"*50)
@@ -231,7 +241,12 @@ def consultar_por_anio(anio):
     """
     print(f"\n→ Consultando créditos del año {anio}...")
     
-    if anio in [2022, 2023, 2024]:
+    particion = MAPA_PARTICIONES.particion_de(anio)
+    if particion is None:
+        print(f"✗ Error: El año {anio} no está en el rango válido ({MAPA_PARTICIONES.describir()})")
+        return []
+    
+    if MAPA_PARTICIONES.motor(particion) == MOTOR_POSTGRESQL:
         # Consultar PostgreSQL
         try:
             cursor_pg = conn_postgres.cursor()
@@ -249,7 +264,7 @@ def consultar_por_anio(anio):
             print(f"✗ Error: {e}")
             return []
     
-    elif anio == 2025:
+    elif MAPA_PARTICIONES.motor(particion) == MOTOR_SQLSERVER:
         # Consultar SQL Server
         try:
             cursor_sql = conn_sqlserver.cursor()
@@ -277,8 +292,8 @@ if __name__ == "__main__":
     print(" "*30 + "MINISTERIO DE DESARROLLO HUMANO")
     print("="*100)
     print("\nEstrategia de Particionamiento Lógico:")
-    print("  • Datos HISTÓRICOS (2022, 2023, 2024) → PostgreSQL (repositorio histórico)")
-    print("  • Datos ACTUALES (2025) → SQL Server (repositorio operacional)")
+    print(f"  • Datos HISTÓRICOS ({MAPA_PARTICIONES.describir_motor(MOTOR_POSTGRESQL)}) → PostgreSQL (repositorio histórico)")
+    print(f"  • Datos ACTUALES ({MAPA_PARTICIONES.describir_motor(MOTOR_SQLSERVER)}) → SQL Server (repositorio operacional)")
     print("="*100)
     
     # Insertar créditos de prueba
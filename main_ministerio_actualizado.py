@@ -19,10 +19,25 @@ Fecha: Diciembre 2024
 ============================================================
 """
 
+import heapq
+import sys
+
 import psycopg2
 import pyodbc
 from datetime import datetime
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, List, Tuple, Iterable, Union
+from psycopg2.extras import execute_values
+
+from pool_conexiones import PoolConexiones, PoolAgotadoError
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+from metricas import METRICAS, fabrica_medida
+from particionado_pg import asegurar_particiones
+from analitica_local import InstantaneaColumnar
+from cache_resultados import CacheResultados
+from consulta_distribuida import consultar_particiones
+from escritura_diferida import ColaEscritura, ColaLlenaError
+from registro_compacto import Credito, CreditoAnual, Internador, LoteCreditos, copiar, crear_registro
+from resumenes import MOTOR_PG, MOTOR_SQL, aplicar_delta, preparar_resumen
 
 # ============================================================
 # CONFIGURACIÓN DE CONEXIONES
@@ -46,6 +61,58 @@ CONFIG_SQLSERVER = (
     "PWD=admin123;"
 )
 
+# ============================================================
+# POOLS DE CONEXIONES
+# ============================================================
+
+# Las conexiones se abren bajo demanda y se reutilizan entre llamadas,
+# evitando el handshake TCP + autenticación en cada operación. Cada
+# conexión registra sus operaciones en METRICAS bajo su partición.
+POOL_POSTGRESQL = PoolConexiones(
+    'PostgreSQL',
+    fabrica_medida(MAPA_PARTICIONES.particion_de_motor(MOTOR_POSTGRESQL),
+                   lambda: psycopg2.connect(**CONFIG_POSTGRESQL)),
+    min_conexiones=1,
+    max_conexiones=10
+)
+
+POOL_SQLSERVER = PoolConexiones(
+    'SQL Server',
+    fabrica_medida(MAPA_PARTICIONES.particion_de_motor(MOTOR_SQLSERVER),
+                   lambda: pyodbc.connect(CONFIG_SQLSERVER)),
+    min_conexiones=1,
+    max_conexiones=10
+)
+
+def preparar_resumenes() -> bool:
+    """
+    Paso de arranque: crea las tablas de resumen que falten y las calcula
+    desde las tablas base. Debe completarse antes de aceptar inserciones,
+    que actualizan el resumen en la misma transacción.
+    
+    Returns:
+        bool: True si ambos resúmenes están disponibles
+    """
+    listo = True
+    for pool, motor in ((POOL_POSTGRESQL, MOTOR_PG), (POOL_SQLSERVER, MOTOR_SQL)):
+        try:
+            with pool.conexion() as conn:
+                if preparar_resumen(conn, motor):
+                    print(f"✓ Resumen {motor['tabla_resumen']} creado desde {motor['tabla_base']}")
+        except Exception as e:
+            print(f"✗ No se pudo preparar {motor['tabla_resumen']}: {e}")
+            listo = False
+    return listo
+
+def estadisticas_pools() -> List[Dict]:
+    """
+    Devuelve las métricas de ambos pools (tasa de aciertos, tiempo de espera, etc.)
+    
+    Returns:
+        List[Dict]: Estadísticas de PostgreSQL y SQL Server
+    """
+    return [POOL_POSTGRESQL.estadisticas(), POOL_SQLSERVER.estadisticas()]
+
 # ============================================================
 # FUNCIONES DE INSERCIÓN
 # ============================================================
@@ -57,60 +124,80 @@ def insert_credito(genero: str, edad: int, etnia: str, zona: str,
                   tipo_subsidio: str, cdh_activos: int, anio: int) -> bool:
     """
     Inserta un registro de crédito en la base de datos correspondiente
-    según el año:
+    según el año, de acuerdo con MAPA_PARTICIONES (por defecto):
     
     - Años 2022-2024: PostgreSQL (histórico)
     - Año 2025: SQL Server (actual)
     
+    Con la escritura diferida activa (ver activar_escritura_diferida) la
+    fila solo se encola y se confirma en segundo plano.
+    
     Returns:
-        bool: True si la inserción fue exitosa, False en caso contrario
+        bool: True si la inserción fue exitosa (o la fila fue aceptada),
+              False en caso contrario
     """
     
+    fila = (genero, edad, etnia, zona, distrito_mies, provincia, canton,
+            parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
+            numero_cdh, tipo_subsidio, cdh_activos, anio)
+    
+    particion = MAPA_PARTICIONES.particion_de(anio)
+    
+    if ESCRITURA_DIFERIDA is not None and particion:
+        try:
+            ESCRITURA_DIFERIDA.encolar(particion, fila, timeout=ESPERA_COLA_ESCRITURA)
+        except (ColaLlenaError, RuntimeError) as e:
+            print(f"✗ Crédito {anio} no aceptado: {e}")
+            return False
+        print(f"✓ Crédito {anio} aceptado para {particion} (escritura diferida)")
+        return True
+    
+    if particion:
+        METRICAS.contar(particion, 'enrutar', 1)
+    
     try:
         # Decidir destino según el año
-        if anio in [2022, 2023, 2024]:
+        if particion == PARTICION_HISTORICO:
             # Insertar en PostgreSQL (histórico)
-            conn = psycopg2.connect(**CONFIG_POSTGRESQL)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO creditos_historicos 
-                (genero, edad, etnia, zona, distrito_mies, provincia, canton, 
-                 parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
-                 numero_cdh, tipo_subsidio, cdh_activos, anio)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (genero, edad, etnia, zona, distrito_mies, provincia, canton,
-                  parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
-                  numero_cdh, tipo_subsidio, cdh_activos, anio))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with POOL_POSTGRESQL.conexion() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    INSERT INTO creditos_historicos 
+                    (genero, edad, etnia, zona, distrito_mies, provincia, canton, 
+                     parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
+                     numero_cdh, tipo_subsidio, cdh_activos, anio)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, fila)
+                aplicar_delta(cursor, MOTOR_PG, [fila])
+                
+                conn.commit()
+                cursor.close()
+            CACHE_RESULTADOS.invalidar(PARTICION_HISTORICO)
             print(f"✓ Crédito {anio} insertado en PostgreSQL (histórico)")
             return True
             
-        elif anio == 2025:
+        elif particion == PARTICION_ACTUAL:
             # Insertar en SQL Server (actual)
-            conn = pyodbc.connect(CONFIG_SQLSERVER)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO CreditosActuales 
-                (genero, edad, etnia, zona, distrito_mies, provincia, canton, 
-                 parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
-                 numero_cdh, tipo_subsidio, cdh_activos, anio)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (genero, edad, etnia, zona, distrito_mies, provincia, canton,
-                  parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
-                  numero_cdh, tipo_subsidio, cdh_activos, anio))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with POOL_SQLSERVER.conexion() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    INSERT INTO CreditosActuales 
+                    (genero, edad, etnia, zona, distrito_mies, provincia, canton, 
+                     parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
+                     numero_cdh, tipo_subsidio, cdh_activos, anio)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, fila)
+                aplicar_delta(cursor, MOTOR_SQL, [fila])
+                
+                conn.commit()
+                cursor.close()
+            CACHE_RESULTADOS.invalidar(PARTICION_ACTUAL)
             print(f"✓ Crédito {anio} insertado en SQL Server (actual)")
             return True
         else:
-            print(f"✗ Año {anio} no válido. Debe ser 2022-2025.")
+            print(f"✗ Año {anio} no válido. Debe ser {MAPA_PARTICIONES.describir()}.")
             return False
             
     except Exception as e:
@@ -118,240 +205,775 @@ def insert_credito(genero: str, edad: int, etnia: str, zona: str,
         return False
 
 # ============================================================
-# FUNCIONES DE CONSULTA
+# INSERCIÓN MASIVA
 # ============================================================
 
-def consultar_todos_creditos() -> List[Dict]:
+# Orden de los campos de un crédito (igual a los parámetros de insert_credito)
+COLUMNAS_CREDITO = (
+    'genero', 'edad', 'etnia', 'zona', 'distrito_mies', 'provincia', 'canton',
+    'parroquia', 'tipo_zona', 'tipo_credito', 'tipo_actividad', 'actividad',
+    'numero_cdh', 'tipo_subsidio', 'cdh_activos', 'anio'
+)
+
+SQL_INSERT_HISTORICO_LOTE = (
+    f"INSERT INTO creditos_historicos ({', '.join(COLUMNAS_CREDITO)}) VALUES %s"
+)
+
+SQL_INSERT_ACTUAL = (
+    f"INSERT INTO CreditosActuales ({', '.join(COLUMNAS_CREDITO)}) "
+    f"VALUES ({', '.join('?' * len(COLUMNAS_CREDITO))})"
+)
+
+# Partición alojada en cada motor; qué años guarda cada una lo decide
+# MAPA_PARTICIONES (particiones.json)
+PARTICION_HISTORICO = MAPA_PARTICIONES.particion_de_motor(MOTOR_POSTGRESQL)
+PARTICION_ACTUAL = MAPA_PARTICIONES.particion_de_motor(MOTOR_SQLSERVER)
+
+def _flush_historico(filas: List[Tuple], tamano_lote: int):
+    """Envía un lote a PostgreSQL con execute_values (una sola sentencia INSERT)."""
+    with POOL_POSTGRESQL.conexion() as conn:
+        cursor = conn.cursor()
+        execute_values(cursor, SQL_INSERT_HISTORICO_LOTE, filas, page_size=tamano_lote)
+        aplicar_delta(cursor, MOTOR_PG, filas)
+        conn.commit()
+        cursor.close()
+
+def _flush_actual(filas: List[Tuple], tamano_lote: int):
+    """Envía un lote a SQL Server con fast_executemany (parámetros en bloque)."""
+    with POOL_SQLSERVER.conexion() as conn:
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+        cursor.executemany(SQL_INSERT_ACTUAL, filas)
+        aplicar_delta(cursor, MOTOR_SQL, filas)
+        conn.commit()
+        cursor.close()
+
+_FLUSH_POR_PARTICION = {
+    PARTICION_HISTORICO: _flush_historico,
+    PARTICION_ACTUAL: _flush_actual,
+}
+
+def _flush_lote(particion: str, filas: List[Tuple], tamano_lote: int,
+                insertados: Dict, fallidos: List):
     """
-    Consulta todos los créditos desde ambas bases de datos
-    y los devuelve en una lista consolidada.
+    Envía un lote completo a su partición. Si el lote falla se reintenta
+    fila por fila para aislar los registros inválidos.
+    """
+    flush = _FLUSH_POR_PARTICION[particion]
+    METRICAS.contar(particion, 'enrutar', len(filas))
+    try:
+        flush(filas, tamano_lote)
+        insertados[particion] += len(filas)
+    except Exception:
+        for fila in filas:
+            try:
+                flush([fila], 1)
+                insertados[particion] += 1
+            except Exception as e:
+                fallidos.append((fila, str(e)))
+    CACHE_RESULTADOS.invalidar(particion)
+
+def insert_creditos(creditos: Iterable[Union[Tuple, Dict]],
+                    tamano_lote: int = 5000) -> Dict:
+    """
+    Inserta muchos créditos agrupándolos por partición destino.
+    
+    Los registros se acumulan en un buffer por partición y cada buffer se
+    envía en un solo viaje al servidor cuando alcanza tamano_lote:
+    
+    - PostgreSQL (histórico): execute_values
+    - SQL Server (actual): fast_executemany
+    
+    Args:
+        creditos: Tuplas en el orden de COLUMNAS_CREDITO o diccionarios con esas claves
+        tamano_lote: Registros por lote enviado a cada partición
     
     Returns:
-        List[Dict]: Lista de diccionarios con los datos de todos los créditos
+        Dict: {'insertados': {partición: cantidad}, 'fallidos': [(registro, error)]}
     """
     
-    creditos = []
+    buffers = {particion: [] for particion in _FLUSH_POR_PARTICION}
+    insertados = {particion: 0 for particion in _FLUSH_POR_PARTICION}
+    fallidos = []
     
-    try:
-        # Consultar PostgreSQL (histórico 2022-2024)
-        conn_pg = psycopg2.connect(**CONFIG_POSTGRESQL)
-        cursor_pg = conn_pg.cursor()
-        
-        cursor_pg.execute("""
-            SELECT id, genero, edad, etnia, zona, distrito_mies, provincia, 
-                   canton, parroquia, tipo_zona, tipo_credito, tipo_actividad,
-                   actividad, numero_cdh, tipo_subsidio, cdh_activos, anio,
-                   fecha_migracion
-            FROM creditos_historicos
-            ORDER BY anio, id
-        """)
-        
-        for row in cursor_pg.fetchall():
-            creditos.append({
-                'id': row[0],
-                'genero': row[1],
-                'edad': row[2],
-                'etnia': row[3],
-                'zona': row[4],
-                'distrito_mies': row[5],
-                'provincia': row[6],
-                'canton': row[7],
-                'parroquia': row[8],
-                'tipo_zona': row[9],
-                'tipo_credito': row[10],
-                'tipo_actividad': row[11],
-                'actividad': row[12],
-                'numero_cdh': row[13],
-                'tipo_subsidio': row[14],
-                'cdh_activos': row[15],
-                'anio': row[16],
-                'fecha_migracion': row[17],
-                'origen': 'PostgreSQL (Histórico)'
-            })
-        
-        cursor_pg.close()
-        conn_pg.close()
-        
-        # Consultar SQL Server (actual 2025)
-        conn_sql = pyodbc.connect(CONFIG_SQLSERVER)
-        cursor_sql = conn_sql.cursor()
-        
-        cursor_sql.execute("""
-            SELECT id, genero, edad, etnia, zona, distrito_mies, provincia, 
-                   canton, parroquia, tipo_zona, tipo_credito, tipo_actividad,
-                   actividad, numero_cdh, tipo_subsidio, cdh_activos, anio,
-                   fecha_migracion
-            FROM CreditosActuales
-            ORDER BY anio, id
-        """)
-        
-        for row in cursor_sql.fetchall():
-            creditos.append({
-                'id': row[0],
-                'genero': row[1],
-                'edad': row[2],
-                'etnia': row[3],
-                'zona': row[4],
-                'distrito_mies': row[5],
-                'provincia': row[6],
-                'canton': row[7],
-                'parroquia': row[8],
-                'tipo_zona': row[9],
-                'tipo_credito': row[10],
-                'tipo_actividad': row[11],
-                'actividad': row[12],
-                'numero_cdh': row[13],
-                'tipo_subsidio': row[14],
-                'cdh_activos': row[15],
-                'anio': row[16],
-                'fecha_migracion': row[17],
-                'origen': 'SQL Server (Actual)'
-            })
-        
-        cursor_sql.close()
-        conn_sql.close()
+    for credito in creditos:
+        if isinstance(credito, dict):
+            try:
+                fila = tuple(credito[c] for c in COLUMNAS_CREDITO)
+            except KeyError as e:
+                fallidos.append((credito, f"Campo faltante: {e}"))
+                continue
+        else:
+            fila = tuple(credito)
+            if len(fila) != len(COLUMNAS_CREDITO):
+                fallidos.append((credito, f"Se esperaban {len(COLUMNAS_CREDITO)} campos"))
+                continue
         
-        return creditos
+        particion = MAPA_PARTICIONES.particion_de(fila[-1])
+        if particion is None:
+            fallidos.append((credito, f"Año {fila[-1]} no válido. "
+                                      f"Debe ser {MAPA_PARTICIONES.describir()}."))
+            continue
         
+        buffer = buffers[particion]
+        buffer.append(fila)
+        if len(buffer) >= tamano_lote:
+            _flush_lote(particion, buffer, tamano_lote, insertados, fallidos)
+            buffers[particion] = []
+    
+    for particion, buffer in buffers.items():
+        if buffer:
+            _flush_lote(particion, buffer, tamano_lote, insertados, fallidos)
+    
+    for particion, total in insertados.items():
+        if total:
+            print(f"✓ {total:,} créditos insertados en {particion}")
+    if fallidos:
+        print(f"✗ {len(fallidos):,} créditos no pudieron insertarse")
+    
+    return {'insertados': insertados, 'fallidos': fallidos}
+
+# ============================================================
+# CACHÉ DE RESULTADOS
+# ============================================================
+
+# Los años históricos no cambian salvo por insert_credito/insert_creditos,
+# que invalidan su partición; los resultados del año en curso vencen pronto
+# porque otras aplicaciones también escriben en SQL Server.
+TTL_POR_PARTICION = {
+    PARTICION_HISTORICO: None,
+    PARTICION_ACTUAL: 30.0,
+}
+
+CACHE_RESULTADOS = CacheResultados(TTL_POR_PARTICION, max_entradas=128)
+
+# Si el mapa cambia (p. ej. un traspaso de año) ningún resultado guardado es válido
+MAPA_PARTICIONES.al_cambiar(CACHE_RESULTADOS.limpiar)
+
+def _crear_particiones_historicas():
+    """
+    Crea la tabla hija de cada año que el mapa asigna ahora a PostgreSQL
+    (transacción corta). Hasta entonces sus filas caen en la partición DEFAULT.
+    """
+    try:
+        with POOL_POSTGRESQL.conexion() as conn:
+            cursor = conn.cursor()
+            asegurar_particiones(cursor, MAPA_PARTICIONES.anios(PARTICION_HISTORICO))
+            conn.commit()
+            cursor.close()
     except Exception as e:
-        print(f"✗ Error consultando créditos: {e}")
-        return creditos
+        print(f"✗ No se pudieron crear las particiones de {PARTICION_HISTORICO}: {e}")
 
-def consultar_por_anio(anio: int) -> List[Dict]:
+MAPA_PARTICIONES.al_cambiar(_crear_particiones_historicas)
+
+# ============================================================
+# ANALÍTICA LOCAL (OPCIONAL)
+# ============================================================
+
+# Con --analitica-local los reportes se calculan sobre una instantánea
+# columnar en memoria (ver analitica_local.py), refrescada en segundo plano
+ANALITICA_LOCAL: Optional[InstantaneaColumnar] = None
+
+def activar_analitica_local(intervalo: float = 60.0) -> bool:
     """
-    Consulta créditos de un año específico.
+    Carga la instantánea columnar y la refresca cada `intervalo` segundos.
+    
+    Returns:
+        bool: True si quedó activa (requiere numpy)
+    """
+    global ANALITICA_LOCAL
+    try:
+        instantanea = InstantaneaColumnar({MOTOR_POSTGRESQL: POOL_POSTGRESQL.conexion,
+                                           MOTOR_SQLSERVER: POOL_SQLSERVER.conexion})
+        filas = instantanea.refrescar()
+    except Exception as e:
+        print(f"✗ No se pudo activar la analítica local: {e}")
+        return False
+    
+    instantanea.iniciar_refresco(intervalo)
+    ANALITICA_LOCAL = instantanea
+    print(f"✓ Analítica local: {filas:,} registros en memoria "
+          f"(cargados en {instantanea.duracion_refresco:.1f} s)")
+    return True
+
+# ============================================================
+# ESCRITURA DIFERIDA (OPCIONAL)
+# ============================================================
+
+# Con --escritura-diferida insert_credito encola la fila y responde en el
+# acto; un escritor por partición la confirma junto con las demás filas
+# llegadas en la misma ventana (ver escritura_diferida.py)
+ESCRITURA_DIFERIDA: Optional[ColaEscritura] = None
+
+# Segundos que insert_credito espera lugar en una cola llena antes de rechazar
+ESPERA_COLA_ESCRITURA = 5.0
+
+# Errores de conexión (o pool sin conexiones libres durante una ráfaga): el
+# grupo se reintenta hasta que haya conexión en lugar de tratar sus filas
+# como datos inválidos
+ERRORES_CONEXION = (PoolAgotadoError,
+                    psycopg2.OperationalError, psycopg2.InterfaceError,
+                    pyodbc.OperationalError, pyodbc.InterfaceError)
+
+def _escribir_grupo(particion: str, filas: List[Tuple]):
+    """Escritor de la cola diferida: el grupo completo en una transacción."""
+    METRICAS.contar(particion, 'enrutar', len(filas))
+    _FLUSH_POR_PARTICION[particion](filas, len(filas))
+    CACHE_RESULTADOS.invalidar(particion)
+
+def activar_escritura_diferida(tamano_grupo: int = 500, intervalo_ms: float = 50.0,
+                               capacidad: int = 10000,
+                               ruta_diario: Optional[str] = None) -> bool:
+    """
+    Pasa insert_credito a escritura diferida con commit agrupado.
+    
+    Args:
+        tamano_grupo: Filas máximas por commit
+        intervalo_ms: Espera máxima de una fila antes de confirmarse
+        capacidad: Filas pendientes por partición antes de frenar a insert_credito
+        ruta_diario: Diario en disco para no perder filas aceptadas si el proceso cae
+    
+    Returns:
+        bool: True si quedó activa
+    """
+    global ESCRITURA_DIFERIDA
+    escritores = {particion: (lambda filas, p=particion: _escribir_grupo(p, filas))
+                  for particion in _FLUSH_POR_PARTICION}
+    try:
+        ESCRITURA_DIFERIDA = ColaEscritura(escritores, tamano_grupo, intervalo_ms,
+                                           capacidad, ruta_diario,
+                                           errores_transitorios=ERRORES_CONEXION)
+    except (OSError, ValueError) as e:
+        print(f"✗ No se pudo activar la escritura diferida: {e}")
+        return False
+    
+    print(f"✓ Escritura diferida: grupos de {tamano_grupo} filas o {intervalo_ms:g} ms"
+          + (f", diario en {ruta_diario}" if ruta_diario else ""))
+    return True
+
+def desactivar_escritura_diferida(timeout: Optional[float] = None) -> bool:
+    """
+    Confirma las filas pendientes y vuelve a la inserción síncrona.
+    
+    Returns:
+        bool: True si no quedó nada sin confirmar
+    """
+    global ESCRITURA_DIFERIDA
+    if ESCRITURA_DIFERIDA is None:
+        return True
+    cola, ESCRITURA_DIFERIDA = ESCRITURA_DIFERIDA, None
+    completo = cola.cerrar(timeout)
+    e = cola.estadisticas()
+    if completo:
+        print(f"✓ Escritura diferida vaciada: {e['confirmadas']:,} filas confirmadas "
+              f"en {e['grupos']:,} grupos")
+    else:
+        print(f"✗ Quedaron {e['pendientes']:,} filas sin confirmar"
+              + (f" (se reintentarán desde {cola.ruta_diario} al reactivar)" if cola.ruta_diario else ""))
+    if e['fallidas']:
+        print(f"✗ {e['fallidas']:,} filas rechazadas por el servidor")
+    return completo
+
+def _particiones_de_anio(anio: int, *args, **kwargs) -> List[str]:
+    particion = MAPA_PARTICIONES.particion_de(anio)
+    return [particion] if particion else []
+
+def _todas_las_particiones(*args, **kwargs) -> List[str]:
+    return MAPA_PARTICIONES.particiones
+
+# ============================================================
+# FUNCIONES DE CONSULTA
+# ============================================================
+
+# Segundos máximos de espera por cada partición en consultas distribuidas
+TIEMPO_LIMITE_PARTICION = {
+    PARTICION_HISTORICO: 60.0,
+    PARTICION_ACTUAL: 60.0,
+}
+
+# Pool y tabla de cada motor
+_POOL_POR_MOTOR = {MOTOR_POSTGRESQL: POOL_POSTGRESQL, MOTOR_SQLSERVER: POOL_SQLSERVER}
+_TABLA_POR_MOTOR = {MOTOR_POSTGRESQL: 'creditos_historicos', MOTOR_SQLSERVER: 'CreditosActuales'}
+_PARAMETRO_POR_MOTOR = {MOTOR_POSTGRESQL: '%s', MOTOR_SQLSERVER: '?'}
+_RESUMEN_POR_MOTOR = {MOTOR_POSTGRESQL: MOTOR_PG, MOTOR_SQLSERVER: MOTOR_SQL}
+
+SQL_TODOS = """
+    SELECT id, genero, edad, etnia, zona, distrito_mies, provincia, 
+           canton, parroquia, tipo_zona, tipo_credito, tipo_actividad,
+           actividad, numero_cdh, tipo_subsidio, cdh_activos, anio,
+           fecha_migracion
+    FROM {tabla}{filtro}
+    ORDER BY anio, id
+"""
+
+SQL_POR_ANIO = """
+    SELECT id, genero, edad, provincia, tipo_credito, tipo_subsidio, 
+           cdh_activos, anio
+    FROM {tabla}
+    WHERE anio = {p}
+    ORDER BY id
+"""
+
+# Una página dentro de un año: búsqueda por clave (anio, id) > (año, último id)
+# en lugar de OFFSET, así el costo no crece con el número de página
+_COLUMNAS_PAGINA = """id, genero, edad, etnia, zona, distrito_mies, provincia,
+           canton, parroquia, tipo_zona, tipo_credito, tipo_actividad,
+           actividad, numero_cdh, tipo_subsidio, cdh_activos, anio,
+           fecha_migracion"""
+
+SQL_PAGINA = {
+    MOTOR_POSTGRESQL: f"""
+    SELECT {_COLUMNAS_PAGINA}
+    FROM creditos_historicos
+    WHERE anio = %s AND id > %s{{filtro}}
+    ORDER BY id
+    LIMIT %s
+""",
+    MOTOR_SQLSERVER: f"""
+    SELECT TOP (?) {_COLUMNAS_PAGINA}
+    FROM CreditosActuales
+    WHERE anio = ? AND id > ?{{filtro}}
+    ORDER BY id
+""",
+}
+
+# Columnas por las que consultar_pagina acepta filtrar por igualdad
+COLUMNAS_FILTRO = ('genero', 'etnia', 'zona', 'provincia', 'canton', 'tipo_zona',
+                   'tipo_credito', 'tipo_subsidio')
+
+def _pool_de(particion: str) -> PoolConexiones:
+    METRICAS.contar(particion, 'enrutar')
+    return _POOL_POR_MOTOR[MAPA_PARTICIONES.motor(particion)]
+
+def _origen_de(particion: str) -> str:
+    """Etiqueta de origen de los registros: 'PostgreSQL (Histórico)'."""
+    return f"{particion} ({MAPA_PARTICIONES.rol(particion)})"
+
+def _sql_todos(particion: str, anios: Optional[List[int]] = None) -> str:
+    """
+    Consulta de todos los créditos de una partición, opcionalmente solo de
+    algunos años. Sin años se filtra por los de la partición según el mapa,
+    de modo que un año en traspaso no aparezca en las dos.
+    """
+    if anios is None:
+        filtro = f"\n    WHERE {MAPA_PARTICIONES.filtro_sql(particion)}"
+    else:
+        filtro = f"\n    WHERE anio IN ({', '.join(str(int(a)) for a in anios)})"
+    return SQL_TODOS.format(tabla=_TABLA_POR_MOTOR[MAPA_PARTICIONES.motor(particion)],
+                            filtro=filtro)
+
+def _seleccionar_particiones(anios: Optional[Iterable[int]]) -> Dict[str, Optional[List[int]]]:
+    """
+    Particiones a consultar, de la más antigua a la más reciente, con los
+    años a filtrar en cada una (None = todos). Las particiones que no
+    contienen ninguno de los años pedidos no se consultan.
+    """
+    if anios is None:
+        return {particion: None for particion in MAPA_PARTICIONES.particiones}
+    return MAPA_PARTICIONES.particiones_de_anios(anios)
+
+def _constructor_credito(tipo, origen: str, como_dict: bool):
+    """
+    Devuelve la función que convierte una fila de cursor en un crédito:
+    un registro compacto (por defecto) o un diccionario si como_dict=True.
+    """
+    if como_dict:
+        campos = tipo.CAMPOS
+        return lambda row: dict(zip(campos, (*row, origen)))
+    internar = Internador()
+    return lambda row: crear_registro(tipo, row, origen, internar)
+
+def _consultar_en(pool: PoolConexiones, sql: str, parametros: Tuple = ()) -> List:
+    """Ejecuta una consulta con una conexión prestada del pool y devuelve sus filas."""
+    with pool.conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, parametros)
+        filas = cursor.fetchall()
+        cursor.close()
+    return filas
+
+def consultar_todos_creditos(como_dict: bool = False,
+                             anios: Optional[Iterable[int]] = None,
+                             en_lote: bool = False) -> Union[List[Credito], LoteCreditos]:
+    """
+    Consulta todos los créditos desde ambas bases de datos
+    y los devuelve en una lista consolidada.
+    
+    Las particiones se consultan al mismo tiempo; si una falla o
+    excede su tiempo límite se devuelven los créditos de las demás.
+    Para resultados grandes usar iterar_lotes_creditos, que lee por
+    lotes con memoria acotada.
     
     Args:
-        anio: Año a consultar (2022-2025)
+        como_dict: Devolver diccionarios en lugar de registros compactos
+        anios: Limitar la consulta a estos años; las particiones que no
+               los contienen no se consultan
+        en_lote: Devolver un LoteCreditos columnar (la menor memoria por fila)
     
     Returns:
-        List[Dict]: Lista de créditos del año especificado
+        List[Credito]: Créditos (accesibles también como credito['campo'])
     """
     
+    def consulta(particion, anios_particion):
+        if en_lote:
+            return lambda: _consultar_en(_pool_de(particion), _sql_todos(particion, anios_particion))
+        convertir = _constructor_credito(Credito, _origen_de(particion), como_dict)
+        sql = _sql_todos(particion, anios_particion)
+        return lambda: [convertir(row) for row in _consultar_en(_pool_de(particion), sql)]
+    
+    seleccion = _seleccionar_particiones(anios)
+    resultados, faltantes = consultar_particiones(
+        {particion: consulta(particion, anios_particion)
+         for particion, anios_particion in seleccion.items()},
+        tiempo_limite=TIEMPO_LIMITE_PARTICION
+    )
+    
+    for particion, motivo in faltantes.items():
+        print(f"✗ Error consultando créditos en {particion}: {motivo}")
+    
+    # Particiones de la más antigua a la más reciente para conservar el orden por (anio, id)
+    if en_lote:
+        lote = LoteCreditos(Credito)
+        for particion in seleccion:
+            lote.agregar_filas(resultados.pop(particion, []), _origen_de(particion))
+        return lote
+    
     creditos = []
+    for particion in seleccion:
+        creditos.extend(resultados.get(particion, []))
+    return creditos
+
+def _iterar_lotes(pool: PoolConexiones, sql: str, tamano_lote: int,
+                  nombre_cursor: Optional[str] = None, parametros: Tuple = ()):
+    """
+    Recorre el resultado de una consulta por lotes de hasta tamano_lote filas.
     
-    try:
-        if anio in [2022, 2023, 2024]:
-            # Consultar en PostgreSQL
-            conn = psycopg2.connect(**CONFIG_POSTGRESQL)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, genero, edad, provincia, tipo_credito, tipo_subsidio, 
-                       cdh_activos, anio
-                FROM creditos_historicos
-                WHERE anio = %s
-                ORDER BY id
-            """, (anio,))
-            
-            for row in cursor.fetchall():
-                creditos.append({
-                    'id': row[0],
-                    'genero': row[1],
-                    'edad': row[2],
-                    'provincia': row[3],
-                    'tipo_credito': row[4],
-                    'tipo_subsidio': row[5],
-                    'cdh_activos': row[6],
-                    'anio': row[7],
-                    'origen': 'PostgreSQL'
-                })
-            
-            cursor.close()
-            conn.close()
-            
-        elif anio == 2025:
-            # Consultar en SQL Server
-            conn = pyodbc.connect(CONFIG_SQLSERVER)
+    Con nombre_cursor (PostgreSQL) se usa un cursor de servidor: el resultado
+    queda en el servidor y cada fetchmany trae solo el lote siguiente. En SQL
+    Server pyodbc ya lee el resultado a demanda; arraysize fija cuántas filas
+    pide por viaje.
+    
+    Yields:
+        List[Tuple]: Un lote de filas
+    """
+    with pool.conexion() as conn:
+        if nombre_cursor:
+            cursor = conn.cursor(name=nombre_cursor)
+            cursor.itersize = tamano_lote
+        else:
             cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, genero, edad, provincia, tipo_credito, tipo_subsidio, 
-                       cdh_activos, anio
-                FROM CreditosActuales
-                WHERE anio = ?
-                ORDER BY id
-            """, (anio,))
-            
-            for row in cursor.fetchall():
-                creditos.append({
-                    'id': row[0],
-                    'genero': row[1],
-                    'edad': row[2],
-                    'provincia': row[3],
-                    'tipo_credito': row[4],
-                    'tipo_subsidio': row[5],
-                    'cdh_activos': row[6],
-                    'anio': row[7],
-                    'origen': 'SQL Server'
-                })
-            
+            cursor.arraysize = tamano_lote
+        try:
+            cursor.execute(sql, parametros)
+            while True:
+                filas = cursor.fetchmany(tamano_lote)
+                if not filas:
+                    break
+                yield filas
+        finally:
             cursor.close()
-            conn.close()
+
+def _iterar_filas(pool: PoolConexiones, sql: str, tamano_bloque: int,
+                  nombre_cursor: Optional[str] = None):
+    """Igual que _iterar_lotes, pero entrega las filas de una en una."""
+    for filas in _iterar_lotes(pool, sql, tamano_bloque, nombre_cursor):
+        yield from filas
+
+def _nombre_cursor(particion: str, nombre: str) -> Optional[str]:
+    """Nombre de cursor de servidor, solo para particiones en PostgreSQL."""
+    return nombre if MAPA_PARTICIONES.motor(particion) == MOTOR_POSTGRESQL else None
+
+def iterar_todos_creditos(tamano_bloque: int = 5000, como_dict: bool = False,
+                          anios: Optional[Iterable[int]] = None):
+    """
+    Recorre todos los créditos de ambas bases en orden global (anio, id)
+    sin cargarlos completos en memoria.
+    
+    Cada partición ya viene ordenada por (anio, id), así que basta una
+    mezcla perezosa (heap) de los flujos.
+    
+    Args:
+        tamano_bloque: Filas leídas por viaje al servidor en cada partición
+        como_dict: Entregar diccionarios en lugar de registros compactos
+        anios: Limitar el recorrido a estos años (ver consultar_todos_creditos)
+    
+    Yields:
+        Credito: Un crédito a la vez, igual que en consultar_todos_creditos
+    """
+    
+    flujos = []
+    for particion, anios_particion in _seleccionar_particiones(anios).items():
+        flujos.append(map(_constructor_credito(Credito, _origen_de(particion), como_dict),
+                          _iterar_filas(_pool_de(particion), _sql_todos(particion, anios_particion),
+                                        tamano_bloque, _nombre_cursor(particion, 'todos_creditos'))))
+    
+    yield from heapq.merge(*flujos, key=lambda c: (c['anio'], c['id']))
+
+def iterar_lotes_creditos(tamano_lote: int = 5000, como_dict: bool = False,
+                          anios: Optional[Iterable[int]] = None):
+    """
+    Lee todos los créditos por lotes con memoria acotada: como mucho un
+    lote de tamano_lote créditos a la vez, sin importar el total.
+    
+    Las particiones se leen una tras otra, de la más antigua a la más
+    reciente, y cada una en orden (anio, id).
+    
+    Args:
+        tamano_lote: Créditos por lote (y filas por viaje al servidor)
+        como_dict: Entregar diccionarios en lugar de registros compactos
+        anios: Limitar la lectura a estos años (ver consultar_todos_creditos)
+    
+    Yields:
+        List[Credito]: Un lote de créditos
+    """
+    
+    for particion, anios_particion in _seleccionar_particiones(anios).items():
+        convertir = _constructor_credito(Credito, _origen_de(particion), como_dict)
+        for filas in _iterar_lotes(_pool_de(particion), _sql_todos(particion, anios_particion),
+                                   tamano_lote, _nombre_cursor(particion, 'lotes_creditos')):
+            yield [convertir(row) for row in filas]
+
+def iterar_lotes_anio(anio: int, tamano_lote: int = 5000, como_dict: bool = False):
+    """
+    Lee los créditos de un año por lotes con memoria acotada (sin caché,
+    a diferencia de consultar_por_anio).
+    
+    Args:
+        anio: Año a leer (ver MAPA_PARTICIONES)
+        tamano_lote: Créditos por lote (y filas por viaje al servidor)
+        como_dict: Entregar diccionarios en lugar de registros compactos
+    
+    Yields:
+        List[CreditoAnual]: Un lote de créditos, en orden de id
+    """
+    
+    particion = MAPA_PARTICIONES.particion_de(anio)
+    if particion is None:
+        return
+    
+    motor = MAPA_PARTICIONES.motor(particion)
+    sql = SQL_POR_ANIO.format(tabla=_TABLA_POR_MOTOR[motor], p=_PARAMETRO_POR_MOTOR[motor])
+    convertir = _constructor_credito(CreditoAnual, particion, como_dict)
+    for filas in _iterar_lotes(_pool_de(particion), sql, tamano_lote,
+                               _nombre_cursor(particion, 'lotes_anio'), (anio,)):
+        yield [convertir(row) for row in filas]
+
+@CACHE_RESULTADOS.cacheado(particiones=_particiones_de_anio)
+def _leer_anio(anio: int, como_dict: bool,
+               en_lote: bool = False) -> Union[List[CreditoAnual], LoteCreditos]:
+    """Lee los créditos de un año de su partición (resultado cacheado)."""
+    
+    particion = MAPA_PARTICIONES.particion_de(anio)
+    if particion is None:
+        return LoteCreditos(CreditoAnual) if en_lote else []
+    
+    motor = MAPA_PARTICIONES.motor(particion)
+    with _pool_de(particion).conexion() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(SQL_POR_ANIO.format(tabla=_TABLA_POR_MOTOR[motor],
+                                           p=_PARAMETRO_POR_MOTOR[motor]), (anio,))
         
-        return creditos
+        if en_lote:
+            creditos = LoteCreditos(CreditoAnual)
+            creditos.agregar_filas(cursor.fetchall(), particion)
+        else:
+            convertir = _constructor_credito(CreditoAnual, particion, como_dict)
+            creditos = [convertir(row) for row in cursor.fetchall()]
         
+        cursor.close()
+    return creditos
+
+def consultar_por_anio(anio: int, como_dict: bool = False,
+                       en_lote: bool = False) -> Union[List[CreditoAnual], LoteCreditos]:
+    """
+    Consulta créditos de un año específico.
+    
+    Carga el año completo en memoria (y lo guarda en caché); para recorrer
+    años grandes con memoria acotada usar iterar_lotes_anio.
+    
+    Args:
+        anio: Año a consultar (ver MAPA_PARTICIONES)
+        como_dict: Devolver diccionarios en lugar de registros compactos
+        en_lote: Devolver un LoteCreditos columnar (la menor memoria por fila)
+    
+    Returns:
+        List[CreditoAnual]: Lista de créditos del año especificado
+    """
+    
+    try:
+        # Copias para que el llamador no altere el caché
+        if en_lote:
+            return _leer_anio(anio, False, True).copia()
+        return [copiar(credito) for credito in _leer_anio(anio, como_dict)]
     except Exception as e:
         print(f"✗ Error consultando año {anio}: {e}")
-        return creditos
+        return LoteCreditos(CreditoAnual) if en_lote else []
 
-def obtener_estadisticas_por_provincia() -> Dict:
+def consultar_pagina(filtros: Optional[Dict] = None,
+                     despues_de: Optional[Tuple[int, int]] = None,
+                     limite: int = 10) -> Tuple[List[Credito], Optional[Tuple[int, int]]]:
     """
-    Obtiene estadísticas de créditos agrupados por provincia.
+    Una página de créditos en orden (anio, id), con paginación por clave.
+    
+    Los años se recorren en orden y cada uno se lee de su partición con
+    WHERE anio = X AND id > último ORDER BY id: un recorrido del índice
+    desde la clave, de modo que mostrar la página N cuesta lo mismo que
+    la primera sin importar el tamaño de las tablas. Si un año no llena
+    la página se continúa con el siguiente, aunque esté en otra partición.
+    
+    Args:
+        filtros: {'anio': X} o {'anios': [...]} y/o igualdad sobre
+                 COLUMNAS_FILTRO, p. ej. {'provincia': 'PICHINCHA'}
+        despues_de: Clave (anio, id) devuelta por la página anterior;
+                    None para la primera página
+        limite: Créditos por página
     
     Returns:
-        Dict: Diccionario con provincias y sus totales
+        Tuple: (créditos, clave de la página siguiente o None si no hay más)
     """
     
-    stats = {}
+    filtros = dict(filtros or {})
+    anios = filtros.pop('anios', None)
+    if 'anio' in filtros:
+        anios = [filtros.pop('anio')]
+    desconocidas = set(filtros) - set(COLUMNAS_FILTRO)
+    if desconocidas:
+        raise ValueError(f"No se puede filtrar por: {', '.join(sorted(desconocidas))}")
     
-    try:
-        # PostgreSQL (histórico)
-        conn_pg = psycopg2.connect(**CONFIG_POSTGRESQL)
-        cursor_pg = conn_pg.cursor()
+    anio_desde, id_desde = despues_de or (None, 0)
+    candidatos = MAPA_PARTICIONES.anios_validos if anios is None else sorted(set(anios))
+    
+    pagina = []
+    for anio in candidatos:
+        if anio_desde is not None and anio < anio_desde:
+            continue
+        particion = MAPA_PARTICIONES.particion_de(anio)
+        if particion is None:
+            continue
         
-        cursor_pg.execute("""
-            SELECT provincia, COUNT(*) as total, SUM(cdh_activos) as total_activos
-            FROM creditos_historicos
-            GROUP BY provincia
-            ORDER BY total DESC
-        """)
+        motor = MAPA_PARTICIONES.motor(particion)
+        p = _PARAMETRO_POR_MOTOR[motor]
+        filtro = ''.join(f" AND {columna} = {p}" for columna in filtros)
+        faltan = limite - len(pagina)
+        ultimo_id = id_desde if anio == anio_desde else 0
+        if motor == MOTOR_POSTGRESQL:
+            parametros = (anio, ultimo_id, *filtros.values(), faltan)
+        else:
+            parametros = (faltan, anio, ultimo_id, *filtros.values())
+        
+        convertir = _constructor_credito(Credito, _origen_de(particion), False)
+        filas = _consultar_en(_pool_de(particion), SQL_PAGINA[motor].format(filtro=filtro), parametros)
+        pagina.extend(convertir(row) for row in filas)
         
-        for row in cursor_pg.fetchall():
-            provincia = row[0]
+        if len(pagina) >= limite:
+            return pagina, (pagina[-1]['anio'], pagina[-1]['id'])
+    
+    return pagina, None
+
+@CACHE_RESULTADOS.cacheado(particiones=_todas_las_particiones,
+                           guardar_si=lambda resultado: not resultado[1])
+def _estadisticas_por_provincia() -> Tuple[Dict, Dict]:
+    """
+    Estadísticas por provincia y particiones faltantes. Solo se cachean
+    los resultados completos.
+    """
+    
+    stats = {}
+    columna = {PARTICION_HISTORICO: 'historico', PARTICION_ACTUAL: 'actual'}
+    
+    def acumular(particion, filas):
+        for provincia, total, total_activos in filas:
             if provincia not in stats:
                 stats[provincia] = {'historico': 0, 'actual': 0, 'total_activos': 0}
-            stats[provincia]['historico'] = row[1]
-            stats[provincia]['total_activos'] += row[2] or 0
-        
+            stats[provincia][columna[particion]] = total
+            stats[provincia]['total_activos'] += total_activos or 0
+    
+    _, faltantes = consultar_particiones(
+        {
+            PARTICION_HISTORICO: lambda: _consultar_en(POOL_POSTGRESQL, f"""
+                SELECT provincia, SUM(total) as total, SUM(activos) as total_activos
+                FROM resumen_creditos_historicos
+                WHERE {MAPA_PARTICIONES.filtro_sql(PARTICION_HISTORICO)}
+                GROUP BY provincia
+            """),
+            PARTICION_ACTUAL: lambda: _consultar_en(POOL_SQLSERVER, f"""
+                SELECT provincia, SUM(total) as total, SUM(activos) as total_activos
+                FROM ResumenCreditosActuales
+                WHERE {MAPA_PARTICIONES.filtro_sql(PARTICION_ACTUAL)}
+                GROUP BY provincia
+            """),
+        },
+        al_llegar=acumular,
+        tiempo_limite=TIEMPO_LIMITE_PARTICION
+    )
+    
+    return stats, faltantes
+
+def obtener_estadisticas_por_provincia() -> Dict:
+    """
+    Obtiene estadísticas de créditos agrupados por provincia.
+    
+    Se leen las tablas de resumen de cada partición (no las tablas base),
+    en paralelo, y cada resultado se acumula apenas llega.
+    
+    Con la analítica local activa se calculan en memoria.
+    
+    Returns:
+        Dict: Diccionario con provincias y sus totales
+    """
+    
+    if ANALITICA_LOCAL is not None:
+        stats = {}
+        columna = {PARTICION_HISTORICO: 'historico', PARTICION_ACTUAL: 'actual'}
+        for (particion, provincia), (total, activos) in ANALITICA_LOCAL.agrupar(
+                ('particion', 'provincia')).items():
+            datos = stats.setdefault(provincia, {'historico': 0, 'actual': 0, 'total_activos': 0})
+            datos[columna[particion]] = total
+            datos['total_activos'] += activos
+        return stats
+    
+    stats, faltantes = _estadisticas_por_provincia()
+    
+    for particion, motivo in faltantes.items():
+        print(f"✗ Error obteniendo estadísticas de {particion}: {motivo}")
+    
+    return {provincia: dict(datos) for provincia, datos in stats.items()}
+
+def obtener_totales() -> Dict:
+    """
+    Totales de créditos y CDH activos de cada partición, leídos de las
+    tablas de resumen (o de la instantánea local si está activa).
+    
+    Returns:
+        Dict: {partición: (total, activos)}
+    """
+    
+    if ANALITICA_LOCAL is not None:
+        totales = ANALITICA_LOCAL.agrupar(('particion',))
+        return {particion: totales.get((particion,), (0, 0))
+                for particion in (PARTICION_HISTORICO, PARTICION_ACTUAL)}
+    return _totales_resumen()
+
+@CACHE_RESULTADOS.cacheado(particiones=_todas_las_particiones)
+def _totales_resumen() -> Dict:
+    """Totales por partición desde las tablas de resumen (resultado cacheado)."""
+    
+    with POOL_POSTGRESQL.conexion() as conn_pg:
+        cursor_pg = conn_pg.cursor()
+        cursor_pg.execute("SELECT COALESCE(SUM(total), 0), SUM(activos) FROM resumen_creditos_historicos "
+                          f"WHERE {MAPA_PARTICIONES.filtro_sql(PARTICION_HISTORICO)}")
+        historico = tuple(cursor_pg.fetchone())
         cursor_pg.close()
-        conn_pg.close()
-        
-        # SQL Server (actual)
-        conn_sql = pyodbc.connect(CONFIG_SQLSERVER)
+    
+    with POOL_SQLSERVER.conexion() as conn_sql:
         cursor_sql = conn_sql.cursor()
-        
-        cursor_sql.execute("""
-            SELECT provincia, COUNT(*) as total, SUM(cdh_activos) as total_activos
-            FROM CreditosActuales
-            GROUP BY provincia
-        """)
-        
-        for row in cursor_sql.fetchall():
-            provincia = row[0]
-            if provincia not in stats:
-                stats[provincia] = {'historico': 0, 'actual': 0, 'total_activos': 0}
-            stats[provincia]['actual'] = row[1]
-            stats[provincia]['total_activos'] += row[2] or 0
-        
+        cursor_sql.execute("SELECT COALESCE(SUM(total), 0), SUM(activos) FROM ResumenCreditosActuales "
+                           f"WHERE {MAPA_PARTICIONES.filtro_sql(PARTICION_ACTUAL)}")
+        actual = tuple(cursor_sql.fetchone())
         cursor_sql.close()
-        conn_sql.close()
-        
-        return stats
-        
-    except Exception as e:
-        print(f"✗ Error obteniendo estadísticas: {e}")
-        return stats
+    
+    return {PARTICION_HISTORICO: historico, PARTICION_ACTUAL: actual}
 
 # ============================================================
 # FUNCIONES DE REPORTE
@@ -368,23 +990,15 @@ def imprimir_reporte_consolidado():
     
     # Obtener estadísticas generales
     try:
-        conn_pg = psycopg2.connect(**CONFIG_POSTGRESQL)
-        cursor_pg = conn_pg.cursor()
-        cursor_pg.execute("SELECT COUNT(*), SUM(cdh_activos) FROM creditos_historicos")
-        total_historico, activos_historico = cursor_pg.fetchone()
-        cursor_pg.close()
-        conn_pg.close()
-        
-        conn_sql = pyodbc.connect(CONFIG_SQLSERVER)
-        cursor_sql = conn_sql.cursor()
-        cursor_sql.execute("SELECT COUNT(*), SUM(cdh_activos) FROM CreditosActuales")
-        total_actual, activos_actual = cursor_sql.fetchone()
-        cursor_sql.close()
-        conn_sql.close()
+        totales = obtener_totales()
+        total_historico, activos_historico = totales[PARTICION_HISTORICO]
+        total_actual, activos_actual = totales[PARTICION_ACTUAL]
         
         print(f"\n📊 RESUMEN GENERAL:")
-        print(f"  • Histórico (2022-2024) en PostgreSQL: {total_historico:,} créditos")
-        print(f"  • Actual (2025) en SQL Server:        {total_actual:,} créditos")
+        etiqueta_historico = f"Histórico ({MAPA_PARTICIONES.describir(PARTICION_HISTORICO)}) en PostgreSQL:"
+        etiqueta_actual = f"Actual ({MAPA_PARTICIONES.describir(PARTICION_ACTUAL)}) en SQL Server:"
+        print(f"  • {etiqueta_historico:<36} {total_historico:,} créditos")
+        print(f"  • {etiqueta_actual:<36} {total_actual:,} créditos")
         print(f"  • TOTAL:                              {total_historico + total_actual:,} créditos")
         print(f"  • CDH activos históricos:             {activos_historico or 0:,}")
         print(f"  • CDH activos actuales:               {activos_actual or 0:,}")
@@ -408,6 +1022,25 @@ def imprimir_reporte_consolidado():
     except Exception as e:
         print(f"\n✗ Error generando reporte: {e}")
 
+@CACHE_RESULTADOS.cacheado(particiones=_particiones_de_anio)
+def _reporte_anio(anio: int) -> Tuple[Dict[str, int], List[Credito]]:
+    """
+    Créditos del año por género (tabla de resumen) y sus primeros 5
+    registros (una página por clave). Resultado cacheado.
+    """
+    
+    particion = MAPA_PARTICIONES.particion_de(anio)
+    if particion is None:
+        return {}, []
+    
+    resumen = _RESUMEN_POR_MOTOR[MAPA_PARTICIONES.motor(particion)]
+    filas = _consultar_en(_pool_de(particion),
+                          f"SELECT genero, SUM(total) FROM {resumen['tabla_resumen']} "
+                          f"WHERE anio = {resumen['p']} GROUP BY genero", (anio,))
+    por_genero = {genero: int(total) for genero, total in filas}
+    primeros, _ = consultar_pagina({'anio': anio}, limite=5)
+    return por_genero, primeros
+
 def imprimir_reporte_anual(anio: int):
     """
     Imprime un reporte detallado de un año específico
@@ -417,29 +1050,35 @@ def imprimir_reporte_anual(anio: int):
     print(f"REPORTE AÑO {anio}")
     print(f"{'='*100}")
     
-    creditos = consultar_por_anio(anio)
+    # Los contadores salen del resumen y los registros de una sola página:
+    # el año nunca se recorre completo
+    try:
+        por_genero, primeros = _reporte_anio(anio)
+    except Exception as e:
+        print(f"✗ Error consultando año {anio}: {e}")
+        return
+    total = sum(por_genero.values())
+    femenino = por_genero.get('FEMENINO', 0)
+    masculino = por_genero.get('MASCULINO', 0)
     
-    if not creditos:
+    if not total:
         print(f"\nNo hay registros para el año {anio}")
         return
     
-    print(f"\nTotal de créditos: {len(creditos):,}")
-    print(f"Base de datos: {creditos[0]['origen']}")
+    print(f"\nTotal de créditos: {total:,}")
+    print(f"Base de datos: {_origen_de(MAPA_PARTICIONES.particion_de(anio))}")
     
     # Estadísticas de género
-    femenino = sum(1 for c in creditos if c['genero'] == 'FEMENINO')
-    masculino = sum(1 for c in creditos if c['genero'] == 'MASCULINO')
-    
     print(f"\n👥 Distribución por género:")
-    print(f"  • Femenino: {femenino:,} ({femenino/len(creditos)*100:.1f}%)")
-    print(f"  • Masculino: {masculino:,} ({masculino/len(creditos)*100:.1f}%)")
+    print(f"  • Femenino: {femenino:,} ({femenino/total*100:.1f}%)")
+    print(f"  • Masculino: {masculino:,} ({masculino/total*100:.1f}%)")
     
     # Primeros 5 registros
     print(f"\n📋 Primeros 5 registros:")
     print(f"  {'ID':<8} {'Género':<12} {'Edad':<6} {'Provincia':<20} {'Tipo Crédito':<20}")
     print(f"  {'-'*8} {'-'*12} {'-'*6} {'-'*20} {'-'*20}")
     
-    for credito in creditos[:5]:
+    for credito in primeros:
         print(f"  {credito['id']:<8} {credito['genero']:<12} {credito['edad']:<6} "
               f"{credito['provincia']:<20} {credito['tipo_credito']:<20}")
     
@@ -449,6 +1088,69 @@ def imprimir_reporte_anual(anio: int):
 # MENÚ INTERACTIVO
 # ============================================================
 
+def navegar_paginas(filtros: Optional[Dict], formato, limite: int = 10):
+    """
+    Muestra créditos página por página. Guarda la clave de inicio de cada
+    página visitada para poder volver atrás sin recorrer desde el principio.
+    
+    Args:
+        filtros: Filtros de consultar_pagina
+        formato: Función que convierte un crédito en la línea a imprimir
+    """
+    
+    inicios = [None]
+    while True:
+        numero = len(inicios)
+        try:
+            creditos, siguiente = consultar_pagina(filtros, inicios[-1], limite)
+        except Exception as e:
+            print(f"✗ Error consultando créditos: {e}")
+            return
+        
+        if not creditos and numero == 1:
+            print("\nNo hay créditos")
+            return
+        
+        print(f"\nPágina {numero}:")
+        for i, c in enumerate(creditos, (numero - 1) * limite + 1):
+            print(f"{i}. {formato(c)}")
+        
+        opciones = "[Enter] siguiente, [a] anterior, [0] volver" if siguiente else "[a] anterior, [0] volver"
+        accion = input(f"\n{opciones}: ").strip().lower()
+        if accion == "a":
+            if numero > 1:
+                inicios.pop()
+        elif accion == "" and siguiente:
+            inicios.append(siguiente)
+        elif accion == "0" or not siguiente:
+            return
+
+def imprimir_metricas():
+    """Tiempo en cada motor y detalle por operación desde el inicio (ver metricas.py)."""
+    
+    print("\n--- MÉTRICAS DE OPERACIONES ---")
+    resumen = METRICAS.resumen()
+    if not resumen:
+        print("\nSin operaciones registradas")
+        return
+    
+    total_ms = sum(r['total_ms'] for r in resumen.values()) or 1.0
+    print(f"\n{'Partición':<12} {'Operaciones':>12} {'Tiempo':>12} {'%':>6} "
+          f"{'Filas':>12} {'MB':>9} {'Errores':>8}")
+    print(f"{'-'*12} {'-'*12} {'-'*12} {'-'*6} {'-'*12} {'-'*9} {'-'*8}")
+    for particion, r in sorted(resumen.items(), key=lambda x: -x[1]['total_ms']):
+        print(f"{particion:<12} {r['operaciones']:>12,} {r['total_ms']/1000:>10.2f} s "
+              f"{r['total_ms']/total_ms*100:>5.1f}% {r['filas']:>12,} "
+              f"{r['bytes']/1024/1024:>9.1f} {r['errores']:>8,}")
+    
+    print(f"\n{'Partición':<12} {'Operación':<12} {'Cantidad':>10} {'Prom.':>10} "
+          f"{'p50':>10} {'p95':>10} {'Máx.':>10} {'Errores':>8}")
+    print(f"{'-'*12} {'-'*12} {'-'*10} {'-'*10} {'-'*10} {'-'*10} {'-'*10} {'-'*8}")
+    for e in METRICAS.instantanea():
+        print(f"{e['particion']:<12} {e['operacion']:<12} {e['cantidad']:>10,} "
+              f"{e['promedio_ms']:>7.2f} ms {e['p50_ms']:>7.2f} ms {e['p95_ms']:>7.2f} ms "
+              f"{e['max_ms']:>7.2f} ms {sum(e['errores'].values()):>8,}")
+
 def mostrar_menu():
     """Muestra el menú principal del sistema"""
     
@@ -462,6 +1164,8 @@ def mostrar_menu():
         print("4. Ver reporte consolidado")
         print("5. Ver reporte de un año específico")
         print("6. Estadísticas por provincia")
+        print("7. Estadísticas de conexiones y caché")
+        print("8. Métricas de operaciones por partición")
         print("0. Salir")
         
         opcion = input("\nSelecciona una opción: ")
@@ -484,7 +1188,7 @@ def mostrar_menu():
                 numero_cdh = int(input("Número CDH: "))
                 tipo_subsidio = input("Tipo subsidio: ")
                 cdh_activos = int(input("CDH activos: "))
-                anio = int(input("Año (2022-2025): "))
+                anio = int(input(f"Año ({MAPA_PARTICIONES.describir()}): "))
                 
                 insert_credito(genero, edad, etnia, zona, distrito_mies, provincia,
                              canton, parroquia, tipo_zona, tipo_credito, tipo_actividad,
@@ -496,23 +1200,20 @@ def mostrar_menu():
         
         elif opcion == "2":
             print("\n--- CONSULTANDO TODOS LOS CRÉDITOS ---")
-            creditos = consultar_todos_creditos()
-            print(f"\nTotal encontrado: {len(creditos):,} créditos")
-            if creditos:
-                print(f"\nPrimeros 10 registros:")
-                for i, c in enumerate(creditos[:10], 1):
-                    print(f"{i}. Año {c['anio']} - {c['genero']} - "
-                          f"{c['provincia']} - {c['tipo_credito']} [{c['origen']}]")
+            try:
+                total = sum(t for t, _ in obtener_totales().values())
+                print(f"\nTotal: {total:,} créditos")
+            except Exception as e:
+                print(f"✗ Error leyendo totales: {e}")
+            navegar_paginas(None, lambda c: f"Año {c['anio']} - {c['genero']} - "
+                                            f"{c['provincia']} - {c['tipo_credito']} [{c['origen']}]")
         
         elif opcion == "3":
             try:
-                anio = int(input("\nAño a consultar (2022-2025): "))
-                creditos = consultar_por_anio(anio)
-                print(f"\nCréditos del año {anio}: {len(creditos):,}")
-                if creditos:
-                    print(f"\nPrimeros 10 registros:")
-                    for i, c in enumerate(creditos[:10], 1):
-                        print(f"{i}. {c['genero']} - {c['provincia']} - {c['tipo_credito']}")
+                anio = int(input(f"\nAño a consultar ({MAPA_PARTICIONES.describir()}): "))
+                print(f"\nCréditos del año {anio}:")
+                navegar_paginas({'anio': anio},
+                                lambda c: f"{c['genero']} - {c['provincia']} - {c['tipo_credito']}")
             except ValueError:
                 print("✗ Año inválido")
         
@@ -521,7 +1222,7 @@ def mostrar_menu():
         
         elif opcion == "5":
             try:
-                anio = int(input("\nAño del reporte (2022-2025): "))
+                anio = int(input(f"\nAño del reporte ({MAPA_PARTICIONES.describir()}): "))
                 imprimir_reporte_anual(anio)
             except ValueError:
                 print("✗ Año inválido")
@@ -541,7 +1242,43 @@ def mostrar_menu():
                     total = datos['historico'] + datos['actual']
                     print(f"{provincia:<30} {datos['historico']:>12,} {datos['actual']:>12,} {total:>12,}")
         
+        elif opcion == "7":
+            print("\n--- ESTADÍSTICAS DE CONEXIONES Y CACHÉ ---")
+            print(f"\n{'Pool':<12} {'Solicitudes':>12} {'Aciertos':>10} {'Tasa':>8} "
+                  f"{'Espera prom.':>14} {'Espera máx.':>13} {'Abiertas':>9}")
+            print(f"{'-'*12} {'-'*12} {'-'*10} {'-'*8} {'-'*14} {'-'*13} {'-'*9}")
+            for e in estadisticas_pools():
+                print(f"{e['pool']:<12} {e['solicitudes']:>12,} {e['aciertos']:>10,} "
+                      f"{e['tasa_aciertos']*100:>7.1f}% {e['espera_promedio_ms']:>11.2f} ms "
+                      f"{e['espera_max_ms']:>10.2f} ms {e['abiertas']:>9}")
+            
+            c = CACHE_RESULTADOS.estadisticas()
+            print(f"\nCaché de resultados: {c['aciertos']:,} aciertos, {c['fallos']:,} fallos "
+                  f"({c['tasa_aciertos']*100:.1f}%), {c['entradas']} entradas, "
+                  f"{c['invalidadas']:,} invalidadas, {c['expiradas']:,} expiradas")
+            
+            if ANALITICA_LOCAL is not None:
+                a = ANALITICA_LOCAL.estadisticas()
+                print(f"Analítica local: {a['filas']:,} registros, {a['bytes'] / 1024 / 1024:.1f} MB, "
+                      f"último refresco {datetime.fromtimestamp(a['actualizada']):%H:%M:%S} "
+                      f"({a['duracion_refresco']:.2f} s), {a['anios_recargados']} años recargados")
+            
+            if ESCRITURA_DIFERIDA is not None:
+                w = ESCRITURA_DIFERIDA.estadisticas()
+                print(f"Escritura diferida: {w['encoladas']:,} aceptadas, {w['confirmadas']:,} confirmadas, "
+                      f"{w['pendientes']:,} pendientes, {w['fallidas']:,} rechazadas, "
+                      f"{w['filas_por_grupo']:.1f} filas/grupo, espera máx. {w['espera_max_ms']:.1f} ms")
+        
+        elif opcion == "8":
+            imprimir_metricas()
+        
         elif opcion == "0":
+            if ANALITICA_LOCAL is not None:
+                ANALITICA_LOCAL.detener_refresco()
+            desactivar_escritura_diferida(timeout=30.0)
+            METRICAS.detener_volcado()
+            POOL_POSTGRESQL.cerrar()
+            POOL_SQLSERVER.cerrar()
             print("\n¡Hasta pronto!")
             break
         
@@ -552,17 +1289,56 @@ def mostrar_menu():
 # EJECUCIÓN PRINCIPAL
 # ============================================================
 
+USO = ("Uso: python main_ministerio_actualizado.py [--analitica-local] "
+       "[--metricas ARCHIVO] [--escritura-diferida [--diario RUTA]]")
+
+def _valor_opcion(nombre: str) -> Optional[str]:
+    """
+    Valor que sigue a una opción de la línea de comandos.
+    
+    Returns:
+        Optional[str]: El valor, o None si la opción no está
+    """
+    if nombre not in sys.argv:
+        return None
+    posicion = sys.argv.index(nombre) + 1
+    if posicion >= len(sys.argv) or sys.argv[posicion].startswith('--'):
+        print(f"✗ Falta el valor de {nombre}")
+        print(USO)
+        sys.exit(1)
+    return sys.argv[posicion]
+
 if __name__ == "__main__":
-    print("""
+    particiones = ''.join(
+        f"    ║   {f'• {p}: {MAPA_PARTICIONES.describir(p)} ({MAPA_PARTICIONES.rol(p)})':<59}║\n"
+        for p in MAPA_PARTICIONES.particiones
+    )
+    print(f"""
     ╔══════════════════════════════════════════════════════════════╗
     ║   SISTEMA DE MIDDLEWARE - MINISTERIO DE DESARROLLO HUMANO    ║
     ║                                                              ║
     ║   Particionamiento de datos reales:                          ║
-    ║   • PostgreSQL: 2022-2024 (Histórico)                        ║
-    ║   • SQL Server: 2025 (Actual)                                ║
-    ║                                                              ║
+{particiones}    ║                                                              ║
     ║   Total: 234,513 registros de créditos                       ║
     ╚══════════════════════════════════════════════════════════════╝
     """)
     
+    ruta_metricas = _valor_opcion('--metricas')
+    # --diario RUTA guarda las filas aceptadas hasta que se confirman
+    ruta_diario = _valor_opcion('--diario')
+    
+    if not preparar_resumenes():
+        print("  Revise la conexión o ejecute: python resumenes.py --reconstruir")
+        sys.exit(1)
+    
+    if '--analitica-local' in sys.argv:
+        activar_analitica_local()
+    
+    if ruta_metricas:
+        # Formato de texto de Prometheus, p. ej. para el textfile collector de node_exporter
+        METRICAS.iniciar_volcado(ruta_metricas)
+    
+    if '--escritura-diferida' in sys.argv:
+        activar_escritura_diferida(ruta_diario=ruta_diario)
+    
     mostrar_menu()
@@ -0,0 +1,280 @@
+"""
+============================================================
+MAPA DE PARTICIONES - MIDDLEWARE DE PARTICIONAMIENTO
+============================================================
+
+Define qué años se guardan en cada partición (motor de base
+de datos). El mapa se carga desde particiones.json, de modo
+que pasar 2025 al histórico y abrir 2026 en SQL Server solo
+requiere editar la configuración:
+
+    {
+        "PostgreSQL": {"motor": "postgresql", "rol": "Histórico",
+                       "desde": 2022, "hasta": 2025},
+        "SQL Server": {"motor": "sqlserver", "rol": "Actual",
+                       "anios": [2026]}
+    }
+
+  • Resolución año → partición en O(1)
+  • Poda de particiones que un predicado sobre el año descarta
+  • Filtros SQL por partición: cada partición solo expone sus
+    años, aunque su tabla contenga filas de otros
+  • Recarga automática cuando cambia el archivo (traspasos de
+    año en línea, ver traspaso_anio.py)
+============================================================
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+MOTOR_POSTGRESQL = 'postgresql'
+MOTOR_SQLSERVER = 'sqlserver'
+MOTORES = (MOTOR_POSTGRESQL, MOTOR_SQLSERVER)
+
+RUTA_POR_DEFECTO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'particiones.json')
+
+
+class MapaParticiones:
+    """
+    Asignación de años a particiones con nombre.
+
+    Args:
+        definiciones: {partición: {'motor', 'rol', 'anios' o 'desde'/'hasta'}}.
+                      Cada motor aloja como máximo una partición y cada año
+                      pertenece a una sola. Una partición puede quedar sin
+                      años (p. ej. tras traspasar su único año).
+        ruta: Archivo del que se cargó; si se indica, el mapa se recarga
+              cuando el archivo cambia
+        revisar_cada: Segundos mínimos entre revisiones del archivo
+    """
+
+    def __init__(self, definiciones: Dict[str, Dict], ruta: Optional[str] = None,
+                 revisar_cada: float = 5.0):
+        self.ruta = ruta
+        self.revisar_cada = revisar_cada
+        self._lock = threading.Lock()
+        self._al_cambiar: List[Callable[[], None]] = []
+        self._modificado = os.path.getmtime(ruta) if ruta else None
+        self._proxima_revision = time.monotonic() + revisar_cada
+        self._aplicar(definiciones)
+
+    def _aplicar(self, definiciones: Dict[str, Dict]):
+        """Valida las definiciones y reemplaza el estado del mapa de una vez."""
+        por_anio: Dict[int, str] = {}
+        anios_por_particion: Dict[str, Tuple[int, ...]] = {}
+        motores: Dict[str, str] = {}
+        roles: Dict[str, str] = {}
+
+        for particion, definicion in definiciones.items():
+            motor = definicion.get('motor')
+            if motor not in MOTORES:
+                raise ValueError(f"Partición {particion}: motor desconocido {motor!r}")
+            if motor in motores.values():
+                raise ValueError(f"Partición {particion}: el motor {motor} ya aloja otra partición")
+
+            anios = set(int(a) for a in definicion.get('anios', []))
+            if 'desde' in definicion or 'hasta' in definicion:
+                anios.update(range(int(definicion['desde']), int(definicion['hasta']) + 1))
+
+            for anio in anios:
+                if anio in por_anio:
+                    raise ValueError(f"El año {anio} está en {por_anio[anio]} y en {particion}")
+                por_anio[anio] = particion
+
+            anios_por_particion[particion] = tuple(sorted(anios))
+            motores[particion] = motor
+            roles[particion] = definicion.get('rol', particion)
+
+        self._definiciones = {p: dict(d) for p, d in definiciones.items()}
+        self._por_anio = por_anio
+        self._anios = anios_por_particion
+        self._motor = motores
+        self._rol = roles
+
+    # --------------------------------------------------------
+    # Recarga
+    # --------------------------------------------------------
+
+    def al_cambiar(self, funcion: Callable[[], None]):
+        """Registra una función llamada cada vez que el mapa se recarga."""
+        self._al_cambiar.append(funcion)
+
+    def _revisar(self):
+        """Recarga el mapa si el archivo cambió (como mucho cada revisar_cada segundos)."""
+        if self.ruta is None or time.monotonic() < self._proxima_revision:
+            return
+        with self._lock:
+            if time.monotonic() < self._proxima_revision:
+                return
+            self._proxima_revision = time.monotonic() + self.revisar_cada
+            try:
+                modificado = os.path.getmtime(self.ruta)
+                if modificado == self._modificado:
+                    return
+                with open(self.ruta, encoding='utf-8') as archivo:
+                    self._aplicar(json.load(archivo))
+                self._modificado = modificado
+            except (OSError, ValueError) as e:
+                print(f"✗ No se pudo recargar el mapa de particiones: {e}")
+                return
+        for funcion in self._al_cambiar:
+            funcion()
+
+    def definiciones(self) -> Dict[str, Dict]:
+        """Copia de las definiciones actuales (formato de particiones.json)."""
+        self._revisar()
+        return {p: dict(d) for p, d in self._definiciones.items()}
+
+    def mover_anio(self, anio: int, destino: str) -> Dict[str, Dict]:
+        """
+        Definiciones resultantes de pasar un año a otra partición, como
+        lista explícita de años. No modifica el mapa actual.
+        """
+        if destino not in self._anios:
+            raise ValueError(f"Partición desconocida: {destino}")
+        nuevas = {}
+        for particion, definicion in self.definiciones().items():
+            anios = set(self._anios[particion]) - {anio}
+            if particion == destino:
+                anios.add(anio)
+            definicion = {k: v for k, v in definicion.items() if k not in ('anios', 'desde', 'hasta')}
+            definicion['anios'] = sorted(anios)
+            nuevas[particion] = definicion
+        return nuevas
+
+    def guardar(self, definiciones: Dict[str, Dict]):
+        """
+        Escribe nuevas definiciones en el archivo del mapa (reemplazo atómico)
+        y las aplica en este proceso; los demás procesos las toman en su
+        próxima revisión.
+        """
+        MapaParticiones(definiciones)  # valida antes de escribir
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(definiciones, archivo, ensure_ascii=False, indent=4)
+            archivo.write('\n')
+        os.replace(temporal, self.ruta)
+        with self._lock:
+            self._aplicar(definiciones)
+            self._modificado = os.path.getmtime(self.ruta)
+        for funcion in self._al_cambiar:
+            funcion()
+
+    # --------------------------------------------------------
+    # Resolución
+    # --------------------------------------------------------
+
+    @property
+    def particiones(self) -> List[str]:
+        """
+        Particiones con años asignados, ordenadas por su primer año (la más
+        antigua primero). Las particiones vacías no se consultan.
+        """
+        self._revisar()
+        return sorted((p for p in self._anios if self._anios[p]), key=lambda p: self._anios[p][0])
+
+    @property
+    def anios_validos(self) -> Tuple[int, ...]:
+        self._revisar()
+        return tuple(sorted(self._por_anio))
+
+    def particion_de(self, anio: int) -> Optional[str]:
+        """Partición que guarda el año, o None si ninguna lo acepta."""
+        self._revisar()
+        return self._por_anio.get(anio)
+
+    def particion_de_motor(self, motor: str) -> Optional[str]:
+        """Partición alojada en el motor indicado, o None."""
+        self._revisar()
+        for particion, motor_particion in self._motor.items():
+            if motor_particion == motor:
+                return particion
+        return None
+
+    def anios(self, particion: str) -> Tuple[int, ...]:
+        self._revisar()
+        return self._anios[particion]
+
+    def motor(self, particion: str) -> str:
+        return self._motor[particion]
+
+    def rol(self, particion: str) -> str:
+        return self._rol[particion]
+
+    # --------------------------------------------------------
+    # Poda
+    # --------------------------------------------------------
+
+    def particiones_para(self, predicado: Callable[[int], bool] = None) -> List[str]:
+        """
+        Particiones con al menos un año que cumple el predicado; las demás
+        se pueden omitir sin consultarlas.
+        """
+        if predicado is None:
+            return self.particiones
+        return [p for p in self.particiones if any(predicado(a) for a in self._anios[p])]
+
+    def particiones_de_anios(self, anios: Iterable[int]) -> Dict[str, List[int]]:
+        """Agrupa años por partición: {partición: [años]}; los años sin partición se omiten."""
+        self._revisar()
+        grupos: Dict[str, List[int]] = {}
+        for anio in sorted(set(anios)):
+            particion = self._por_anio.get(anio)
+            if particion is not None:
+                grupos.setdefault(particion, []).append(anio)
+        return grupos
+
+    # --------------------------------------------------------
+    # Texto y SQL
+    # --------------------------------------------------------
+
+    @staticmethod
+    def _texto_anios(anios: Iterable[int]) -> str:
+        """(2022, 2023, 2024, 2026) → '2022-2024, 2026'."""
+        tramos = []
+        for anio in sorted(anios):
+            if tramos and anio == tramos[-1][1] + 1:
+                tramos[-1][1] = anio
+            else:
+                tramos.append([anio, anio])
+        return ', '.join(str(a) if a == b else f"{a}-{b}" for a, b in tramos)
+
+    def describir(self, particion: Optional[str] = None) -> str:
+        """Años de una partición (o de todas) como texto: '2022-2024'."""
+        self._revisar()
+        return self._texto_anios(self._anios[particion] if particion else self._por_anio)
+
+    def describir_motor(self, motor: str) -> str:
+        """Años de la partición alojada en un motor como texto."""
+        particion = self.particion_de_motor(motor)
+        return self.describir(particion) if particion else ''
+
+    def filtro_sql(self, particion: str, columna: str = 'anio') -> str:
+        """Condición WHERE que selecciona los años de la partición."""
+        self._revisar()
+        anios = self._anios[particion]
+        if not anios:
+            return "1 = 0"
+        if len(anios) == 1:
+            return f"{columna} = {anios[0]}"
+        return f"{columna} IN ({', '.join(str(a) for a in anios)})"
+
+
+def cargar_mapa(ruta: Optional[str] = None) -> MapaParticiones:
+    """
+    Lee el mapa desde un archivo JSON.
+
+    Args:
+        ruta: Archivo de configuración; por defecto la variable de entorno
+              MAPA_PARTICIONES o particiones.json junto a este módulo
+    """
+    ruta = ruta or os.environ.get('MAPA_PARTICIONES') or RUTA_POR_DEFECTO
+    with open(ruta, encoding='utf-8') as archivo:
+        return MapaParticiones(json.load(archivo), ruta=ruta)
+
+
+# Mapa compartido por inserciones, consultas, migraciones y reportes
+MAPA_PARTICIONES = cargar_mapa()
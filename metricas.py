@@ -0,0 +1,426 @@
+"""
+============================================================
+MÉTRICAS DE OPERACIONES - MIDDLEWARE DE PARTICIONAMIENTO
+============================================================
+
+Mide cada interacción con los motores, etiquetada por
+partición y operación (conectar, execute, fetch, commit,
+rollback, consulta, enrutar):
+
+  • Histograma de latencia, filas, bytes y errores por
+    (partición, operación)
+  • Conexiones instrumentadas: envuelven la conexión DB-API
+    y sus cursores sin cambiar su uso (ver fabrica_medida)
+  • Consulta en proceso (instantanea, resumen) y exportación
+    en formato de texto de Prometheus, a archivo o a cadena
+  • Seguro para uso concurrente (threading)
+
+Sirve para ver si PostgreSQL o SQL Server es el cuello de
+botella de un reporte:
+
+    python main_ministerio_actualizado.py --metricas metricas.prom
+============================================================
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Límites superiores (segundos) de los intervalos del histograma de latencia
+LIMITES_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PREFIJO = 'mdh'
+
+# Operaciones que no suman al tiempo en los motores: enrutar no tiene
+# duración y una consulta distribuida incluye sus propios execute y fetch
+OPERACIONES_ENVOLVENTES = ('enrutar', 'consulta')
+
+
+class _Serie:
+    """Contadores y histograma de una (partición, operación)."""
+
+    __slots__ = ('intervalos', 'cantidad', 'suma', 'maximo', 'filas', 'bytes', 'errores')
+
+    def __init__(self, limites: Tuple[float, ...]):
+        self.intervalos = [0] * (len(limites) + 1)  # el último es +Inf
+        self.cantidad = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+        self.filas = 0
+        self.bytes = 0
+        self.errores: Dict[str, int] = {}
+
+
+class RegistroMetricas:
+    """
+    Registro de métricas de operaciones contra los motores.
+
+    Args:
+        limites: Límites superiores de los intervalos del histograma (segundos)
+    """
+
+    def __init__(self, limites: Tuple[float, ...] = LIMITES_LATENCIA):
+        self.limites = tuple(sorted(limites))
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], _Serie] = {}
+        self._inicio = time.time()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    # --------------------------------------------------------
+    # Registro
+    # --------------------------------------------------------
+
+    def observar(self, particion: str, operacion: str, segundos: float,
+                 filas: int = 0, bytes_: int = 0, error: Optional[str] = None):
+        """
+        Registra una operación terminada.
+
+        Args:
+            particion: Partición (o motor) contra la que se ejecutó
+            operacion: 'conectar', 'execute', 'fetch', 'commit', ...
+            segundos: Duración
+            filas: Filas leídas o afectadas
+            bytes_: Bytes aproximados transferidos
+            error: Tipo de error si la operación falló
+        """
+        intervalo = bisect.bisect_left(self.limites, segundos)
+        with self._lock:
+            serie = self._series.get((particion, operacion))
+            if serie is None:
+                serie = self._series[(particion, operacion)] = _Serie(self.limites)
+            serie.intervalos[intervalo] += 1
+            serie.cantidad += 1
+            serie.suma += segundos
+            if segundos > serie.maximo:
+                serie.maximo = segundos
+            serie.filas += filas
+            serie.bytes += bytes_
+            if error is not None:
+                serie.errores[error] = serie.errores.get(error, 0) + 1
+
+    @contextmanager
+    def medir(self, particion: str, operacion: str):
+        """
+        Mide un bloque with. El objeto entregado permite anotar filas y
+        bytes (medida.filas = ...); una excepción se cuenta como error.
+        """
+        medida = _Medida()
+        inicio = time.perf_counter()
+        try:
+            yield medida
+        except Exception as e:
+            self.observar(particion, operacion, time.perf_counter() - inicio,
+                          medida.filas, medida.bytes, type(e).__name__)
+            raise
+        self.observar(particion, operacion, time.perf_counter() - inicio,
+                      medida.filas, medida.bytes)
+
+    def contar(self, particion: str, operacion: str, filas: int = 0):
+        """Cuenta una operación sin duración (p. ej. una decisión de enrutamiento)."""
+        self.observar(particion, operacion, 0.0, filas)
+
+    def reiniciar(self):
+        with self._lock:
+            self._series.clear()
+            self._inicio = time.time()
+
+    # --------------------------------------------------------
+    # Consulta
+    # --------------------------------------------------------
+
+    def _percentil(self, serie: _Serie, q: float) -> float:
+        """Estimación por interpolación lineal dentro del intervalo (como Prometheus)."""
+        objetivo = q * serie.cantidad
+        acumulado = 0
+        for i, cantidad in enumerate(serie.intervalos):
+            if cantidad and acumulado + cantidad >= objetivo:
+                if i == len(self.limites):
+                    return serie.maximo
+                inferior = self.limites[i - 1] if i else 0.0
+                estimado = inferior + (self.limites[i] - inferior) * (objetivo - acumulado) / cantidad
+                return min(estimado, serie.maximo)
+            acumulado += cantidad
+        return 0.0
+
+    def instantanea(self) -> List[Dict]:
+        """
+        Returns:
+            List[Dict]: Una entrada por (partición, operación) con cantidad,
+                        latencia total/promedio/p50/p95/máxima (ms), filas,
+                        bytes, errores (por tipo) e histograma acumulado
+        """
+        with self._lock:
+            resultado = []
+            for (particion, operacion), serie in sorted(self._series.items()):
+                acumulado = 0
+                histograma = []
+                for limite, cantidad in zip(self.limites + (float('inf'),), serie.intervalos):
+                    acumulado += cantidad
+                    histograma.append((limite, acumulado))
+                resultado.append({
+                    'particion': particion,
+                    'operacion': operacion,
+                    'cantidad': serie.cantidad,
+                    'total_ms': serie.suma * 1000,
+                    'promedio_ms': serie.suma / serie.cantidad * 1000 if serie.cantidad else 0.0,
+                    'p50_ms': self._percentil(serie, 0.5) * 1000,
+                    'p95_ms': self._percentil(serie, 0.95) * 1000,
+                    'max_ms': serie.maximo * 1000,
+                    'filas': serie.filas,
+                    'bytes': serie.bytes,
+                    'errores': dict(serie.errores),
+                    'histograma': histograma,
+                })
+            return resultado
+
+    def resumen(self) -> Dict[str, Dict]:
+        """
+        Totales por partición: tiempo acumulado en los motores, operaciones,
+        filas, bytes y errores. La partición con más tiempo es el cuello de
+        botella de lo ejecutado desde el último reinicio.
+        """
+        totales: Dict[str, Dict] = {}
+        for entrada in self.instantanea():
+            if entrada['operacion'] in OPERACIONES_ENVOLVENTES:
+                continue
+            total = totales.setdefault(entrada['particion'], {
+                'operaciones': 0, 'total_ms': 0.0, 'filas': 0, 'bytes': 0, 'errores': 0})
+            total['operaciones'] += entrada['cantidad']
+            total['total_ms'] += entrada['total_ms']
+            total['filas'] += entrada['filas']
+            total['bytes'] += entrada['bytes']
+            total['errores'] += sum(entrada['errores'].values())
+        return totales
+
+    # --------------------------------------------------------
+    # Exportación
+    # --------------------------------------------------------
+
+    def texto_prometheus(self) -> str:
+        """Métricas en el formato de exposición de texto de Prometheus."""
+        series = self.instantanea()
+        lineas = []
+
+        def etiquetas(entrada, **extra):
+            valores = {'particion': entrada['particion'], 'operacion': entrada['operacion'], **extra}
+            texto = ','.join(f'{k}="{_escapar(str(v))}"' for k, v in valores.items())
+            return '{' + texto + '}'
+
+        nombre = f'{PREFIJO}_operacion_segundos'
+        lineas.append(f'# HELP {nombre} Latencia de las operaciones contra los motores.')
+        lineas.append(f'# TYPE {nombre} histogram')
+        for entrada in series:
+            for limite, acumulado in entrada['histograma']:
+                le = '+Inf' if limite == float('inf') else repr(limite)
+                lineas.append(f'{nombre}_bucket{etiquetas(entrada, le=le)} {acumulado}')
+            lineas.append(f'{nombre}_sum{etiquetas(entrada)} {entrada["total_ms"] / 1000!r}')
+            lineas.append(f'{nombre}_count{etiquetas(entrada)} {entrada["cantidad"]}')
+
+        for campo, ayuda in (('filas', 'Filas leídas o afectadas.'),
+                             ('bytes', 'Bytes aproximados transferidos.')):
+            nombre = f'{PREFIJO}_{campo}_total'
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} counter')
+            for entrada in series:
+                lineas.append(f'{nombre}{etiquetas(entrada)} {entrada[campo]}')
+
+        nombre = f'{PREFIJO}_errores_total'
+        lineas.append(f'# HELP {nombre} Operaciones fallidas por tipo de error.')
+        lineas.append(f'# TYPE {nombre} counter')
+        for entrada in series:
+            for tipo, cantidad in sorted(entrada['errores'].items()):
+                lineas.append(f'{nombre}{etiquetas(entrada, tipo=tipo)} {cantidad}')
+
+        nombre = f'{PREFIJO}_inicio_segundos'
+        lineas.append(f'# HELP {nombre} Inicio del periodo medido (epoch).')
+        lineas.append(f'# TYPE {nombre} gauge')
+        lineas.append(f'{nombre} {self._inicio!r}')
+        return '\n'.join(lineas) + '\n'
+
+    def volcar(self, ruta: str):
+        """
+        Escribe texto_prometheus() en un archivo. Se escribe a un temporal y
+        se renombra, así un lector (p. ej. el textfile collector de
+        node_exporter) nunca ve un archivo a medias.
+        """
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            archivo.write(self.texto_prometheus())
+        os.replace(temporal, ruta)
+
+    def iniciar_volcado(self, ruta: str, intervalo: float = 15.0):
+        """Vuelca las métricas a `ruta` cada `intervalo` segundos en segundo plano."""
+        self.detener_volcado()
+        self._detener.clear()
+
+        def volcar_periodicamente():
+            while not self._detener.wait(intervalo):
+                try:
+                    self.volcar(ruta)
+                except OSError as e:
+                    print(f"✗ No se pudieron volcar las métricas: {e}")
+            self.volcar(ruta)
+
+        self._hilo = threading.Thread(target=volcar_periodicamente, daemon=True,
+                                      name='volcado-metricas')
+        self._hilo.start()
+
+    def detener_volcado(self):
+        """Detiene el volcado periódico (con un último volcado)."""
+        if self._hilo is not None:
+            self._detener.set()
+            self._hilo.join()
+            self._hilo = None
+
+
+class _Medida:
+    __slots__ = ('filas', 'bytes')
+
+    def __init__(self):
+        self.filas = 0
+        self.bytes = 0
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _bytes_filas(filas) -> int:
+    """Tamaño aproximado de las filas: largo de textos y binarios, 8 por otro valor."""
+    total = 0
+    for fila in filas:
+        for valor in fila:
+            if isinstance(valor, (str, bytes, bytearray)):
+                total += len(valor)
+            elif valor is not None:
+                total += 8
+    return total
+
+
+# Registro usado por el middleware
+METRICAS = RegistroMetricas()
+
+# ============================================================
+# CONEXIONES INSTRUMENTADAS
+# ============================================================
+
+class CursorMedido:
+    """Cursor DB-API que registra execute/executemany/fetch* en un RegistroMetricas."""
+
+    def __init__(self, cursor, particion: str, registro: RegistroMetricas):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_particion', particion)
+        object.__setattr__(self, '_registro', registro)
+
+    # Atributos no medidos (rowcount, itersize, fast_executemany, mogrify...)
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._cursor, nombre, valor)
+
+    def _llamar(self, operacion: str, funcion: Callable, *args, contar_filas=None):
+        with self._registro.medir(self._particion, operacion) as medida:
+            resultado = funcion(*args)
+            if contar_filas is not None:
+                filas = contar_filas(resultado)
+                medida.filas = len(filas)
+                medida.bytes = _bytes_filas(filas)
+            elif self._cursor.description is None:
+                # Filas afectadas; las de un SELECT se cuentan al leerlas
+                medida.filas = max(self._cursor.rowcount, 0)
+        return resultado
+
+    def execute(self, sql, parametros=None):
+        if parametros is None:
+            return self._llamar('execute', self._cursor.execute, sql)
+        return self._llamar('execute', self._cursor.execute, sql, parametros)
+
+    def executemany(self, sql, filas):
+        return self._llamar('executemany', self._cursor.executemany, sql, filas)
+
+    def copy_expert(self, sql, archivo, *args):
+        return self._llamar('copy', self._cursor.copy_expert, sql, archivo, *args)
+
+    def fetchone(self):
+        return self._llamar('fetch', self._cursor.fetchone,
+                            contar_filas=lambda fila: [] if fila is None else [fila])
+
+    def fetchmany(self, *args):
+        return self._llamar('fetch', self._cursor.fetchmany, *args, contar_filas=lambda filas: filas)
+
+    def fetchall(self):
+        return self._llamar('fetch', self._cursor.fetchall, contar_filas=lambda filas: filas)
+
+    def __iter__(self):
+        # Un fetch por recorrido completo: medir cada fila costaría más que leerla
+        iterador = iter(self._cursor)
+        segundos = 0.0
+        filas = bytes_ = 0
+        try:
+            while True:
+                inicio = time.perf_counter()
+                try:
+                    fila = next(iterador)
+                except StopIteration:
+                    break
+                finally:
+                    segundos += time.perf_counter() - inicio
+                filas += 1
+                bytes_ += _bytes_filas((fila,))
+                yield fila
+        finally:
+            self._registro.observar(self._particion, 'fetch', segundos, filas, bytes_)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self._cursor.close()
+
+
+class ConexionMedida:
+    """Conexión DB-API cuyos cursores, commit y rollback se miden."""
+
+    def __init__(self, conexion, particion: str, registro: RegistroMetricas):
+        object.__setattr__(self, '_conexion', conexion)
+        object.__setattr__(self, '_particion', particion)
+        object.__setattr__(self, '_registro', registro)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._conexion, nombre, valor)
+
+    def cursor(self, *args, **kwargs):
+        return CursorMedido(self._conexion.cursor(*args, **kwargs), self._particion, self._registro)
+
+    def commit(self):
+        with self._registro.medir(self._particion, 'commit'):
+            self._conexion.commit()
+
+    def rollback(self):
+        with self._registro.medir(self._particion, 'rollback'):
+            self._conexion.rollback()
+
+    def close(self):
+        self._conexion.close()
+
+
+def fabrica_medida(particion: str, fabrica: Callable,
+                   registro: RegistroMetricas = METRICAS) -> Callable:
+    """
+    Envuelve una fábrica de conexiones (p. ej. la de un PoolConexiones):
+    mide la apertura y entrega conexiones instrumentadas.
+    """
+    def conectar():
+        with registro.medir(particion, 'conectar'):
+            conexion = fabrica()
+        return ConexionMedida(conexion, particion, registro)
+    return conectar
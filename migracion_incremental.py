@@ -0,0 +1,310 @@
+"""
+MIGRACIÓN INCREMENTAL CON PUNTOS DE CONTROL
+Migra table1 sin borrar las tablas destino. El avance de cada
+partición (año) se guarda en la tabla migracion_checkpoint de la
+base destino, en la misma transacción que cada lote:
+
+  • Si el proceso se interrumpe, la siguiente ejecución continúa
+    desde el último lote confirmado
+  • Si el origen no cambió, la partición se omite (no-op)
+  • Si el origen cambió, solo esa partición se vuelve a cargar
+
+El orden de lectura del origen es el ctid de table1 (la tabla no
+tiene clave primaria); el último ctid confirmado es la posición
+de reanudación.
+"""
+
+from psycopg2.extras import execute_values
+
+from cargador_sqlserver import CargadorSQLServer
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+from resumenes import (
+    MOTOR_PG, MOTOR_SQL, asegurar_resumen, reconstruir_resumen, verificar_resumen,
+    aplicar_delta, borrar_anio
+)
+from migrar_y_reportar import (
+    CONFIG_BONOLECCION, CONFIG_PG_HISTORICO, COLUMNAS_FUENTE, COLUMNAS_DESTINO,
+    conectar_postgresql, conectar_sqlserver,
+    asegurar_tabla_historica_pg, asegurar_tabla_actual_sql, indexar_tablas
+)
+from particionado_pg import crear_particion_anio, vaciar_anio
+
+# ============================================================
+# TABLAS DE PUNTOS DE CONTROL
+# ============================================================
+
+DDL_CHECKPOINT_PG = """
+    CREATE TABLE IF NOT EXISTS migracion_checkpoint (
+        particion VARCHAR(20) PRIMARY KEY,
+        ultimo_ctid VARCHAR(30),
+        registros BIGINT NOT NULL DEFAULT 0,
+        huella VARCHAR(60),
+        completa BOOLEAN NOT NULL DEFAULT FALSE,
+        actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+DDL_CHECKPOINT_SQL = """
+    IF OBJECT_ID('dbo.migracion_checkpoint', 'U') IS NULL
+    CREATE TABLE migracion_checkpoint (
+        particion VARCHAR(20) PRIMARY KEY,
+        ultimo_ctid VARCHAR(30),
+        registros BIGINT NOT NULL DEFAULT 0,
+        huella VARCHAR(60),
+        completa BIT NOT NULL DEFAULT 0,
+        actualizado DATETIME DEFAULT GETDATE()
+    );
+"""
+
+# Diferencias de sintaxis entre motores
+DIALECTO_PG = {'p': '%s', 'ahora': 'CURRENT_TIMESTAMP', 'falso': 'FALSE',
+               'verdadero': 'TRUE', 'tabla': 'creditos_historicos', 'resumen': MOTOR_PG}
+DIALECTO_SQL = {'p': '?', 'ahora': 'GETDATE()', 'falso': '0',
+                'verdadero': '1', 'tabla': 'CreditosActuales', 'resumen': MOTOR_SQL}
+
+def leer_checkpoint(cursor, dialecto, particion):
+    """
+    Returns:
+        tuple | None: (ultimo_ctid, registros, huella, completa)
+    """
+    cursor.execute(
+        f"SELECT ultimo_ctid, registros, huella, completa "
+        f"FROM migracion_checkpoint WHERE particion = {dialecto['p']}",
+        (particion,)
+    )
+    fila = cursor.fetchone()
+    if fila is None:
+        return None
+    return fila[0], fila[1], fila[2], bool(fila[3])
+
+def reiniciar_particion(conn, dialecto, particion, anio, huella):
+    """Borra los datos destino de la partición y deja su checkpoint en cero."""
+    p = dialecto['p']
+    if dialecto is DIALECTO_PG:
+        crear_particion_anio(conn, anio)
+    cursor = conn.cursor()
+    if dialecto is DIALECTO_PG:
+        vaciar_anio(cursor, anio)
+    else:
+        cursor.execute(f"DELETE FROM {dialecto['tabla']} WHERE anio = {p}", (anio,))
+    borrar_anio(cursor, dialecto['resumen'], anio)
+    cursor.execute(f"DELETE FROM migracion_checkpoint WHERE particion = {p}", (particion,))
+    cursor.execute(
+        f"INSERT INTO migracion_checkpoint (particion, ultimo_ctid, registros, huella, completa) "
+        f"VALUES ({p}, NULL, 0, {p}, {dialecto['falso']})",
+        (particion, huella)
+    )
+    conn.commit()
+    cursor.close()
+
+def avanzar_checkpoint(cursor, dialecto, particion, ultimo_ctid, cantidad):
+    """Registra un lote; debe ejecutarse en la misma transacción que el lote."""
+    p = dialecto['p']
+    cursor.execute(
+        f"UPDATE migracion_checkpoint "
+        f"SET ultimo_ctid = {p}, registros = registros + {p}, actualizado = {dialecto['ahora']} "
+        f"WHERE particion = {p}",
+        (ultimo_ctid, cantidad, particion)
+    )
+
+def completar_checkpoint(conn, dialecto, particion):
+    cursor = conn.cursor()
+    cursor.execute(
+        f"UPDATE migracion_checkpoint "
+        f"SET completa = {dialecto['verdadero']}, actualizado = {dialecto['ahora']} "
+        f"WHERE particion = {dialecto['p']}",
+        (particion,)
+    )
+    conn.commit()
+    cursor.close()
+
+# ============================================================
+# LECTURA DEL ORIGEN
+# ============================================================
+
+def huellas_origen(conn_fuente):
+    """
+    Calcula por año un resumen barato del origen: cantidad de filas y una
+    suma de hashes del contenido (no depende del orden físico).
+
+    Returns:
+        dict: {anio: (total, huella)}
+    """
+    cursor = conn_fuente.cursor()
+    cursor.execute("""
+        SELECT "AÑO", COUNT(*), SUM(hashtext(t::text)::bigint)
+        FROM table1 t
+        GROUP BY "AÑO"
+        ORDER BY "AÑO"
+    """)
+    huellas = {anio: (total, f"{total}:{suma or 0}") for anio, total, suma in cursor.fetchall()}
+    cursor.close()
+    conn_fuente.commit()
+    return huellas
+
+def leer_desde(conn_fuente, anio, ultimo_ctid, tamano_lote):
+    """
+    Recorre las filas de un año en orden de ctid a partir de la última
+    posición confirmada, con un cursor de servidor.
+
+    Yields:
+        list: Lotes de tuplas (ctid, 16 columnas)
+    """
+    cursor = conn_fuente.cursor(name=f'incremental_{anio}')
+    cursor.itersize = tamano_lote
+    if ultimo_ctid:
+        cursor.execute(
+            f'SELECT ctid::text, {COLUMNAS_FUENTE} FROM table1 '
+            f'WHERE "AÑO" = %s AND ctid > %s::tid ORDER BY ctid',
+            (anio, ultimo_ctid)
+        )
+    else:
+        cursor.execute(
+            f'SELECT ctid::text, {COLUMNAS_FUENTE} FROM table1 '
+            f'WHERE "AÑO" = %s ORDER BY ctid',
+            (anio,)
+        )
+    while True:
+        lote = cursor.fetchmany(tamano_lote)
+        if not lote:
+            break
+        yield lote
+    cursor.close()
+
+# ============================================================
+# ESCRITURA POR PARTICIÓN
+# ============================================================
+
+def cargar_historico(conn_fuente, conn_destino, particion, anio, ultimo_ctid, tamano_lote):
+    """Carga un año en PostgreSQL; cada lote, su resumen y su checkpoint se confirman juntos."""
+    cursor = conn_destino.cursor()
+    cargados = 0
+    for lote in leer_desde(conn_fuente, anio, ultimo_ctid, tamano_lote):
+        filas = [fila[1:] for fila in lote]
+        execute_values(
+            cursor,
+            f"INSERT INTO creditos_historicos ({COLUMNAS_DESTINO}) VALUES %s",
+            filas,
+            page_size=tamano_lote
+        )
+        aplicar_delta(cursor, MOTOR_PG, filas)
+        avanzar_checkpoint(cursor, DIALECTO_PG, particion, lote[-1][0], len(lote))
+        conn_destino.commit()
+        cargados += len(lote)
+        print(f"  ✓ {particion}: {cargados:,} registros...", end='\r')
+    cursor.close()
+    return cargados
+
+def cargar_actual(conn_fuente, conn_destino, particion, anio, ultimo_ctid, tamano_lote):
+    """Carga un año en SQL Server; cada lote, su resumen y su checkpoint se confirman juntos."""
+    posicion = {}
+
+    def registros():
+        for lote in leer_desde(conn_fuente, anio, ultimo_ctid, tamano_lote):
+            for fila in lote:
+                posicion['ctid'] = fila[0]
+                yield fila[1:]
+
+    def al_confirmar(cursor, lote):
+        aplicar_delta(cursor, MOTOR_SQL, lote)
+        avanzar_checkpoint(cursor, DIALECTO_SQL, particion, posicion['ctid'], len(lote))
+
+    cargador = CargadorSQLServer(conn_destino, tamano_lote=tamano_lote)
+    return cargador.cargar(registros(), al_confirmar=al_confirmar)
+
+# ============================================================
+# MIGRACIÓN INCREMENTAL
+# ============================================================
+
+def migrar_incremental(tamano_lote=10000):
+    """
+    Migra table1 a las particiones reanudando desde los puntos de control.
+
+    Returns:
+        bool: True si todas las particiones quedaron completas
+    """
+    print("\n" + "="*80)
+    print("MIGRACIÓN INCREMENTAL")
+    print("="*80)
+
+    conn_fuente = conectar_postgresql(CONFIG_BONOLECCION)
+    if not conn_fuente:
+        return False
+
+    conn_pg_historico = conectar_postgresql(CONFIG_PG_HISTORICO)
+    if not conn_pg_historico:
+        return False
+
+    conn_sql_actual = conectar_sqlserver()
+    if not conn_sql_actual:
+        return False
+
+    # Las tablas solo se crean si no existen
+    asegurar_tabla_historica_pg(conn_pg_historico)
+    asegurar_tabla_actual_sql(conn_sql_actual)
+    for conn, ddl in ((conn_pg_historico, DDL_CHECKPOINT_PG), (conn_sql_actual, DDL_CHECKPOINT_SQL)):
+        cursor = conn.cursor()
+        cursor.execute(ddl)
+        conn.commit()
+        cursor.close()
+
+    # Los resúmenes se mantienen con deltas; si no cuadran con la base se recalculan
+    for conn, motor in ((conn_pg_historico, MOTOR_PG), (conn_sql_actual, MOTOR_SQL)):
+        asegurar_resumen(conn, motor)
+        if not verificar_resumen(conn, motor)['al_dia']:
+            print(f"  Recalculando {motor['tabla_resumen']}...")
+            reconstruir_resumen(conn, motor)
+
+    # Conexión, dialecto y cargador de cada motor destino
+    por_motor = {
+        MOTOR_POSTGRESQL: (conn_pg_historico, DIALECTO_PG, cargar_historico),
+        MOTOR_SQLSERVER: (conn_sql_actual, DIALECTO_SQL, cargar_actual),
+    }
+
+    print("\n→ Comparando origen con los puntos de control...")
+    huellas = huellas_origen(conn_fuente)
+
+    for anio, (total, huella) in huellas.items():
+        particion = str(anio)
+        destino = MAPA_PARTICIONES.particion_de(anio)
+        if destino is None:
+            print(f"  Año {anio}: sin partición destino, se omite")
+            continue
+        conn_destino, dialecto, cargar = por_motor[MAPA_PARTICIONES.motor(destino)]
+
+        cursor = conn_destino.cursor()
+        checkpoint = leer_checkpoint(cursor, dialecto, particion)
+        cursor.close()
+        conn_destino.commit()
+
+        if checkpoint and checkpoint[2] == huella:
+            ultimo_ctid, registros, _, completa = checkpoint
+            if completa:
+                print(f"  Año {anio}: sin cambios ({registros:,} registros en {destino})")
+                continue
+            print(f"  Año {anio}: reanudando en {registros:,} de {total:,} → {destino}")
+        else:
+            if checkpoint:
+                print(f"  Año {anio}: el origen cambió, recargando → {destino}")
+            else:
+                print(f"  Año {anio}: {total:,} registros → {destino}")
+            reiniciar_particion(conn_destino, dialecto, particion, anio, huella)
+            ultimo_ctid, registros = None, 0
+
+        cargados = cargar(conn_fuente, conn_destino, particion, anio, ultimo_ctid, tamano_lote)
+        completar_checkpoint(conn_destino, dialecto, particion)
+        print(f"  ✓ Año {anio}: {registros + cargados:,} registros en {destino}          ")
+
+    # Sin efecto si ya existen; en la primera carga se crean al final
+    indexar_tablas(conn_pg_historico, conn_sql_actual)
+
+    conn_fuente.close()
+    conn_pg_historico.close()
+    conn_sql_actual.close()
+
+    print("\n✓ MIGRACIÓN INCREMENTAL COMPLETADA")
+    return True
+
+if __name__ == "__main__":
+    if not migrar_incremental():
+        print("\n✗ La migración falló")
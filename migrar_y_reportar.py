@@ -3,10 +3,24 @@ MIGRACIÓN Y REPORTE AUTOMÁTICO
 Migra los datos de bonoleccion y muestra el reporte consolidado
 """
 
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import psycopg2
 import pyodbc
 from datetime import datetime
 
+from agregacion_federada import ConsultaAgregada
+from cargador_sqlserver import CargadorSQLServer
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+from asesor_indices import indexar
+from particionado_pg import asegurar_particiones
+from resumenes import MOTOR_PG, MOTOR_SQL, asegurar_resumen, reconstruir_resumen
+
 # ============================================================
 # CONFIGURACIÓN
 # ============================================================
@@ -35,6 +49,26 @@ CONFIG_SQL_ACTUAL = (
     "PWD=admin;"
 )
 
+# Partición alojada en cada motor (los años de cada una están en particiones.json)
+PARTICION_HISTORICA = MAPA_PARTICIONES.particion_de_motor(MOTOR_POSTGRESQL)
+PARTICION_ACTUAL = MAPA_PARTICIONES.particion_de_motor(MOTOR_SQLSERVER)
+
+# Columnas de table1 (origen) y su equivalente en las tablas destino
+COLUMNAS_FUENTE = (
+    '"Genero", "Edad", "Etnia", "Zona", "DistritoMies", '
+    '"Provincia", "Canton", "Parroquia", "TipoZona", "TipoCredito", '
+    '"TipoActividad", "Actividad", "NumeroCDH", "TipoSubsidio", '
+    '"CDH_ACTIVOS", "AÑO"'
+)
+
+COLUMNA_ANIO_FUENTE = '"AÑO"'
+
+COLUMNAS_DESTINO = (
+    'genero, edad, etnia, zona, distrito_mies, provincia, canton, '
+    'parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad, '
+    'numero_cdh, tipo_subsidio, cdh_activos, anio'
+)
+
 # ============================================================
 # FUNCIONES
 # ============================================================
@@ -55,31 +89,62 @@ def conectar_sqlserver():
         print(f"✗ Error conectando a SQL Server: {e}")
         return None
 
+DDL_HISTORICO_PG = """
+    CREATE TABLE {si_no_existe}creditos_historicos (
+        id SERIAL,
+        genero VARCHAR(20),
+        edad INTEGER,
+        etnia VARCHAR(50),
+        zona VARCHAR(100),
+        distrito_mies VARCHAR(100),
+        provincia VARCHAR(50),
+        canton VARCHAR(50),
+        parroquia VARCHAR(100),
+        tipo_zona VARCHAR(20),
+        tipo_credito VARCHAR(50),
+        tipo_actividad VARCHAR(200),
+        actividad VARCHAR(300),
+        numero_cdh INTEGER,
+        tipo_subsidio VARCHAR(100),
+        cdh_activos INTEGER,
+        anio INTEGER,
+        fecha_migracion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, anio)
+    ) PARTITION BY LIST (anio);
+"""
+
+DDL_ACTUAL_SQL = """
+    CREATE TABLE CreditosActuales (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        genero VARCHAR(20),
+        edad INT,
+        etnia VARCHAR(50),
+        zona VARCHAR(100),
+        distrito_mies VARCHAR(100),
+        provincia VARCHAR(50),
+        canton VARCHAR(50),
+        parroquia VARCHAR(100),
+        tipo_zona VARCHAR(20),
+        tipo_credito VARCHAR(50),
+        tipo_actividad VARCHAR(200),
+        actividad VARCHAR(300),
+        numero_cdh INT,
+        tipo_subsidio VARCHAR(100),
+        cdh_activos INT,
+        anio INT,
+        fecha_migracion DATETIME DEFAULT GETDATE()
+    );
+"""
+
+def crear_particiones_historicas(cursor):
+    """Una tabla hija por cada año del histórico (los índices se crean tras la carga)."""
+    asegurar_particiones(cursor, MAPA_PARTICIONES.anios(PARTICION_HISTORICA))
+
 def crear_tabla_historica_pg(conn):
     cursor = conn.cursor()
     cursor.execute("DROP TABLE IF EXISTS creditos_historicos CASCADE;")
-    cursor.execute("""
-        CREATE TABLE creditos_historicos (
-            id SERIAL PRIMARY KEY,
-            genero VARCHAR(20),
-            edad INTEGER,
-            etnia VARCHAR(50),
-            zona VARCHAR(100),
-            distrito_mies VARCHAR(100),
-            provincia VARCHAR(50),
-            canton VARCHAR(50),
-            parroquia VARCHAR(100),
-            tipo_zona VARCHAR(20),
-            tipo_credito VARCHAR(50),
-            tipo_actividad VARCHAR(200),
-            actividad VARCHAR(300),
-            numero_cdh INTEGER,
-            tipo_subsidio VARCHAR(100),
-            cdh_activos INTEGER,
-            anio INTEGER,
-            fecha_migracion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
+    cursor.execute(DDL_HISTORICO_PG.format(si_no_existe=''))
+    crear_particiones_historicas(cursor)
     conn.commit()
 
 def crear_tabla_actual_sql(conn):
@@ -88,30 +153,103 @@ def crear_tabla_actual_sql(conn):
         IF OBJECT_ID('dbo.CreditosActuales', 'U') IS NOT NULL
             DROP TABLE dbo.CreditosActuales;
     """)
-    cursor.execute("""
-        CREATE TABLE CreditosActuales (
-            id INT IDENTITY(1,1) PRIMARY KEY,
-            genero VARCHAR(20),
-            edad INT,
-            etnia VARCHAR(50),
-            zona VARCHAR(100),
-            distrito_mies VARCHAR(100),
-            provincia VARCHAR(50),
-            canton VARCHAR(50),
-            parroquia VARCHAR(100),
-            tipo_zona VARCHAR(20),
-            tipo_credito VARCHAR(50),
-            tipo_actividad VARCHAR(200),
-            actividad VARCHAR(300),
-            numero_cdh INT,
-            tipo_subsidio VARCHAR(100),
-            cdh_activos INT,
-            anio INT,
-            fecha_migracion DATETIME DEFAULT GETDATE()
-        );
-    """)
+    cursor.execute(DDL_ACTUAL_SQL)
     conn.commit()
 
+def asegurar_tabla_historica_pg(conn):
+    """Crea creditos_historicos solo si no existe (conserva los datos)."""
+    cursor = conn.cursor()
+    cursor.execute(DDL_HISTORICO_PG.format(si_no_existe='IF NOT EXISTS '))
+    crear_particiones_historicas(cursor)
+    conn.commit()
+
+def asegurar_tabla_actual_sql(conn):
+    """Crea CreditosActuales solo si no existe (conserva los datos)."""
+    cursor = conn.cursor()
+    cursor.execute("IF OBJECT_ID('dbo.CreditosActuales', 'U') IS NULL" + DDL_ACTUAL_SQL)
+    conn.commit()
+
+class _LectorConProgreso:
+    """Envuelve el extremo de lectura del pipe y cuenta las líneas (registros) de COPY."""
+    
+    def __init__(self, archivo, al_avanzar):
+        self._archivo = archivo
+        self._al_avanzar = al_avanzar
+    
+    def read(self, tamano=-1):
+        datos = self._archivo.read(tamano)
+        if datos:
+            self._al_avanzar(datos.count(b'\n'))
+        return datos
+
+def indexar_tablas(conn_pg, conn_sql):
+    """Crea los índices secundarios una vez terminada la carga masiva."""
+    print("\n→ Creando índices...")
+    for conn, motor in ((conn_pg, MOTOR_POSTGRESQL), (conn_sql, MOTOR_SQLSERVER)):
+        print(f"  ✓ {MAPA_PARTICIONES.particion_de_motor(motor)}: {indexar(conn, motor):.1f} s")
+
+def reconstruir_resumenes(conn_pg, conn_sql):
+    """Recalcula los resúmenes de ambas particiones después de una carga completa."""
+    print("\n→ Calculando resúmenes...")
+    for conn, motor in ((conn_pg, MOTOR_PG), (conn_sql, MOTOR_SQL)):
+        asegurar_resumen(conn, motor)
+        reconstruir_resumen(conn, motor)
+
+def copiar_entre_postgresql(conn_origen, conn_destino, consulta_origen, tabla_destino,
+                            al_avanzar=None):
+    """
+    Copia el resultado de una consulta de una base PostgreSQL a una tabla de
+    otra usando COPY en ambos extremos.
+    
+    Los datos fluyen por un pipe del sistema operativo: un hilo escribe
+    COPY ... TO STDOUT desde el origen mientras el hilo principal lee con
+    COPY ... FROM STDIN en el destino. Nada se materializa en Python y la
+    memoria usada no depende del tamaño de la tabla.
+    
+    Args:
+        al_avanzar: Función opcional que recibe cuántos registros se leyeron
+    
+    Returns:
+        int: Registros copiados (la transacción del destino queda confirmada)
+    """
+    lectura, escritura = os.pipe()
+    errores = []
+    
+    def exportar():
+        try:
+            with os.fdopen(escritura, 'wb') as salida:
+                cursor = conn_origen.cursor()
+                cursor.copy_expert(f"COPY ({consulta_origen}) TO STDOUT", salida)
+                cursor.close()
+        except Exception as e:
+            errores.append(e)
+    
+    hilo = threading.Thread(target=exportar, daemon=True)
+    hilo.start()
+    
+    cursor_destino = conn_destino.cursor()
+    try:
+        with os.fdopen(lectura, 'rb') as entrada:
+            if al_avanzar:
+                entrada = _LectorConProgreso(entrada, al_avanzar)
+            cursor_destino.copy_expert(
+                f"COPY {tabla_destino} ({COLUMNAS_DESTINO}) FROM STDIN", entrada)
+    except Exception:
+        conn_destino.rollback()
+        hilo.join()
+        raise
+    hilo.join()
+    
+    # Si el origen falló, el destino vio un fin de datos prematuro
+    if errores:
+        conn_destino.rollback()
+        raise errores[0]
+    
+    conn_destino.commit()
+    copiados = cursor_destino.rowcount
+    cursor_destino.close()
+    return copiados
+
 def migrar_datos():
     print("\n" + "="*80)
     print("MIGRACIÓN DE DATOS REALES")
@@ -147,129 +285,326 @@ def migrar_datos():
     
     estadisticas = cursor_fuente.fetchall()
     for anio, total in estadisticas:
-        destino = "PostgreSQL" if anio in [2022, 2023, 2024] else "SQL Server"
+        destino = MAPA_PARTICIONES.particion_de(anio) or "sin partición, se omite"
         print(f"  Año {anio}: {total:,} registros → {destino}")
     
     # Migrar históricos
-    print("\n→ Migrando históricos (2022-2024)...")
-    cursor_fuente.execute("""
-        SELECT "Genero", "Edad", "Etnia", "Zona", "DistritoMies", 
-               "Provincia", "Canton", "Parroquia", "TipoZona", "TipoCredito",
-               "TipoActividad", "Actividad", "NumeroCDH", "TipoSubsidio",
-               "CDH_ACTIVOS", "AÑO"
-        FROM table1
-        WHERE "AÑO" IN (2022, 2023, 2024)
-    """)
+    print(f"\n→ Migrando históricos ({MAPA_PARTICIONES.describir(PARTICION_HISTORICA)})...")
+    # COPY origen → COPY destino, sin pasar los registros por Python
+    registros_historicos = copiar_entre_postgresql(
+        conn_fuente, conn_pg_historico,
+        f'SELECT {COLUMNAS_FUENTE} FROM table1 '
+        f'WHERE {MAPA_PARTICIONES.filtro_sql(PARTICION_HISTORICA, COLUMNA_ANIO_FUENTE)}',
+        'creditos_historicos'
+    )
     
-    cursor_pg = conn_pg_historico.cursor()
-    registros_historicos = 0
-    batch = []
-    
-    for registro in cursor_fuente:
-        batch.append(registro)
-        if len(batch) >= 1000:
-            cursor_pg.executemany("""
-                INSERT INTO creditos_historicos 
-                (genero, edad, etnia, zona, distrito_mies, provincia, canton, 
-                 parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
-                 numero_cdh, tipo_subsidio, cdh_activos, anio)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, batch)
-            conn_pg_historico.commit()
-            registros_historicos += len(batch)
-            print(f"  ✓ {registros_historicos:,} registros...", end='\r')
-            batch = []
-    
-    if batch:
-        cursor_pg.executemany("""
-            INSERT INTO creditos_historicos 
-            (genero, edad, etnia, zona, distrito_mies, provincia, canton, 
-             parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
-             numero_cdh, tipo_subsidio, cdh_activos, anio)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, batch)
-        conn_pg_historico.commit()
-        registros_historicos += len(batch)
-    
-    print(f"\n  ✓ Total históricos: {registros_historicos:,}")
+    print(f"  ✓ Total históricos: {registros_historicos:,}")
     
     # Migrar actuales
-    print("\n→ Migrando actuales (2025)...")
+    print(f"\n→ Migrando actuales ({MAPA_PARTICIONES.describir(PARTICION_ACTUAL)})...")
+    # Cursor de servidor: el origen se lee por bloques, no completo en memoria
+    cursor_actuales = conn_fuente.cursor(name='fuente_actuales')
+    cursor_actuales.itersize = 10000
+    cursor_actuales.execute(f'SELECT {COLUMNAS_FUENTE} FROM table1 '
+                            f'WHERE {MAPA_PARTICIONES.filtro_sql(PARTICION_ACTUAL, COLUMNA_ANIO_FUENTE)}')
+    
+    cargador = CargadorSQLServer(conn_sql_actual, tamano_lote=10000)
+    registros_actuales = cargador.cargar(cursor_actuales, recarga_completa=True)
+    cursor_actuales.close()
+    
+    print(f"  ✓ Total actuales: {registros_actuales:,}")
+    
+    indexar_tablas(conn_pg_historico, conn_sql_actual)
+    reconstruir_resumenes(conn_pg_historico, conn_sql_actual)
+    
+    # Cerrar
+    conn_fuente.close()
+    conn_pg_historico.close()
+    conn_sql_actual.close()
+    
+    print("\n✓ MIGRACIÓN COMPLETADA")
+    return True
+
+# ============================================================
+# MIGRACIÓN PARALELA POR PARTICIÓN
+# ============================================================
+
+class ProgresoMigracion:
+    """Contadores compartidos por los workers y una línea de progreso consolidada."""
+    
+    def __init__(self, particiones):
+        self._lock = threading.Lock()
+        self.registros = {nombre: 0 for nombre in particiones}
+        self.estado = {nombre: 'pendiente' for nombre in particiones}
+    
+    def sumar(self, particion, cantidad):
+        with self._lock:
+            self.registros[particion] += cantidad
+    
+    def marcar(self, particion, estado):
+        with self._lock:
+            self.estado[particion] = estado
+    
+    def linea(self):
+        with self._lock:
+            partes = [f"{nombre}: {self.registros[nombre]:,} ({self.estado[nombre]})"
+                      for nombre in self.registros]
+            total = sum(self.registros.values())
+        return f"  {' | '.join(partes)} | Total: {total:,}"
+
+def _migrar_particion_pg(particion, filtro, progreso):
+    """Worker: copia una porción de table1 a creditos_historicos con COPY."""
+    conn_fuente = conectar_postgresql(CONFIG_BONOLECCION)
+    conn_destino = conectar_postgresql(CONFIG_PG_HISTORICO)
+    if not conn_fuente or not conn_destino:
+        raise RuntimeError(f"Sin conexión para la partición {particion}")
+    
+    try:
+        return copiar_entre_postgresql(
+            conn_fuente, conn_destino,
+            f'SELECT {COLUMNAS_FUENTE} FROM table1 WHERE {filtro}',
+            'creditos_historicos',
+            al_avanzar=lambda n: progreso.sumar(particion, n)
+        )
+    finally:
+        conn_fuente.close()
+        conn_destino.close()
+
+def _migrar_particion_sql(particion, filtro, progreso, tamano_lote, lotes_en_cola):
+    """
+    Worker: un hilo lector llena una cola acotada con lotes del origen y el
+    cargador de SQL Server los consume. Si el destino es más lento, el
+    lector se bloquea en lugar de acumular datos en memoria.
+    """
+    conn_fuente = conectar_postgresql(CONFIG_BONOLECCION)
+    conn_destino = conectar_sqlserver()
+    if not conn_fuente or not conn_destino:
+        raise RuntimeError(f"Sin conexión para la partición {particion}")
+    
+    cola = queue.Queue(maxsize=lotes_en_cola)
+    fin = object()
+    errores = []
+    detener = threading.Event()
+    
+    def leer():
+        try:
+            cursor = conn_fuente.cursor(name=f'fuente_{particion}')
+            cursor.itersize = tamano_lote
+            cursor.execute(f'SELECT {COLUMNAS_FUENTE} FROM table1 WHERE {filtro}')
+            while not detener.is_set():
+                lote = cursor.fetchmany(tamano_lote)
+                if not lote:
+                    break
+                cola.put(lote)
+            cursor.close()
+        except Exception as e:
+            errores.append(e)
+        finally:
+            cola.put(fin)
+    
+    def registros():
+        while True:
+            lote = cola.get()
+            if lote is fin:
+                return
+            yield from lote
+            progreso.sumar(particion, len(lote))
+    
+    lector = threading.Thread(target=leer, daemon=True)
+    lector.start()
+    
+    try:
+        cargador = CargadorSQLServer(conn_destino, tamano_lote=tamano_lote)
+        cargados = cargador.cargar(registros(), recarga_completa=True, progreso=False)
+    except Exception:
+        # Liberar al lector si está bloqueado en una cola llena
+        detener.set()
+        while lector.is_alive():
+            try:
+                cola.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        raise
+    finally:
+        lector.join()
+        conn_fuente.close()
+        conn_destino.close()
+    
+    if errores:
+        raise errores[0]
+    return cargados
+
+def migrar_datos_paralelo(por_anio=True, tamano_lote=10000, lotes_en_cola=4):
+    """
+    Migra todas las particiones al mismo tiempo, un worker por partición
+    destino (o por año si por_anio=True), en un pool de hilos.
+    
+    El tiempo total queda cerca del de la partición más lenta en lugar
+    de la suma de todas.
+    
+    Args:
+        por_anio: Un worker por cada año histórico en lugar de uno para toda la partición
+        tamano_lote: Registros por lote enviado a SQL Server
+        lotes_en_cola: Lotes máximos en espera entre lector y escritor
+    """
+    print("\n" + "="*80)
+    print("MIGRACIÓN DE DATOS REALES (PARALELA)")
+    print("="*80)
+    
+    conn_fuente = conectar_postgresql(CONFIG_BONOLECCION)
+    if not conn_fuente:
+        return False
+    
+    conn_pg_historico = conectar_postgresql(CONFIG_PG_HISTORICO)
+    if not conn_pg_historico:
+        return False
+    
+    conn_sql_actual = conectar_sqlserver()
+    if not conn_sql_actual:
+        return False
+    
+    # Crear tablas antes de lanzar los workers
+    print("\n→ Creando tablas...")
+    crear_tabla_historica_pg(conn_pg_historico)
+    crear_tabla_actual_sql(conn_sql_actual)
+    conn_pg_historico.close()
+    conn_sql_actual.close()
+    
+    print("\n→ Analizando distribución...")
+    cursor_fuente = conn_fuente.cursor()
     cursor_fuente.execute("""
-        SELECT "Genero", "Edad", "Etnia", "Zona", "DistritoMies", 
-               "Provincia", "Canton", "Parroquia", "TipoZona", "TipoCredito",
-               "TipoActividad", "Actividad", "NumeroCDH", "TipoSubsidio",
-               "CDH_ACTIVOS", "AÑO"
+        SELECT "AÑO", COUNT(*) as total
         FROM table1
-        WHERE "AÑO" = 2025
+        GROUP BY "AÑO"
+        ORDER BY "AÑO";
     """)
+    estadisticas = cursor_fuente.fetchall()
+    conn_fuente.close()
+    
+    historicos = [anio for anio, _ in estadisticas
+                  if MAPA_PARTICIONES.particion_de(anio) == PARTICION_HISTORICA]
+    for anio, total in estadisticas:
+        destino = MAPA_PARTICIONES.particion_de(anio) or "sin partición, se omite"
+        print(f"  Año {anio}: {total:,} registros → {destino}")
     
-    cursor_sql = conn_sql_actual.cursor()
-    registros_actuales = 0
-    batch = []
-    
-    for registro in cursor_fuente:
-        batch.append(registro)
-        if len(batch) >= 1000:
-            cursor_sql.executemany("""
-                INSERT INTO CreditosActuales 
-                (genero, edad, etnia, zona, distrito_mies, provincia, canton, 
-                 parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
-                 numero_cdh, tipo_subsidio, cdh_activos, anio)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, batch)
-            conn_sql_actual.commit()
-            registros_actuales += len(batch)
-            print(f"  ✓ {registros_actuales:,} registros...", end='\r')
-            batch = []
-    
-    if batch:
-        cursor_sql.executemany("""
-            INSERT INTO CreditosActuales 
-            (genero, edad, etnia, zona, distrito_mies, provincia, canton, 
-             parroquia, tipo_zona, tipo_credito, tipo_actividad, actividad,
-             numero_cdh, tipo_subsidio, cdh_activos, anio)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, batch)
-        conn_sql_actual.commit()
-        registros_actuales += len(batch)
-    
-    print(f"\n  ✓ Total actuales: {registros_actuales:,}")
+    # (nombre, worker, filtro sobre table1)
+    if por_anio:
+        tareas = [(str(anio), _migrar_particion_pg, f'{COLUMNA_ANIO_FUENTE} = {anio}')
+                  for anio in historicos]
+    else:
+        tareas = [(MAPA_PARTICIONES.describir(PARTICION_HISTORICA), _migrar_particion_pg,
+                   MAPA_PARTICIONES.filtro_sql(PARTICION_HISTORICA, COLUMNA_ANIO_FUENTE))]
+    tareas.append((MAPA_PARTICIONES.describir(PARTICION_ACTUAL), _migrar_particion_sql,
+                   MAPA_PARTICIONES.filtro_sql(PARTICION_ACTUAL, COLUMNA_ANIO_FUENTE)))
     
-    # Cerrar
-    conn_fuente.close()
+    progreso = ProgresoMigracion([nombre for nombre, _, _ in tareas])
+    resultados = {}
+    fallidas = {}
+    inicio = time.perf_counter()
+    
+    print(f"\n→ Migrando {len(tareas)} particiones en paralelo...")
+    with ThreadPoolExecutor(max_workers=len(tareas)) as executor:
+        futuros = {}
+        for nombre, worker, filtro in tareas:
+            argumentos = (nombre, filtro, progreso)
+            if worker is _migrar_particion_sql:
+                argumentos += (tamano_lote, lotes_en_cola)
+            progreso.marcar(nombre, 'migrando')
+            futuros[executor.submit(worker, *argumentos)] = nombre
+        
+        pendientes = set(futuros)
+        while pendientes:
+            sys.stdout.write(progreso.linea() + '\r')
+            sys.stdout.flush()
+            terminados = [f for f in pendientes if f.done()]
+            for futuro in terminados:
+                nombre = futuros[futuro]
+                pendientes.discard(futuro)
+                try:
+                    resultados[nombre] = futuro.result()
+                    progreso.marcar(nombre, 'ok')
+                except Exception as e:
+                    fallidas[nombre] = e
+                    progreso.marcar(nombre, 'error')
+            if pendientes:
+                time.sleep(0.5)
+    
+    print(progreso.linea())
+    
+    for nombre, total in resultados.items():
+        print(f"  ✓ {nombre}: {total:,} registros")
+    for nombre, error in fallidas.items():
+        print(f"  ✗ {nombre}: {error}")
+    print(f"\n  Tiempo total: {time.perf_counter() - inicio:.1f} s")
+    
+    if fallidas:
+        print("\n✗ MIGRACIÓN INCOMPLETA")
+        return False
+    
+    conn_pg_historico = conectar_postgresql(CONFIG_PG_HISTORICO)
+    conn_sql_actual = conectar_sqlserver()
+    if not conn_pg_historico or not conn_sql_actual:
+        return False
+    indexar_tablas(conn_pg_historico, conn_sql_actual)
+    reconstruir_resumenes(conn_pg_historico, conn_sql_actual)
     conn_pg_historico.close()
     conn_sql_actual.close()
     
     print("\n✓ MIGRACIÓN COMPLETADA")
     return True
 
-def generar_reporte():
+# Todo el reporte en una consulta GROUPING SETS por partición,
+# sobre las tablas de resumen en lugar de las tablas base
+CONSULTA_REPORTE = ConsultaAgregada(
+    conjuntos=[(), ('provincia',), ('anio',), ('genero',), ('tipo_credito',)],
+    metricas={'total': 'SUM(total)', 'activos': 'SUM(activos)'}
+)
+
+def generar_reporte(instantanea=None):
+    """
+    Args:
+        instantanea: InstantaneaColumnar (analitica_local.py) opcional; si se
+                     indica el reporte se calcula en memoria sin consultar las bases
+    """
     print("\n" + "="*100)
     print("REPORTE CONSOLIDADO - CRÉDITOS DE DESARROLLO HUMANO")
     print("="*100)
     
     try:
-        # Conectar
-        conn_pg = conectar_postgresql(CONFIG_PG_HISTORICO)
-        conn_sql = conectar_sqlserver()
-        
-        if not conn_pg or not conn_sql:
-            print("\n✗ No se pudo conectar a las bases de datos")
-            return
+        if instantanea is not None:
+            resultado = instantanea.agregar(
+                CONSULTA_REPORTE.conjuntos,
+                nombres={PARTICION_HISTORICA: 'historico', PARTICION_ACTUAL: 'actual'}
+            )
+            conn_pg = conn_sql = None
+        else:
+            # Conectar
+            conn_pg = conectar_postgresql(CONFIG_PG_HISTORICO)
+            conn_sql = conectar_sqlserver()
+            
+            if not conn_pg or not conn_sql:
+                print("\n✗ No se pudo conectar a las bases de datos")
+                return
+            
+            # Un viaje por partición, ambas en paralelo
+            resultado = CONSULTA_REPORTE.ejecutar({
+                'historico': (conn_pg, MOTOR_PG['tabla_resumen'],
+                              MAPA_PARTICIONES.filtro_sql(PARTICION_HISTORICA)),
+                'actual': (conn_sql, MOTOR_SQL['tabla_resumen'],
+                           MAPA_PARTICIONES.filtro_sql(PARTICION_ACTUAL)),
+            })
         
         # Estadísticas generales
-        cursor_pg = conn_pg.cursor()
-        cursor_pg.execute("SELECT COUNT(*), SUM(cdh_activos) FROM creditos_historicos")
-        total_historico, activos_historico = cursor_pg.fetchone()
-        
-        cursor_sql = conn_sql.cursor()
-        cursor_sql.execute("SELECT COUNT(*), SUM(cdh_activos) FROM CreditosActuales")
-        total_actual, activos_actual = cursor_sql.fetchone()
+        total_historico = resultado.total('historico').get('total', 0)
+        activos_historico = resultado.total('historico').get('activos')
+        total_actual = resultado.total('actual').get('total', 0)
+        activos_actual = resultado.total('actual').get('activos')
         
         print(f"\n📊 RESUMEN GENERAL:")
-        print(f"  • Histórico (2022-2024) en PostgreSQL: {total_historico:,} créditos")
-        print(f"  • Actual (2025) en SQL Server:        {total_actual:,} créditos")
+        etiqueta_historico = f"Histórico ({MAPA_PARTICIONES.describir(PARTICION_HISTORICA)}) en PostgreSQL:"
+        etiqueta_actual = f"Actual ({MAPA_PARTICIONES.describir(PARTICION_ACTUAL)}) en SQL Server:"
+        print(f"  • {etiqueta_historico:<36} {total_historico:,} créditos")
+        print(f"  • {etiqueta_actual:<36} {total_actual:,} créditos")
         print(f"  • TOTAL:                              {(total_historico + total_actual):,} créditos")
         print(f"  • CDH activos históricos:             {activos_historico or 0:,}")
         print(f"  • CDH activos actuales:               {activos_actual or 0:,}")
@@ -277,36 +612,18 @@ def generar_reporte():
         # Top provincias
         print(f"\n📍 TOP 10 PROVINCIAS:")
         
-        # PostgreSQL
-        cursor_pg.execute("""
-            SELECT provincia, COUNT(*) as total, SUM(cdh_activos) as activos
-            FROM creditos_historicos
-            GROUP BY provincia
-            ORDER BY total DESC
-        """)
-        provincias_pg = {row[0]: {'historico': row[1], 'activos': row[2] or 0} for row in cursor_pg.fetchall()}
-        
-        # SQL Server
-        cursor_sql.execute("""
-            SELECT provincia, COUNT(*) as total, SUM(cdh_activos) as activos
-            FROM CreditosActuales
-            GROUP BY provincia
-        """)
-        provincias_sql = {row[0]: {'actual': row[1], 'activos': row[2] or 0} for row in cursor_sql.fetchall()}
+        provincias_pg = resultado.grupo('provincia', 'historico')
+        provincias_sql = resultado.grupo('provincia', 'actual')
         
         # Consolidar
         todas_provincias = {}
-        for prov, datos in provincias_pg.items():
-            todas_provincias[prov] = {'historico': datos['historico'], 'actual': 0, 'activos': datos['activos']}
+        for prov, datos in resultado.grupo('provincia').items():
+            todas_provincias[prov] = {
+                'historico': provincias_pg.get(prov, {}).get('total', 0),
+                'actual': provincias_sql.get(prov, {}).get('total', 0),
+                'activos': datos['activos'] or 0
+            }
         
-        for prov, datos in provincias_sql.items():
-            if prov in todas_provincias:
-                todas_provincias[prov]['actual'] = datos['actual']
-                todas_provincias[prov]['activos'] += datos['activos']
-            else:
-                todas_provincias[prov] = {'historico': 0, 'actual': datos['actual'], 'activos': datos['activos']}
-        
-        # Ordenar y mostrar top 10
         sorted_provinces = sorted(todas_provincias.items(), 
                                  key=lambda x: x[1]['historico'] + x[1]['actual'], 
                                  reverse=True)[:10]
@@ -320,72 +637,43 @@ def generar_reporte():
         
         # Distribución por año
         print(f"\n📅 DISTRIBUCIÓN POR AÑO:")
-        cursor_pg.execute("""
-            SELECT anio, COUNT(*) as total
-            FROM creditos_historicos
-            GROUP BY anio
-            ORDER BY anio
-        """)
         
         print(f"  {'Año':<10} {'Registros':>15} {'Base de Datos':<20}")
         print(f"  {'-'*10} {'-'*15} {'-'*20}")
         
-        for anio, total in cursor_pg.fetchall():
-            print(f"  {anio:<10} {total:>15,} {'PostgreSQL':<20}")
-        
-        cursor_sql.execute("""
-            SELECT anio, COUNT(*) as total
-            FROM CreditosActuales
-            GROUP BY anio
-        """)
+        for anio, datos in sorted(resultado.grupo('anio', 'historico').items()):
+            print(f"  {anio:<10} {datos['total']:>15,} {'PostgreSQL':<20}")
         
-        for anio, total in cursor_sql.fetchall():
-            print(f"  {anio:<10} {total:>15,} {'SQL Server':<20}")
+        for anio, datos in resultado.grupo('anio', 'actual').items():
+            print(f"  {anio:<10} {datos['total']:>15,} {'SQL Server':<20}")
         
         # Distribución por género
         print(f"\n👥 DISTRIBUCIÓN POR GÉNERO:")
         
-        cursor_pg.execute("""
-            SELECT genero, COUNT(*) as total
-            FROM creditos_historicos
-            GROUP BY genero
-        """)
-        genero_pg = dict(cursor_pg.fetchall())
-        
-        cursor_sql.execute("""
-            SELECT genero, COUNT(*) as total
-            FROM CreditosActuales
-            GROUP BY genero
-        """)
-        genero_sql = dict(cursor_sql.fetchall())
-        
+        genero = resultado.grupo('genero')
         total_general = total_historico + total_actual
-        femenino_total = genero_pg.get('FEMENINO', 0) + genero_sql.get('FEMENINO', 0)
-        masculino_total = genero_pg.get('MASCULINO', 0) + genero_sql.get('MASCULINO', 0)
+        femenino_total = genero.get('FEMENINO', {}).get('total', 0)
+        masculino_total = genero.get('MASCULINO', {}).get('total', 0)
         
         print(f"  • Femenino:  {femenino_total:>8,} ({femenino_total/total_general*100:.1f}%)")
         print(f"  • Masculino: {masculino_total:>8,} ({masculino_total/total_general*100:.1f}%)")
         
         # Top tipos de crédito
         print(f"\n💰 TOP 5 TIPOS DE CRÉDITO:")
-        cursor_pg.execute("""
-            SELECT tipo_credito, COUNT(*) as total
-            FROM creditos_historicos
-            GROUP BY tipo_credito
-            ORDER BY total DESC
-            LIMIT 5
-        """)
         
         print(f"  {'Tipo de Crédito':<40} {'Total':>15}")
         print(f"  {'-'*40} {'-'*15}")
         
-        for tipo, total in cursor_pg.fetchall():
-            print(f"  {tipo:<40} {total:>15,}")
+        tipos = sorted(resultado.grupo('tipo_credito', 'historico').items(),
+                       key=lambda x: x[1]['total'], reverse=True)[:5]
+        for tipo, datos in tipos:
+            print(f"  {tipo:<40} {datos['total']:>15,}")
         
         print("\n" + "="*100)
         
-        conn_pg.close()
-        conn_sql.close()
+        if conn_pg is not None:
+            conn_pg.close()
+            conn_sql.close()
         
     except Exception as e:
         print(f"\n✗ Error generando reporte: {e}")
@@ -397,8 +685,9 @@ def generar_reporte():
 # ============================================================
 
 if __name__ == "__main__":
-    # Migrar datos
-    if migrar_datos():
+    # Migrar datos (--paralelo: un worker por partición)
+    migrar = migrar_datos_paralelo if '--paralelo' in sys.argv else migrar_datos
+    if migrar():
         # Generar reporte
         generar_reporte()
     else:
@@ -0,0 +1,280 @@
+"""
+============================================================
+PARTICIONADO NATIVO DE creditos_historicos (POSTGRESQL)
+============================================================
+
+creditos_historicos es una tabla particionada por LIST (anio)
+con una tabla hija por año (creditos_historicos_2023, ...):
+
+  • Las consultas con WHERE anio = ... solo leen la hija del
+    año (poda de particiones)
+  • Cada hija tiene sus propios índices (se declaran en la
+    tabla madre y PostgreSQL los crea en cada hija; ver
+    asesor_indices.py)
+  • Vaciar un año es un TRUNCATE de su hija y retirarlo un
+    DETACH PARTITION, sin DELETE fila por fila
+  • Una partición DEFAULT (creditos_historicos_otros) recibe
+    los años sin hija propia, p. ej. un año recién asignado a
+    PostgreSQL en particiones.json; al crear su hija las filas
+    se trasladan desde ella
+  • anio es parte de la clave primaria: no admite NULL
+
+Migración desde la tabla única anterior (bloquea la tabla
+mientras copia; ejecutar fuera de horario):
+
+    python particionado_pg.py            → muestra el estado
+    python particionado_pg.py --migrar   → convierte la tabla
+    python particionado_pg.py --separar 2022 [--borrar]
+============================================================
+"""
+
+import sys
+from typing import Iterable, List, Optional
+
+from asesor_indices import crear_indices
+from mapa_particiones import MOTOR_POSTGRESQL
+
+TABLA_HISTORICA = 'creditos_historicos'
+TABLA_ANTERIOR = 'creditos_historicos_anterior'
+TABLA_DEFECTO = 'creditos_historicos_otros'
+
+# ============================================================
+# CONSULTAS DE ESTADO
+# ============================================================
+
+def nombre_particion(anio: int) -> str:
+    """Tabla hija de un año."""
+    return f"{TABLA_HISTORICA}_{int(anio)}"
+
+def existe_tabla(cursor, tabla: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (tabla,))
+    return cursor.fetchone()[0]
+
+def es_particionada(cursor) -> bool:
+    """True si creditos_historicos ya es una tabla particionada."""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (TABLA_HISTORICA,))
+    fila = cursor.fetchone()
+    return fila is not None and fila[0] == 'p'
+
+def particiones_existentes(cursor) -> List[str]:
+    """Tablas hijas adjuntas a creditos_historicos."""
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+    """, (TABLA_HISTORICA,))
+    return [fila[0] for fila in cursor.fetchall()]
+
+# ============================================================
+# PARTICIONES E ÍNDICES
+# ============================================================
+
+def asegurar_particion_defecto(cursor):
+    """Crea la partición DEFAULT si no existe (sin efecto en una tabla no particionada)."""
+    if es_particionada(cursor) and not existe_tabla(cursor, TABLA_DEFECTO):
+        cursor.execute(f"CREATE TABLE {TABLA_DEFECTO} PARTITION OF {TABLA_HISTORICA} DEFAULT")
+
+def asegurar_particion_anio(cursor, anio: int):
+    """
+    Crea la tabla hija del año si no existe (sin efecto en una tabla no
+    particionada). Si la partición DEFAULT ya recibió filas de ese año se
+    trasladan a la hija nueva en la misma transacción.
+
+    Crear una hija bloquea creditos_historicos en modo exclusivo hasta el
+    commit: usar una transacción corta (ver crear_particion_anio).
+    """
+    if not es_particionada(cursor) or existe_tabla(cursor, nombre_particion(anio)):
+        return
+    trasladar = False
+    if existe_tabla(cursor, TABLA_DEFECTO):
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {TABLA_DEFECTO} WHERE anio = %s)", (anio,))
+        trasladar = cursor.fetchone()[0]
+    if trasladar:
+        # PostgreSQL no crea la hija mientras DEFAULT tenga filas de su año
+        cursor.execute(f"CREATE TEMP TABLE traslado_anio (LIKE {TABLA_HISTORICA})")
+        cursor.execute(f"""
+            WITH movidas AS (DELETE FROM {TABLA_DEFECTO} WHERE anio = %s RETURNING *)
+            INSERT INTO traslado_anio SELECT * FROM movidas
+        """, (anio,))
+    cursor.execute(f"CREATE TABLE {nombre_particion(anio)} "
+                   f"PARTITION OF {TABLA_HISTORICA} FOR VALUES IN ({int(anio)})")
+    if trasladar:
+        cursor.execute(f"INSERT INTO {nombre_particion(anio)} SELECT * FROM traslado_anio")
+        cursor.execute("DROP TABLE traslado_anio")
+
+def asegurar_particiones(cursor, anios: Iterable[int]):
+    """Crea la partición DEFAULT y una hija por año."""
+    for anio in anios:
+        asegurar_particion_anio(cursor, anio)
+    asegurar_particion_defecto(cursor)
+
+def crear_particion_anio(conn, anio: int):
+    """
+    Crea la hija del año en su propia transacción corta, antes de una copia
+    larga: así el bloqueo exclusivo sobre creditos_historicos dura solo el
+    CREATE y las lecturas de otros años no esperan a la copia.
+    """
+    cursor = conn.cursor()
+    asegurar_particion_anio(cursor, anio)
+    conn.commit()
+    cursor.close()
+
+def vaciar_anio(cursor, anio: int):
+    """
+    Borra todas las filas de un año: TRUNCATE de su hija si la tabla está
+    particionada, DELETE en la tabla única anterior. La hija debe existir
+    (crear_particion_anio); si no existe, las filas del año que hubiera en
+    la partición DEFAULT se borran con DELETE.
+    """
+    if not es_particionada(cursor):
+        cursor.execute(f"DELETE FROM {TABLA_HISTORICA} WHERE anio = %s", (anio,))
+    elif existe_tabla(cursor, nombre_particion(anio)):
+        cursor.execute(f"TRUNCATE {nombre_particion(anio)}")
+    elif existe_tabla(cursor, TABLA_DEFECTO):
+        cursor.execute(f"DELETE FROM {TABLA_DEFECTO} WHERE anio = %s", (anio,))
+
+def separar_anio(conn, anio: int, borrar: bool = False):
+    """
+    Retira un año de creditos_historicos con DETACH PARTITION (solo cambia
+    el catálogo). La hija queda como tabla independiente para archivarla,
+    o se elimina con borrar=True. El año se quita también del resumen.
+    """
+    from resumenes import MOTOR_PG, borrar_anio
+
+    cursor = conn.cursor()
+    cursor.execute(f"ALTER TABLE {TABLA_HISTORICA} DETACH PARTITION {nombre_particion(anio)}")
+    if borrar:
+        cursor.execute(f"DROP TABLE {nombre_particion(anio)}")
+    borrar_anio(cursor, MOTOR_PG, anio)
+    conn.commit()
+    cursor.close()
+
+# ============================================================
+# MIGRACIÓN DESDE LA TABLA ÚNICA
+# ============================================================
+
+def migrar_a_particionada(conn, anios_adicionales: Iterable[int] = ()) -> int:
+    """
+    Convierte la tabla única creditos_historicos en una tabla particionada
+    por año, en una sola transacción:
+
+      1. Renombra la tabla anterior y sus índices
+      2. Crea la tabla madre con las mismas columnas y valores por defecto
+         (la secuencia de id se conserva) y la clave primaria + anio
+      3. Copia las restricciones CHECK que no son sobre anio (el
+         particionado ya delimita los años)
+      4. Crea una hija por cada año presente y por anios_adicionales,
+         y la partición DEFAULT
+      5. Copia las filas, crea los índices y elimina la tabla anterior
+
+    anio pasa a formar parte de la clave primaria (NOT NULL): las filas
+    sin año deben corregirse o borrarse antes de migrar.
+
+    Returns:
+        int: Filas copiadas (0 si la tabla ya estaba particionada)
+
+    Raises:
+        ValueError: si hay filas con anio NULL (no se modifica nada)
+    """
+    cursor = conn.cursor()
+    if es_particionada(cursor):
+        cursor.close()
+        return 0
+
+    cursor.execute(f"SELECT COUNT(*) FROM {TABLA_HISTORICA} WHERE anio IS NULL")
+    sin_anio = cursor.fetchone()[0]
+    if sin_anio:
+        cursor.close()
+        conn.rollback()
+        raise ValueError(f"{sin_anio:,} registros sin año en {TABLA_HISTORICA}: "
+                         f"asígnales un año o bórralos antes de migrar")
+
+    cursor.execute(f"ALTER TABLE {TABLA_HISTORICA} RENAME TO {TABLA_ANTERIOR}")
+
+    # Los nombres de índices son únicos por esquema: liberar los de la tabla anterior
+    cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (TABLA_ANTERIOR,))
+    for (indice,) in cursor.fetchall():
+        cursor.execute(f"ALTER INDEX {indice} RENAME TO {indice[:50]}_anterior")
+
+    cursor.execute("""
+        SELECT a.attname
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = to_regclass(%s) AND i.indisprimary
+    """, (TABLA_ANTERIOR,))
+    clave = [columna for (columna,) in cursor.fetchall() if columna != 'anio'] + ['anio']
+
+    cursor.execute(f"""
+        CREATE TABLE {TABLA_HISTORICA} (LIKE {TABLA_ANTERIOR} INCLUDING DEFAULTS)
+        PARTITION BY LIST (anio)
+    """)
+    cursor.execute(f"ALTER TABLE {TABLA_HISTORICA} ADD PRIMARY KEY ({', '.join(clave)})")
+
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype = 'c'
+    """, (TABLA_ANTERIOR,))
+    for nombre, definicion in cursor.fetchall():
+        if 'anio' not in definicion:
+            cursor.execute(f"ALTER TABLE {TABLA_HISTORICA} ADD CONSTRAINT {nombre} {definicion}")
+
+    # Las secuencias de columnas SERIAL pasan a la tabla nueva antes del DROP
+    cursor.execute("""
+        SELECT attname, pg_get_serial_sequence(%s, attname)
+        FROM pg_attribute
+        WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+    """, (TABLA_ANTERIOR, TABLA_ANTERIOR))
+    for columna, secuencia in cursor.fetchall():
+        if secuencia:
+            cursor.execute(f"ALTER SEQUENCE {secuencia} OWNED BY {TABLA_HISTORICA}.{columna}")
+
+    cursor.execute(f"SELECT DISTINCT anio FROM {TABLA_ANTERIOR}")
+    anios = {fila[0] for fila in cursor.fetchall()} | set(anios_adicionales)
+    asegurar_particiones(cursor, sorted(anios))
+
+    # Índices después de la copia: construirlos de una vez es más rápido
+    cursor.execute(f"INSERT INTO {TABLA_HISTORICA} SELECT * FROM {TABLA_ANTERIOR}")
+    copiadas = cursor.rowcount
+    cursor.execute(f"DROP TABLE {TABLA_ANTERIOR}")
+    crear_indices(cursor, MOTOR_POSTGRESQL)
+
+    conn.commit()
+    cursor.close()
+    return copiadas
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+if __name__ == "__main__":
+    from mapa_particiones import MAPA_PARTICIONES
+    from migrar_y_reportar import CONFIG_PG_HISTORICO, conectar_postgresql
+
+    conn = conectar_postgresql(CONFIG_PG_HISTORICO)
+    if not conn:
+        sys.exit(1)
+
+    if '--migrar' in sys.argv:
+        anios = MAPA_PARTICIONES.anios(MAPA_PARTICIONES.particion_de_motor(MOTOR_POSTGRESQL))
+        print(f"→ Convirtiendo {TABLA_HISTORICA} en tabla particionada por año...")
+        try:
+            copiadas = migrar_a_particionada(conn, anios)
+            print(f"✓ {copiadas:,} registros copiados a las particiones")
+        except ValueError as e:
+            print(f"✗ {e}")
+
+    elif '--separar' in sys.argv:
+        anio = int(sys.argv[sys.argv.index('--separar') + 1])
+        separar_anio(conn, anio, borrar='--borrar' in sys.argv)
+        print(f"✓ Año {anio} separado de {TABLA_HISTORICA}"
+              f"{' y eliminado' if '--borrar' in sys.argv else f' (queda en {nombre_particion(anio)})'}")
+
+    cursor = conn.cursor()
+    if es_particionada(cursor):
+        print(f"✓ {TABLA_HISTORICA} está particionada: {', '.join(particiones_existentes(cursor))}")
+    else:
+        print(f"✗ {TABLA_HISTORICA} es una tabla única; ejecuta: python particionado_pg.py --migrar")
+    cursor.close()
+    conn.close()
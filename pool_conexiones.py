@@ -0,0 +1,285 @@
+"""
+============================================================
+POOL DE CONEXIONES - MIDDLEWARE DE PARTICIONAMIENTO
+============================================================
+
+Pool de conexiones reutilizables para ambos motores
+(PostgreSQL vía psycopg2 y SQL Server vía pyodbc).
+
+  • Tamaño mínimo y máximo configurable
+  • Verificación de salud al entregar una conexión
+  • Expulsión de conexiones inactivas
+  • Seguro para uso concurrente (threading)
+  • Estadísticas de espera y tasa de aciertos
+============================================================
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+
+class PoolAgotadoError(Exception):
+    """Se agotó el tiempo de espera por una conexión libre del pool."""
+
+
+class PoolConexiones:
+    """
+    Pool genérico de conexiones DB-API.
+
+    Args:
+        nombre: Nombre descriptivo del pool (para reportes)
+        fabrica: Función sin argumentos que abre una conexión nueva
+        min_conexiones: Conexiones que se mantienen abiertas aunque estén inactivas
+        max_conexiones: Máximo de conexiones abiertas al mismo tiempo
+        max_inactividad: Segundos que una conexión puede estar inactiva antes de cerrarse
+        tiempo_espera: Segundos máximos esperando una conexión libre
+        consulta_salud: Consulta ejecutada al entregar una conexión reutilizada
+        verificar_tras: Segundos de inactividad a partir de los cuales se
+                        ejecuta consulta_salud antes de entregar la conexión
+    """
+
+    def __init__(self, nombre: str, fabrica: Callable,
+                 min_conexiones: int = 1, max_conexiones: int = 10,
+                 max_inactividad: float = 300.0, tiempo_espera: float = 30.0,
+                 consulta_salud: str = "SELECT 1", verificar_tras: float = 1.0):
+        if min_conexiones < 0 or max_conexiones < 1 or min_conexiones > max_conexiones:
+            raise ValueError("Tamaños de pool inválidos")
+
+        self.nombre = nombre
+        self._fabrica = fabrica
+        self.min_conexiones = min_conexiones
+        self.max_conexiones = max_conexiones
+        self.max_inactividad = max_inactividad
+        self.tiempo_espera = tiempo_espera
+        self.consulta_salud = consulta_salud
+        self.verificar_tras = verificar_tras
+
+        self._condicion = threading.Condition()
+        self._libres: List[Tuple[object, float]] = []  # (conexión, instante de devolución)
+        self._abiertas = 0
+        self._cerrado = False
+
+        # Estadísticas
+        self._solicitudes = 0
+        self._aciertos = 0
+        self._creadas = 0
+        self._descartadas = 0
+        self._expulsadas = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+    # --------------------------------------------------------
+    # Entrega y devolución
+    # --------------------------------------------------------
+
+    def obtener(self):
+        """
+        Entrega una conexión sana del pool, creando una nueva si hace falta.
+
+        Raises:
+            PoolAgotadoError: si no hay conexiones libres dentro de tiempo_espera
+        """
+
+        inicio = time.monotonic()
+        limite = inicio + self.tiempo_espera
+
+        with self._condicion:
+            if self._cerrado:
+                raise RuntimeError(f"El pool {self.nombre} está cerrado")
+            self._solicitudes += 1
+
+            while True:
+                self._expulsar_inactivas()
+
+                if self._libres:
+                    conn, devuelta = self._libres.pop()
+                    reutilizada = True
+                    verificar = time.monotonic() - devuelta >= self.verificar_tras
+                    break
+
+                if self._abiertas < self.max_conexiones:
+                    # Reservar el cupo antes de conectar fuera del lock
+                    self._abiertas += 1
+                    conn = None
+                    reutilizada = False
+                    verificar = False
+                    break
+
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._registrar_espera(inicio)
+                    raise PoolAgotadoError(
+                        f"Sin conexiones libres en {self.nombre} tras {self.tiempo_espera}s")
+                self._condicion.wait(restante)
+
+        if verificar and not self._esta_sana(conn):
+            # Conexión rota: se descarta y se abre otra en su lugar
+            self._cerrar_silencioso(conn)
+            with self._condicion:
+                self._descartadas += 1
+            conn = None
+            reutilizada = False
+
+        if conn is None:
+            try:
+                conn = self._fabrica()
+            except Exception:
+                with self._condicion:
+                    self._abiertas -= 1
+                    self._condicion.notify()
+                raise
+            with self._condicion:
+                self._creadas += 1
+
+        with self._condicion:
+            if reutilizada:
+                self._aciertos += 1
+            self._registrar_espera(inicio)
+
+        return conn
+
+    def devolver(self, conn, descartar: bool = False):
+        """
+        Devuelve una conexión al pool. Cualquier transacción abierta se
+        revierte para que el siguiente usuario la reciba limpia.
+
+        Args:
+            conn: Conexión obtenida con obtener()
+            descartar: True para cerrarla en lugar de reutilizarla
+        """
+
+        if not descartar:
+            try:
+                conn.rollback()
+            except Exception:
+                descartar = True
+
+        with self._condicion:
+            if descartar or self._cerrado:
+                self._abiertas -= 1
+                if descartar:
+                    self._descartadas += 1
+                cerrar = True
+            else:
+                self._libres.append((conn, time.monotonic()))
+                cerrar = False
+            self._condicion.notify()
+
+        if cerrar:
+            self._cerrar_silencioso(conn)
+
+    @contextmanager
+    def conexion(self):
+        """
+        Presta una conexión durante un bloque with.
+
+        Si el bloque lanza una excepción la conexión se descarta, ya que
+        su estado no es confiable. Si el bloque se abandona (por ejemplo,
+        un generador cerrado antes de terminar) la conexión se devuelve.
+        """
+
+        conn = self.obtener()
+        try:
+            yield conn
+        except Exception:
+            self.devolver(conn, descartar=True)
+            raise
+        except BaseException:
+            self.devolver(conn)
+            raise
+        else:
+            self.devolver(conn)
+
+    # --------------------------------------------------------
+    # Mantenimiento
+    # --------------------------------------------------------
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres; las prestadas se cierran al devolverse."""
+
+        with self._condicion:
+            self._cerrado = True
+            libres = self._libres
+            self._libres = []
+            self._abiertas -= len(libres)
+            self._condicion.notify_all()
+
+        for conn, _ in libres:
+            self._cerrar_silencioso(conn)
+
+    def _expulsar_inactivas(self):
+        """Cierra conexiones inactivas por más de max_inactividad (requiere el lock)."""
+
+        ahora = time.monotonic()
+        conservar = []
+        expulsar = []
+
+        # Las más antiguas quedan al inicio de la lista
+        for conn, devuelta in self._libres:
+            sobran = self._abiertas - len(expulsar) > self.min_conexiones
+            if sobran and ahora - devuelta > self.max_inactividad:
+                expulsar.append(conn)
+            else:
+                conservar.append((conn, devuelta))
+
+        if expulsar:
+            self._libres = conservar
+            self._abiertas -= len(expulsar)
+            self._expulsadas += len(expulsar)
+            for conn in expulsar:
+                self._cerrar_silencioso(conn)
+
+    def _esta_sana(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.consulta_salud)
+            cursor.fetchall()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _registrar_espera(self, inicio: float):
+        espera = time.monotonic() - inicio
+        self._espera_total += espera
+        if espera > self._espera_max:
+            self._espera_max = espera
+
+    @staticmethod
+    def _cerrar_silencioso(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # --------------------------------------------------------
+    # Estadísticas
+    # --------------------------------------------------------
+
+    def estadisticas(self) -> Dict:
+        """
+        Devuelve las métricas del pool.
+
+        Returns:
+            Dict: solicitudes, aciertos, tasa_aciertos, espera promedio/máxima (ms),
+                  conexiones abiertas/libres/creadas/descartadas/expulsadas
+        """
+
+        with self._condicion:
+            solicitudes = self._solicitudes
+            return {
+                'pool': self.nombre,
+                'solicitudes': solicitudes,
+                'aciertos': self._aciertos,
+                'tasa_aciertos': self._aciertos / solicitudes if solicitudes else 0.0,
+                'espera_promedio_ms': self._espera_total / solicitudes * 1000 if solicitudes else 0.0,
+                'espera_max_ms': self._espera_max * 1000,
+                'abiertas': self._abiertas,
+                'libres': len(self._libres),
+                'creadas': self._creadas,
+                'descartadas': self._descartadas,
+                'expulsadas': self._expulsadas,
+            }
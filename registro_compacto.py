@@ -0,0 +1,207 @@
+"""
+============================================================
+REGISTROS COMPACTOS - RESULTADOS DE CONSULTA
+============================================================
+
+Representación compacta de los créditos devueltos por las
+consultas, en lugar de un diccionario por fila:
+
+  • Clases con __slots__ (sin diccionario por instancia)
+  • Valores repetidos (provincia, género, etnia, tipo de
+    crédito...) compartidos entre filas con un internador
+  • Acceso compatible con el diccionario: credito['provincia']
+  • Vista de diccionario disponible con como_dict()
+  • copiar() para entregar resultados guardados en caché
+    sin que el llamador pueda alterarlos
+  • LoteCreditos: alternativa columnar para resultados
+    grandes. El id va en un arreglo de enteros y las demás
+    columnas como códigos de un diccionario de valores, en
+    arreglos de 1, 2 o 4 bytes por fila según cuántos
+    valores distintos tenga la columna
+============================================================
+"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+CAMPOS_CREDITO = (
+    'id', 'genero', 'edad', 'etnia', 'zona', 'distrito_mies', 'provincia',
+    'canton', 'parroquia', 'tipo_zona', 'tipo_credito', 'tipo_actividad',
+    'actividad', 'numero_cdh', 'tipo_subsidio', 'cdh_activos', 'anio',
+    'fecha_migracion', 'origen'
+)
+
+CAMPOS_CREDITO_ANUAL = (
+    'id', 'genero', 'edad', 'provincia', 'tipo_credito', 'tipo_subsidio',
+    'cdh_activos', 'anio', 'origen'
+)
+
+
+class Internador:
+    """
+    Devuelve siempre el mismo objeto para valores iguales, de modo que
+    las categorías repetidas ocupen memoria una sola vez por consulta.
+    """
+
+    __slots__ = ('_valores',)
+
+    def __init__(self):
+        self._valores = {}
+
+    def __call__(self, valor):
+        return self._valores.setdefault(valor, valor)
+
+
+class RegistroCompacto:
+    """Base de los registros: acceso por atributo o por clave como un diccionario."""
+
+    __slots__ = ()
+    CAMPOS: Tuple[str, ...] = ()
+
+    def __init__(self, *valores):
+        for campo, valor in zip(self.CAMPOS, valores):
+            setattr(self, campo, valor)
+
+    def __getitem__(self, campo):
+        try:
+            return getattr(self, campo)
+        except AttributeError:
+            raise KeyError(campo) from None
+
+    def __contains__(self, campo):
+        return campo in self.CAMPOS
+
+    def __eq__(self, otro):
+        if not isinstance(otro, RegistroCompacto):
+            return NotImplemented
+        return self.CAMPOS == otro.CAMPOS and self.valores() == otro.valores()
+
+    def __repr__(self):
+        campos = ', '.join(f"{c}={getattr(self, c)!r}" for c in self.CAMPOS)
+        return f"{type(self).__name__}({campos})"
+
+    def get(self, campo, defecto=None):
+        return getattr(self, campo, defecto)
+
+    def keys(self):
+        return self.CAMPOS
+
+    def valores(self) -> Tuple:
+        return tuple(getattr(self, c) for c in self.CAMPOS)
+
+    def como_dict(self) -> Dict:
+        """Vista de diccionario equivalente al formato anterior."""
+        return {c: getattr(self, c) for c in self.CAMPOS}
+
+    def copia(self) -> 'RegistroCompacto':
+        """Registro nuevo con los mismos valores (los valores se comparten)."""
+        return type(self)(*self.valores())
+
+
+class Credito(RegistroCompacto):
+    """Crédito completo (consultar_todos_creditos / iterar_todos_creditos)."""
+
+    __slots__ = CAMPOS_CREDITO
+    CAMPOS = CAMPOS_CREDITO
+
+
+class CreditoAnual(RegistroCompacto):
+    """Crédito resumido de consultar_por_anio."""
+
+    __slots__ = CAMPOS_CREDITO_ANUAL
+    CAMPOS = CAMPOS_CREDITO_ANUAL
+
+
+# Ancho de los códigos de una columna: se amplía al llenarse el diccionario
+_CODIGO_MAXIMO = {'B': 0xFF, 'H': 0xFFFF, 'I': 0xFFFFFFFF}
+_CODIGO_SIGUIENTE = {'B': 'H', 'H': 'I', 'I': 'Q'}
+
+
+class LoteCreditos:
+    """
+    Créditos en columnas: cada fila ocupa 8 bytes de id más un código de
+    1 a 4 bytes por columna; cada valor distinto se guarda una sola vez
+    por columna. Los registros (o diccionarios) se arman al pedirlos.
+
+    Args:
+        tipo: Clase de registro que entrega el lote (Credito o CreditoAnual)
+    """
+
+    __slots__ = ('tipo', '_ids', '_codigos', '_valores', '_indices')
+
+    def __init__(self, tipo=Credito):
+        self.tipo = tipo
+        columnas = len(tipo.CAMPOS) - 1  # todas salvo el id
+        self._ids = array('q')
+        self._codigos = [array('B') for _ in range(columnas)]
+        self._valores: List[List] = [[] for _ in range(columnas)]
+        self._indices: List[Dict] = [{} for _ in range(columnas)]
+
+    def agregar(self, row, origen: str):
+        """Agrega una fila de cursor (sin origen) al final del lote."""
+        self._ids.append(row[0])
+        for columna, valor in enumerate((*row[1:], origen)):
+            indice = self._indices[columna]
+            codigo = indice.get(valor)
+            if codigo is None:
+                codigo = indice[valor] = len(self._valores[columna])
+                self._valores[columna].append(valor)
+                codigos = self._codigos[columna]
+                if codigo > _CODIGO_MAXIMO.get(codigos.typecode, codigo):
+                    self._codigos[columna] = array(_CODIGO_SIGUIENTE[codigos.typecode], codigos)
+            self._codigos[columna].append(codigo)
+
+    def agregar_filas(self, filas: Iterable, origen: str):
+        for row in filas:
+            self.agregar(row, origen)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, posicion: int) -> RegistroCompacto:
+        return self.tipo(self._ids[posicion],
+                         *(valores[codigos[posicion]]
+                           for valores, codigos in zip(self._valores, self._codigos)))
+
+    def __iter__(self) -> Iterator[RegistroCompacto]:
+        for posicion in range(len(self._ids)):
+            yield self[posicion]
+
+    def columna(self, campo: str) -> List:
+        """Valores de una columna en el orden del lote."""
+        if campo == self.tipo.CAMPOS[0]:
+            return list(self._ids)
+        columna = self.tipo.CAMPOS.index(campo) - 1
+        valores = self._valores[columna]
+        return [valores[codigo] for codigo in self._codigos[columna]]
+
+    def como_dicts(self) -> List[Dict]:
+        """Vista de diccionarios equivalente al formato anterior."""
+        return [registro.como_dict() for registro in self]
+
+    def copia(self) -> 'LoteCreditos':
+        """Lote independiente con las mismas filas (los valores se comparten)."""
+        otro = LoteCreditos(self.tipo)
+        otro._ids = array('q', self._ids)
+        otro._codigos = [array(codigos.typecode, codigos) for codigos in self._codigos]
+        otro._valores = [list(valores) for valores in self._valores]
+        otro._indices = [dict(indice) for indice in self._indices]
+        return otro
+
+
+def copiar(registro: Union[RegistroCompacto, Dict]) -> Union[RegistroCompacto, Dict]:
+    """
+    Copia un registro o su vista de diccionario, para que modificar lo
+    entregado no altere el resultado guardado en caché.
+    """
+    if isinstance(registro, dict):
+        return dict(registro)
+    return registro.copia()
+
+
+def crear_registro(tipo, row, origen: str, internar: Internador):
+    """
+    Construye un registro a partir de una fila de cursor. El id se guarda
+    tal cual; el resto de columnas pasa por el internador.
+    """
+    return tipo(row[0], *map(internar, row[1:]), origen)
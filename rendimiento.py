@@ -0,0 +1,819 @@
+"""
+============================================================
+PRUEBAS DE RENDIMIENTO REPRODUCIBLES
+============================================================
+
+Mide las operaciones principales del middleware con datos
+sintéticos y motores locales, sin PostgreSQL ni SQL Server:
+
+  • Créditos sintéticos con el esquema real de 16 columnas y
+    las cardinalidades de bonoleccion.sql (24 provincias,
+    219 cantones, 1155 parroquias, 5 tipos de crédito...),
+    generados con semilla fija
+  • Tamaños de 10k, 234k (el volumen real) y 5M registros
+  • SQLite en lugar de ambos motores: cada conexión local
+    traduce lo propio de cada dialecto (parámetros %s, TOP,
+    MERGE, COPY) y responde las consultas de catálogo con
+    sqlite_master; el resto del código es el real. No hace
+    falta tener instalados psycopg2 ni pyodbc
+  • Un caso falla (y se marca en el JSON) si lanza una
+    excepción, devuelve False, informa un error (✗) o
+    devuelve otra cantidad de registros que la esperada
+  • Memoria: pico de asignaciones de Python de cada caso
+    (tracemalloc), en una ejecución aparte no cronometrada
+  • Casos: migrar_datos, consultar_todos_creditos,
+    consultar_por_anio, reporte consolidado e insert_credito
+  • Resultados en JSON (con el reparto del tiempo por
+    partición de metricas.py) y comparación con una corrida
+    anterior para detectar regresiones
+
+    python rendimiento.py                          → 10k y 234k
+    python rendimiento.py --filas 10k,234k,5M --salida r.json
+    python rendimiento.py --comparar base.json [--umbral 0.2]
+    python rendimiento.py --sin-memoria            → sin la ejecución extra
+
+Los tiempos absolutos son los de SQLite, no los de los
+servidores; sirven para comparar corridas entre sí.
+============================================================
+"""
+
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+from metricas import METRICAS, fabrica_medida
+from pool_conexiones import PoolConexiones
+
+SEMILLA = 20240101
+
+TAMANOS = {'10k': 10000, '234k': 234513, '5M': 5000000}
+
+CASOS = ('migracion', 'todos', 'por_anio', 'reporte', 'insercion')
+
+# ============================================================
+# DATOS SINTÉTICOS
+# ============================================================
+
+# (valor, frecuencia en bonoleccion.sql)
+GENEROS = (('FEMENINO', 219165), ('MASCULINO', 15348))
+
+ETNIAS = (('Mestizo(a)', 155840), ('Indígena', 37534), ('Montuvio(a)', 25838),
+          ('Afroecuatoriano(a)', 10246), ('Mulato(a)', 3312), ('Blanco(a)', 1417),
+          ('Otro', 219), ('NO DEFINIDO', 107))
+
+# Provincia, frecuencia y unidad zonal que la atiende
+PROVINCIAS = (
+    ('GUAYAS', 45822, 5), ('MANABI', 31532, 4), ('LOJA', 18314, 7), ('LOS RIOS', 18116, 5),
+    ('PICHINCHA', 15719, 9), ('NAPO', 11015, 2), ('EL ORO', 9355, 7), ('BOLIVAR', 7985, 5),
+    ('ESMERALDAS', 7752, 1), ('SANTA ELENA', 7395, 5), ('IMBABURA', 7069, 1),
+    ('CARCHI', 7049, 1), ('MORONA SANTIAGO', 6006, 6), ('SANTO DOMINGO', 5617, 4),
+    ('AZUAY', 5265, 6), ('TUNGURAHUA', 5039, 3), ('ZAMORA CHINCHIPE', 4709, 7),
+    ('SUCUMBIOS', 4125, 1), ('CHIMBORAZO', 4055, 3), ('ORELLANA', 3646, 2),
+    ('PASTAZA', 3428, 3), ('COTOPAXI', 3400, 3), ('CAÑAR', 1902, 6), ('GALAPAGOS', 198, 5),
+)
+
+TIPOS_ZONA = (('URBANA', 144649), ('RURAL', 89864))
+
+TIPOS_CREDITO = (('CDH ASOCIATIVO', 137904), ('CDH INDIVIDUAL', 65053),
+                 ('CDH VERSION 1.0', 21000), ('CDH 24 MESES', 6468), ('CDH 12 MESES', 4088))
+
+TIPOS_ACTIVIDAD = (
+    ('AGRICULTURA, GANADERÍA, SILVICULTURA Y PESCA', 134205),
+    ('COMERCIO AL POR MAYOR Y AL POR MENOR, REPARACIÓN DE VEHÍCULOS AUTOMOTORES Y MOTOCICLETAS', 49724),
+    ('ACTIVIDADES DE ALOJAMIENTO Y DE SERVICIO DE COMIDAS', 24274),
+    ('INDUSTRIA MANUFACTURERA', 22878),
+    ('OTRAS ACTIVIDADES DE SERVICIOS', 3432),
+)
+
+TIPOS_SUBSIDIO = (('BONO DE DESARROLLO HUMANO', 145600), ('BONO VARIABLE', 81379),
+                  ('PENSIÓN TODA UNA VIDA', 6346), ('MIS MEJORES AÑOS', 1184),
+                  ('NO DEFINIDO', 3), ('BONO MIL DÍAS', 1))
+
+NUMEROS_CDH = tuple(zip(range(1, 14), (88855, 45269, 29231, 22768, 17777, 13245, 9165,
+                                       5300, 2086, 654, 144, 17, 2)))
+
+ANIOS = ((2022, 40880), (2023, 53508), (2024, 64831), (2025, 75294))
+
+# Cardinalidades de las columnas de muchos valores
+CANTONES = 219
+PARROQUIAS = 1155
+DISTRITOS = 40
+ACTIVIDADES = 58
+
+
+def _zipf(cantidad: int) -> List[float]:
+    """Pesos decrecientes: pocos valores concentran la mayoría de registros."""
+    return [1 / (i + 1) for i in range(cantidad)]
+
+
+class GeneradorCreditos:
+    """
+    Créditos sintéticos reproducibles.
+
+    Las columnas geográficas se derivan de la parroquia (parroquia →
+    cantón → provincia → zona, cantón → distrito), de modo que las
+    combinaciones son coherentes como en los datos reales; el resto se
+    elige con las frecuencias de bonoleccion.sql.
+
+    Args:
+        semilla: Semilla del generador aleatorio
+    """
+
+    def __init__(self, semilla: int = SEMILLA):
+        self.semilla = semilla
+        rng = random.Random(semilla)
+
+        # Cantones repartidos según el peso de cada provincia (al menos uno)
+        peso_total = sum(peso for _, peso, _ in PROVINCIAS)
+        por_provincia = [max(1, round(peso / peso_total * CANTONES)) for _, peso, _ in PROVINCIAS]
+        por_provincia[0] += CANTONES - sum(por_provincia)
+
+        cantones = []  # (nombre, provincia, zona, distrito, peso)
+        for (provincia, peso, zona), cantidad in zip(PROVINCIAS, por_provincia):
+            pesos = _zipf(cantidad)
+            for i in range(cantidad):
+                cantones.append((f"{provincia} {i + 1:02d}", provincia, zona,
+                                 rng.randrange(DISTRITOS), peso * pesos[i] / sum(pesos)))
+
+        # Cada cantón recibe al menos una parroquia; el resto se reparte por peso
+        extra = rng.choices(range(len(cantones)), weights=[c[4] for c in cantones],
+                            k=PARROQUIAS - len(cantones))
+        parroquias_por_canton = [1 + extra.count(i) for i in range(len(cantones))]
+
+        self._parroquias = []  # (parroquia, cantón, provincia, zona, distrito)
+        pesos_parroquia = []
+        for (canton, provincia, zona, distrito, peso), cantidad in zip(cantones, parroquias_por_canton):
+            pesos = _zipf(cantidad)
+            for i in range(cantidad):
+                self._parroquias.append((
+                    f"{canton} P{i + 1:02d}", canton, provincia,
+                    f"UNIDAD DESCONCENTRADA ZONAL {zona}" if zona != 9 else
+                    "DIRECCIÓN DE COORDINACIÓN DEL DISTRITO METROPOLITANO DE QUITO",
+                    f"UNIDAD DESCONCENTRADA DISTRITAL {distrito + 1:02d}",
+                ))
+                pesos_parroquia.append(peso * pesos[i] / sum(pesos))
+        self._pesos_parroquia = self._acumular(pesos_parroquia)
+
+        # Actividades repartidas entre los tipos de actividad
+        self._actividades = []
+        pesos_actividad = []
+        por_tipo = [max(1, round(peso / 234513 * ACTIVIDADES)) for _, peso in TIPOS_ACTIVIDAD]
+        por_tipo[0] += ACTIVIDADES - sum(por_tipo)
+        for (tipo, peso), cantidad in zip(TIPOS_ACTIVIDAD, por_tipo):
+            pesos = _zipf(cantidad)
+            for i in range(cantidad):
+                self._actividades.append((tipo, f"ACTIVIDAD {len(self._actividades) + 1:02d}"))
+                pesos_actividad.append(peso * pesos[i] / sum(pesos))
+        self._pesos_actividad = self._acumular(pesos_actividad)
+
+        # Edades de 18 a 88 con el máximo alrededor de los 34 años
+        self._edades = list(range(18, 89))
+        self._pesos_edad = self._acumular([1 / (1 + abs(edad - 34) / 8) ** 2 for edad in self._edades])
+
+    @staticmethod
+    def _acumular(pesos) -> List[float]:
+        acumulado, total = [], 0.0
+        for peso in pesos:
+            total += peso
+            acumulado.append(total)
+        return acumulado
+
+    def _columna(self, rng, tabla, k: int) -> List:
+        return rng.choices([valor for valor, _ in tabla],
+                           cum_weights=self._acumular(peso for _, peso in tabla), k=k)
+
+    def generar(self, total: int, tamano_bloque: int = 50000) -> Iterator[Tuple]:
+        """
+        Genera `total` créditos en el orden de COLUMNAS_DESTINO, por bloques
+        (memoria constante). La misma semilla produce siempre los mismos datos.
+        """
+        rng = random.Random(self.semilla)
+        generados = 0
+        while generados < total:
+            k = min(tamano_bloque, total - generados)
+            geografia = rng.choices(self._parroquias, cum_weights=self._pesos_parroquia, k=k)
+            actividades = rng.choices(self._actividades, cum_weights=self._pesos_actividad, k=k)
+            edades = rng.choices(self._edades, cum_weights=self._pesos_edad, k=k)
+            columnas = zip(
+                self._columna(rng, GENEROS, k), self._columna(rng, ETNIAS, k),
+                self._columna(rng, TIPOS_ZONA, k), self._columna(rng, TIPOS_CREDITO, k),
+                self._columna(rng, NUMEROS_CDH, k), self._columna(rng, TIPOS_SUBSIDIO, k),
+                self._columna(rng, ANIOS, k),
+            )
+            for (parroquia, canton, provincia, zona, distrito), (tipo_actividad, actividad), edad, \
+                    (genero, etnia, tipo_zona, tipo_credito, numero_cdh, tipo_subsidio, anio) \
+                    in zip(geografia, actividades, edades, columnas):
+                yield (genero, edad, etnia, zona, distrito, provincia, canton, parroquia,
+                       tipo_zona, tipo_credito, tipo_actividad, actividad, numero_cdh,
+                       tipo_subsidio, 1, anio)
+            generados += k
+
+# ============================================================
+# MOTORES LOCALES (SQLITE)
+# ============================================================
+
+# Catálogos del servidor: las consultas que usa el middleware se responden
+# con sqlite_master (en SQLite toda tabla es una tabla común, sin hijas);
+# cualquier otra falla en lugar de devolver un resultado vacío engañoso
+_CATALOGOS = re.compile(r'\b(pg_class|pg_inherits|pg_indexes|pg_index|pg_constraint|'
+                        r'pg_attribute|pg_stat_\w+|pg_extension|to_regclass|'
+                        r'OBJECT_ID|sys\.\w+|information_schema)\b', re.IGNORECASE)
+
+_CATALOGOS_LOCALES = {
+    MOTOR_POSTGRESQL: (
+        (re.compile(r"SELECT relkind FROM pg_class WHERE oid = to_regclass\((\?|'\w+')\)"),
+         r"SELECT 'r' FROM sqlite_master WHERE type = 'table' AND name = \1"),
+        (re.compile(r"SELECT c\.relname\s+FROM pg_inherits .*", re.DOTALL),
+         "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ? AND 0"),
+        (re.compile(r"SELECT indexdef FROM pg_indexes WHERE tablename = \?"),
+         "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL"),
+        (re.compile(r"to_regclass\((\?|'\w+')\) IS NOT NULL"),
+         r"EXISTS (SELECT 1 FROM sqlite_master WHERE name = \1)"),
+    ),
+    MOTOR_SQLSERVER: (
+        (re.compile(r"SELECT i\.name\s+FROM sys\.indexes i\s+WHERE i\.object_id = OBJECT_ID\(\?\).*",
+                    re.DOTALL),
+         "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+         "AND tbl_name = replace(?, 'dbo.', '')"),
+        (re.compile(r"SELECT i\.name, c\.name\s+FROM sys\.indexes i.*", re.DOTALL),
+         "SELECT il.name, ii.name FROM pragma_index_list(replace(?, 'dbo.', '')) il, "
+         "pragma_index_info(il.name) ii WHERE il.origin = 'c' ORDER BY il.name, ii.seqno"),
+        (re.compile(r"OBJECT_ID\('(\w+)', 'U'\) IS NULL"),
+         r"NOT EXISTS (SELECT 1 FROM sqlite_master WHERE name = '\1')"),
+    ),
+}
+
+# ALTER INDEX ... DISABLE no existe en SQLite (el índice sigue activo);
+# REBUILD equivale a REINDEX
+_ALTER_INDEX = re.compile(r'^\s*ALTER INDEX \[?(\w+)\]? ON \S+ (DISABLE|REBUILD)\s*$')
+
+# El upsert del resumen de SQL Server (MERGE) con la sintaxis de SQLite
+_UPSERT_RESUMEN_SQL = """
+    INSERT INTO ResumenCreditosActuales
+        (anio, provincia, genero, tipo_credito, tipo_subsidio, total, activos)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (anio, provincia, genero, tipo_credito, tipo_subsidio)
+    DO UPDATE SET total = total + excluded.total, activos = activos + excluded.activos
+"""
+
+_REEMPLAZOS = {
+    MOTOR_POSTGRESQL: (
+        (re.compile(r'%s'), '?'),
+        (re.compile(r'\bid SERIAL\b'), 'id INTEGER PRIMARY KEY'),
+        (re.compile(r',\s*PRIMARY KEY \(id, anio\)'), ''),
+        (re.compile(r'\bPARTITION BY LIST \(anio\)'), ''),
+        (re.compile(r'\s+CASCADE\b'), ''),
+        (re.compile(r'^\s*TRUNCATE\s+', re.IGNORECASE), 'DELETE FROM '),
+        (re.compile(r'\s+INCLUDE \([^)]*\)'), ''),
+    ),
+    MOTOR_SQLSERVER: (
+        (re.compile(r"IF OBJECT_ID\('dbo\.(\w+)', 'U'\) IS NOT NULL\s+DROP TABLE dbo\.\w+"),
+         r'DROP TABLE IF EXISTS \1'),
+        (re.compile(r"IF OBJECT_ID\('dbo\.\w+', 'U'\) IS NULL\s*CREATE TABLE"),
+         'CREATE TABLE IF NOT EXISTS'),
+        (re.compile(r"IF NOT EXISTS \(SELECT 1 FROM sys\.indexes [^)]*\)\)\s*CREATE INDEX"),
+         'CREATE INDEX IF NOT EXISTS'),
+        (re.compile(r'\bINT IDENTITY\(1,1\) PRIMARY KEY\b'), 'INTEGER PRIMARY KEY'),
+        (re.compile(r'\bGETDATE\(\)'), 'CURRENT_TIMESTAMP'),
+        (re.compile(r'\bUPDATE STATISTICS\b'), 'ANALYZE'),
+        (re.compile(r'\bdbo\.'), ''),
+        (re.compile(r'\s+INCLUDE \([^)]*\)'), ''),
+    ),
+}
+
+_TOP = re.compile(r'^(\s*SELECT\s+)TOP \(\?\)\s+', re.IGNORECASE)
+_COPY_SALIDA = re.compile(r'^\s*COPY \((.*)\) TO STDOUT\s*$', re.DOTALL)
+_COPY_ENTRADA = re.compile(r'^\s*COPY (\w+) \(([^)]*)\) FROM STDIN\s*$', re.DOTALL)
+
+_ESCAPES_COPY = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+_DESESCAPES_COPY = {'t': '\t', 'n': '\n', 'r': '\r', '\\': '\\'}
+
+
+def _texto_copy(valor) -> str:
+    if valor is None:
+        return '\\N'
+    texto = str(valor)
+    if '\\' in texto or '\t' in texto or '\n' in texto or '\r' in texto:
+        texto = ''.join(_ESCAPES_COPY.get(c, c) for c in texto)
+    return texto
+
+
+def _valor_copy(campo: str):
+    if campo == '\\N':
+        return None
+    if '\\' in campo:
+        return re.sub(r'\\(.)', lambda m: _DESESCAPES_COPY.get(m.group(1), m.group(1)), campo)
+    return campo
+
+
+class _CursorLocal:
+    """Cursor DB-API sobre sqlite3 que acepta el SQL de un motor del middleware."""
+
+    def __init__(self, conexion: 'ConexionLocal'):
+        self._conexion = conexion
+        self._cursor = conexion._sqlite.cursor()
+        self._sin_filas = False
+        self.rowcount = -1
+        # Atributos de psycopg2/pyodbc que el middleware ajusta
+        self.itersize = self.arraysize = 1
+        self.fast_executemany = False
+
+    @property
+    def description(self):
+        return None if self._sin_filas else self._cursor.description
+
+    def _traducir(self, sql: str, parametros=()) -> Tuple[Optional[str], Tuple]:
+        motor = self._conexion.motor
+        if motor == MOTOR_SQLSERVER:
+            if sql.lstrip().startswith('MERGE ResumenCreditosActuales'):
+                return _UPSERT_RESUMEN_SQL, parametros
+            indice = _ALTER_INDEX.match(sql)
+            if indice:
+                return (f"REINDEX {indice.group(1)}" if indice.group(2) == 'REBUILD' else None), ()
+            if _TOP.match(sql):
+                # TOP (?) va primero; LIMIT ? al final
+                sql = _TOP.sub(r'\1', sql) + ' LIMIT ?'
+                parametros = tuple(parametros[1:]) + (parametros[0],)
+        for patron, reemplazo in _REEMPLAZOS[motor] + _CATALOGOS_LOCALES[motor]:
+            sql = patron.sub(reemplazo, sql)
+        if _CATALOGOS.search(sql):
+            raise NotImplementedError(f"Consulta de catálogo sin equivalente local: "
+                                      f"{' '.join(sql.split())[:80]}")
+        return sql, parametros
+
+    def execute(self, sql, *parametros):
+        # psycopg2 recibe una tupla; pyodbc también acepta los valores sueltos
+        if len(parametros) == 1 and isinstance(parametros[0], (tuple, list)):
+            parametros = parametros[0]
+        sql, parametros = self._traducir(sql, tuple(parametros))
+        self._sin_filas = sql is None
+        if sql is not None:
+            self._cursor.execute(sql, parametros)
+            self.rowcount = self._cursor.rowcount
+        return self
+
+    def executemany(self, sql, filas):
+        sql, _ = self._traducir(sql)
+        self._sin_filas = sql is None
+        if sql is not None:
+            self._cursor.executemany(sql, filas)
+            self.rowcount = self._cursor.rowcount
+
+    def copy_expert(self, sql, archivo, tamano=65536):
+        """COPY ... TO STDOUT y COPY ... FROM STDIN en el formato de texto de PostgreSQL."""
+        salida = _COPY_SALIDA.match(sql)
+        if salida:
+            self.execute(salida.group(1))
+            self.rowcount = 0
+            while True:
+                filas = self._cursor.fetchmany(tamano // 128)
+                if not filas:
+                    break
+                archivo.write(''.join('\t'.join(_texto_copy(v) for v in fila) + '\n'
+                                      for fila in filas).encode('utf-8'))
+                self.rowcount += len(filas)
+            return
+
+        entrada = _COPY_ENTRADA.match(sql)
+        if not entrada:
+            raise ValueError(f"COPY no admitido por el motor local: {sql[:60]}")
+        tabla, columnas = entrada.groups()
+        insertar = (f"INSERT INTO {tabla} ({columnas}) "
+                    f"VALUES ({', '.join('?' * len(columnas.split(',')))})")
+        self.rowcount = 0
+        resto = b''
+        while True:
+            datos = archivo.read(tamano)
+            if not datos:
+                break
+            lineas = (resto + datos).split(b'\n')
+            resto = lineas.pop()
+            self._cursor.executemany(insertar, [
+                [_valor_copy(c) for c in linea.decode('utf-8').split('\t')] for linea in lineas])
+            self.rowcount += len(lineas)
+        if resto:
+            self._cursor.execute(insertar, [_valor_copy(c) for c in resto.decode('utf-8').split('\t')])
+            self.rowcount += 1
+
+    def fetchone(self):
+        return None if self._sin_filas else self._cursor.fetchone()
+
+    def fetchmany(self, tamano=None):
+        if self._sin_filas:
+            return []
+        return self._cursor.fetchmany(tamano or self.arraysize)
+
+    def fetchall(self):
+        return [] if self._sin_filas else self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(()) if self._sin_filas else iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionLocal:
+    """
+    Conexión que se comporta como la de un motor del middleware
+    (psycopg2 o pyodbc) sobre un archivo SQLite.
+
+    Args:
+        ruta: Archivo SQLite
+        motor: MOTOR_POSTGRESQL o MOTOR_SQLSERVER (dialecto a traducir)
+    """
+
+    def __init__(self, ruta: str, motor: str):
+        self.motor = motor
+        # Las conexiones del pool se usan desde los hilos de consulta_distribuida
+        self._sqlite = sqlite3.connect(ruta, check_same_thread=False)
+        self._sqlite.execute("PRAGMA journal_mode = WAL")
+        self._sqlite.execute("PRAGMA synchronous = NORMAL")
+
+    def cursor(self, name: Optional[str] = None):
+        return _CursorLocal(self)
+
+    def commit(self):
+        self._sqlite.commit()
+
+    def rollback(self):
+        self._sqlite.rollback()
+
+    def close(self):
+        self._sqlite.close()
+
+def _execute_values_local(cursor, sql: str, filas, template=None, page_size: int = 100,
+                          fetch: bool = False):
+    """execute_values de psycopg2.extras para un cursor local (VALUES %s → executemany)."""
+    filas = [tuple(fila) for fila in filas]
+    if filas:
+        valores = template or f"({', '.join(['%s'] * len(filas[0]))})"
+        cursor.executemany(sql.replace('VALUES %s', f"VALUES {valores}", 1), filas)
+    return [] if fetch else None
+
+
+def _sustituir_conectores():
+    """
+    Sin psycopg2/pyodbc instalados, módulos mínimos en su lugar para poder
+    importar el middleware: el entorno local nunca abre conexiones reales.
+    """
+    for nombre in ('psycopg2', 'pyodbc'):
+        try:
+            importlib.import_module(nombre)
+        except ImportError:
+            modulo = types.ModuleType(nombre)
+            modulo.Error = type('Error', (Exception,), {})
+            modulo.OperationalError = type('OperationalError', (modulo.Error,), {})
+            modulo.InterfaceError = type('InterfaceError', (modulo.Error,), {})
+
+            def connect(*args, _nombre=nombre, **kwargs):
+                raise ImportError(f"{_nombre} no está instalado (entorno local)")
+
+            modulo.connect = connect
+            sys.modules[nombre] = modulo
+            if nombre == 'psycopg2':
+                modulo.extras = types.ModuleType('psycopg2.extras')
+                modulo.extras.execute_values = _execute_values_local
+                sys.modules['psycopg2.extras'] = modulo.extras
+
+# ============================================================
+# ENTORNO DE PRUEBA
+# ============================================================
+
+COLUMNAS_ORIGEN = ('"Genero"', '"Edad"', '"Etnia"', '"Zona"', '"DistritoMies"', '"Provincia"',
+                   '"Canton"', '"Parroquia"', '"TipoZona"', '"TipoCredito"', '"TipoActividad"',
+                   '"Actividad"', '"NumeroCDH"', '"TipoSubsidio"', '"CDH_ACTIVOS"', '"AÑO"')
+
+_ENTEROS_ORIGEN = ('"Edad"', '"NumeroCDH"', '"CDH_ACTIVOS"', '"AÑO"')
+
+
+class EntornoLocal:
+    """
+    Tres bases SQLite en un directorio temporal: el origen (table1, como
+    bonoleccion), el histórico y el actual. conectar() deja a los módulos
+    del middleware usando estas bases en lugar de los servidores.
+    """
+
+    def __init__(self, directorio: str):
+        self.rutas = {nombre: os.path.join(directorio, f'{nombre}.db')
+                      for nombre in ('bonoleccion', MOTOR_POSTGRESQL, MOTOR_SQLSERVER)}
+
+    def poblar_origen(self, total: int, semilla: int = SEMILLA) -> float:
+        """Crea table1 con `total` créditos sintéticos. Devuelve los segundos empleados."""
+        inicio = time.perf_counter()
+        conn = sqlite3.connect(self.rutas['bonoleccion'])
+        columnas = ', '.join(f"{c} {'INTEGER' if c in _ENTEROS_ORIGEN else 'TEXT'}"
+                             for c in COLUMNAS_ORIGEN)
+        conn.execute("DROP TABLE IF EXISTS table1")
+        conn.execute(f"CREATE TABLE table1 ({columnas})")
+        conn.executemany(f"INSERT INTO table1 VALUES ({', '.join('?' * len(COLUMNAS_ORIGEN))})",
+                         GeneradorCreditos(semilla).generar(total))
+        conn.commit()
+        conn.close()
+        return time.perf_counter() - inicio
+
+    def conexion(self, nombre: str) -> ConexionLocal:
+        motor = MOTOR_SQLSERVER if nombre == MOTOR_SQLSERVER else MOTOR_POSTGRESQL
+        return ConexionLocal(self.rutas[nombre], motor)
+
+    def conectar(self):
+        """Apunta las conexiones de migrar_y_reportar y los pools del middleware a las bases locales."""
+        _sustituir_conectores()
+        import main_ministerio_actualizado as middleware
+        import migrar_y_reportar
+
+        # execute_values de psycopg2 arma el SQL con mogrify, que un cursor local no tiene
+        middleware.execute_values = _execute_values_local
+
+        bases = {migrar_y_reportar.CONFIG_BONOLECCION['dbname']: 'bonoleccion',
+                 migrar_y_reportar.CONFIG_PG_HISTORICO['dbname']: MOTOR_POSTGRESQL}
+        migrar_y_reportar.conectar_postgresql = lambda config: self.conexion(bases[config['dbname']])
+        migrar_y_reportar.conectar_sqlserver = lambda: self.conexion(MOTOR_SQLSERVER)
+
+        for motor, atributo in ((MOTOR_POSTGRESQL, 'POOL_POSTGRESQL'), (MOTOR_SQLSERVER, 'POOL_SQLSERVER')):
+            getattr(middleware, atributo).cerrar()
+            pool = PoolConexiones(
+                MAPA_PARTICIONES.particion_de_motor(motor),
+                fabrica_medida(MAPA_PARTICIONES.particion_de_motor(motor),
+                               lambda motor=motor: self.conexion(motor)),
+                min_conexiones=1, max_conexiones=10
+            )
+            setattr(middleware, atributo, pool)
+            middleware._POOL_POR_MOTOR[motor] = pool
+        return middleware, migrar_y_reportar
+
+# ============================================================
+# MEDICIÓN
+# ============================================================
+
+class CasoFallido(Exception):
+    """La operación medida falló o devolvió un resultado inesperado."""
+
+
+def _verificar(resultado, salida: str, esperadas: Optional[int]):
+    """Lanza CasoFallido si el caso no hizo lo que debía (no cuenta como tiempo válido)."""
+    if resultado is False:
+        raise CasoFallido("devolvió False")
+    if isinstance(resultado, list) and resultado and all(isinstance(r, bool) for r in resultado):
+        if not all(resultado):
+            raise CasoFallido(f"{resultado.count(False):,} de {len(resultado):,} operaciones fallaron")
+    elif isinstance(resultado, list) and esperadas is not None and len(resultado) != esperadas:
+        raise CasoFallido(f"{len(resultado):,} registros; se esperaban {esperadas:,}")
+    errores = [linea.strip() for linea in salida.splitlines() if '✗' in linea]
+    if errores:
+        raise CasoFallido(errores[0])
+
+
+def _ejecutar(funcion: Callable[[], object], esperadas: Optional[int]):
+    salida = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(salida):
+            resultado = funcion()
+    except CasoFallido:
+        raise
+    except Exception as e:
+        raise CasoFallido(f"{type(e).__name__}: {e}") from e
+    _verificar(resultado, salida.getvalue(), esperadas)
+
+
+def medir(nombre: str, funcion: Callable[[], object], repeticiones: int,
+          antes: Optional[Callable[[], None]] = None, filas: Optional[int] = None,
+          memoria: bool = True) -> Dict:
+    """
+    Ejecuta `funcion` varias veces sin mostrar su salida por consola.
+
+    Args:
+        nombre: Nombre del caso
+        funcion: Operación medida
+        repeticiones: Ejecuciones medidas
+        antes: Preparación antes de cada ejecución (no medida), p. ej. vaciar el caché
+        filas: Registros procesados por ejecución, para calcular filas/s; si
+               `funcion` devuelve una lista, debe tener esa cantidad
+        memoria: Ejecutar una vez más, sin cronometrar, con tracemalloc
+
+    Returns:
+        Dict: Tiempos, mediana, mínimo, filas/s, memoria pico y el reparto
+              por partición; 'error' con el motivo si el caso falló
+    """
+    tiempos = []
+    pico = None
+    METRICAS.reiniciar()
+    try:
+        for _ in range(repeticiones):
+            if antes:
+                antes()
+            inicio = time.perf_counter()
+            _ejecutar(funcion, filas)
+            tiempos.append(time.perf_counter() - inicio)
+        particiones = METRICAS.resumen()
+
+        if memoria:
+            if antes:
+                antes()
+            tracemalloc.start()
+            try:
+                _ejecutar(funcion, filas)
+                pico = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            finally:
+                tracemalloc.stop()
+    except CasoFallido as e:
+        print(f"  ✗ {nombre:<28} {e}")
+        return {'caso': nombre, 'repeticiones': repeticiones, 'error': str(e), 'filas': filas,
+                'segundos': [round(t, 6) for t in tiempos], 'mediana': None}
+
+    mediana = statistics.median(tiempos)
+    resultado = {
+        'caso': nombre,
+        'repeticiones': repeticiones,
+        'error': None,
+        'segundos': [round(t, 6) for t in tiempos],
+        'mediana': round(mediana, 6),
+        'minimo': round(min(tiempos), 6),
+        'filas': filas,
+        'filas_por_segundo': round(filas / mediana) if filas and mediana else None,
+        'particiones': {
+            particion: {'ms': round(datos['total_ms'], 3), 'operaciones': datos['operaciones'],
+                        'filas': datos['filas']}
+            for particion, datos in particiones.items()
+        },
+        'memoria_pico_mb': round(pico, 2) if pico is not None else None,
+    }
+    print(f"  ✓ {nombre:<28} {mediana * 1000:>12.1f} ms"
+          + (f" {resultado['filas_por_segundo']:>12,} filas/s" if resultado['filas_por_segundo'] else '')
+          + (f" {pico:>9.1f} MB" if pico is not None else ''))
+    return resultado
+
+
+def ejecutar_tamano(total: int, casos=CASOS, repeticiones: int = 3,
+                    inserciones: int = 1000, semilla: int = SEMILLA,
+                    memoria: bool = True) -> List[Dict]:
+    """
+    Prepara un entorno local con `total` registros y mide los casos pedidos.
+    La migración se ejecuta siempre (llena las tablas destino), aunque solo
+    se informa si 'migracion' está entre los casos; si falla, los demás
+    casos no se miden.
+    """
+    print(f"\n→ {total:,} registros")
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix='rendimiento_') as directorio:
+        entorno = EntornoLocal(directorio)
+        segundos = entorno.poblar_origen(total, semilla)
+        print(f"  Datos sintéticos generados en {segundos:.1f} s")
+        middleware, migracion = entorno.conectar()
+        cache = middleware.CACHE_RESULTADOS
+
+        resultado = medir('migrar_datos', migracion.migrar_datos, 1, filas=total, memoria=memoria)
+        if 'migracion' in casos or resultado['error']:
+            resultados.append(resultado)
+        if resultado['error']:
+            casos = ()
+
+        if 'todos' in casos:
+            resultados.append(medir('consultar_todos_creditos',
+                                    lambda: middleware.consultar_todos_creditos(),
+                                    repeticiones, antes=cache.limpiar, filas=total,
+                                    memoria=memoria))
+
+        if 'por_anio' in casos:
+            for anio, _ in ANIOS:
+                particion = MAPA_PARTICIONES.particion_de(anio)
+                resultados.append(medir(f'consultar_por_anio({anio})',
+                                        lambda anio=anio: middleware.consultar_por_anio(anio),
+                                        repeticiones, antes=cache.limpiar,
+                                        filas=_contar(entorno, particion, anio), memoria=memoria))
+
+        if 'reporte' in casos:
+            resultados.append(medir('reporte_consolidado', middleware.imprimir_reporte_consolidado,
+                                    repeticiones, antes=cache.limpiar, memoria=memoria))
+
+        if 'insercion' in casos and inserciones:
+            creditos = list(GeneradorCreditos(semilla + 1).generar(inserciones))
+            resultados.append(medir('insert_credito',
+                                    lambda: [middleware.insert_credito(*c) for c in creditos],
+                                    1, filas=inserciones, memoria=memoria))
+
+        middleware.POOL_POSTGRESQL.cerrar()
+        middleware.POOL_SQLSERVER.cerrar()
+
+    for resultado in resultados:
+        resultado['tamano'] = total
+    return resultados
+
+
+def _contar(entorno: EntornoLocal, particion: Optional[str], anio: int) -> Optional[int]:
+    if particion is None:
+        return None
+    conn = entorno.conexion(MAPA_PARTICIONES.motor(particion))
+    cursor = conn.cursor()
+    tabla = 'CreditosActuales' if MAPA_PARTICIONES.motor(particion) == MOTOR_SQLSERVER else 'creditos_historicos'
+    cursor.execute(f"SELECT COUNT(*) FROM {tabla} WHERE anio = ?", (anio,))
+    cantidad = cursor.fetchone()[0]
+    conn.close()
+    return cantidad
+
+# ============================================================
+# RESULTADOS
+# ============================================================
+
+def describir_entorno(semilla: int) -> Dict:
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'procesador': platform.processor() or platform.machine(),
+        'semilla': semilla,
+        'motor_local': 'sqlite',
+    }
+
+
+def comparar(actual: Dict, base: Dict, umbral: float = 0.2) -> List[str]:
+    """
+    Casos cuya mediana empeoró más de `umbral` (0.2 = 20 %) respecto de una
+    corrida anterior con el mismo tamaño, y casos que fallaron.
+
+    Returns:
+        List[str]: Descripción de cada regresión
+    """
+    anteriores = {(r['tamano'], r['caso']): r for r in base.get('resultados', [])}
+    regresiones = []
+    for resultado in actual['resultados']:
+        if resultado.get('error'):
+            regresiones.append(f"{resultado['caso']} ({resultado['tamano']:,}): "
+                               f"falló ({resultado['error']})")
+            continue
+        anterior = anteriores.get((resultado['tamano'], resultado['caso']))
+        if not anterior or anterior.get('error') or not anterior['mediana']:
+            continue
+        cambio = resultado['mediana'] / anterior['mediana'] - 1
+        if cambio > umbral:
+            regresiones.append(f"{resultado['caso']} ({resultado['tamano']:,}): "
+                               f"{anterior['mediana'] * 1000:.1f} → {resultado['mediana'] * 1000:.1f} ms "
+                               f"(+{cambio * 100:.0f}%)")
+    return regresiones
+
+
+def _tamano(texto: str) -> int:
+    return TAMANOS.get(texto) or int(texto.replace('_', ''))
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+if __name__ == "__main__":
+    def opcion(nombre, defecto=None):
+        return sys.argv[sys.argv.index(nombre) + 1] if nombre in sys.argv else defecto
+
+    tamanos = [_tamano(t) for t in opcion('--filas', '10k,234k').split(',')]
+    casos = tuple(opcion('--casos', ','.join(CASOS)).split(','))
+    semilla = int(opcion('--semilla', SEMILLA))
+    salida = opcion('--salida', f"rendimiento_{datetime.now():%Y%m%d_%H%M%S}.json")
+
+    print("="*80)
+    print("PRUEBAS DE RENDIMIENTO (MOTORES LOCALES SQLITE)")
+    print("="*80)
+
+    informe = {'entorno': describir_entorno(semilla), 'resultados': []}
+    for total in tamanos:
+        informe['resultados'].extend(ejecutar_tamano(
+            total, casos, repeticiones=int(opcion('--repeticiones', 3)),
+            inserciones=int(opcion('--inserciones', 1000)), semilla=semilla,
+            memoria='--sin-memoria' not in sys.argv))
+
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"\n✓ Resultados en {salida}")
+
+    fallidos = [r for r in informe['resultados'] if r['error']]
+    if fallidos:
+        print(f"\n✗ {len(fallidos)} casos fallaron:")
+        for resultado in fallidos:
+            print(f"  • {resultado['caso']} ({resultado['tamano']:,}): {resultado['error']}")
+
+    if '--comparar' in sys.argv:
+        with open(opcion('--comparar'), encoding='utf-8') as archivo:
+            regresiones = comparar(informe, json.load(archivo), float(opcion('--umbral', 0.2)))
+        if regresiones:
+            print(f"\n✗ {len(regresiones)} regresiones:")
+            for regresion in regresiones:
+                print(f"  • {regresion}")
+            sys.exit(1)
+        print("✓ Sin regresiones respecto de la corrida anterior")
+
+    if fallidos:
+        sys.exit(1)
@@ -6,6 +6,10 @@ No requiere menú interactivo, solo genera el reporte consolidado
 import psycopg2
 import pyodbc
 
+from agregacion_federada import ConsultaAgregada
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+from resumenes import MOTOR_PG, MOTOR_SQL, verificar_resumen
+
 CONFIG_PG = {
     'dbname': 'mdh_historico',
     'user': 'postgres',
@@ -22,6 +26,13 @@ CONFIG_SQL = (
     "PWD=admin;"
 )
 
+# Todo el reporte en una consulta GROUPING SETS por partición,
+# sobre las tablas de resumen en lugar de las tablas base
+CONSULTA_REPORTE = ConsultaAgregada(
+    conjuntos=[(), ('provincia',), ('anio',), ('genero',), ('tipo_credito',), ('tipo_subsidio',)],
+    metricas={'total': 'SUM(total)', 'activos': 'SUM(activos)'}
+)
+
 def generar_reporte():
     print("\n" + "="*100)
     print("REPORTE CONSOLIDADO - CRÉDITOS DE DESARROLLO HUMANO")
@@ -32,18 +43,33 @@ def generar_reporte():
         conn_pg = psycopg2.connect(**CONFIG_PG)
         conn_sql = pyodbc.connect(CONFIG_SQL)
         
-        # Estadísticas generales
-        cursor_pg = conn_pg.cursor()
-        cursor_pg.execute("SELECT COUNT(*), SUM(cdh_activos) FROM creditos_historicos")
-        total_historico, activos_historico = cursor_pg.fetchone()
+        # Advertir si algún resumen no coincide con su tabla base
+        for conn, motor in ((conn_pg, MOTOR_PG), (conn_sql, MOTOR_SQL)):
+            estado = verificar_resumen(conn, motor)
+            if not estado['al_dia']:
+                print(f"\n⚠ {motor['tabla_resumen']} desactualizado "
+                      f"({estado['filas_resumen']:,} de {estado['filas_base']:,} registros). "
+                      f"Ejecuta: python resumenes.py --reconstruir")
+        
+        # Un viaje por partición, ambas en paralelo
+        resultado = CONSULTA_REPORTE.ejecutar({
+            'historico': (conn_pg, MOTOR_PG['tabla_resumen'],
+                          MAPA_PARTICIONES.filtro_sql(MAPA_PARTICIONES.particion_de_motor(MOTOR_POSTGRESQL))),
+            'actual': (conn_sql, MOTOR_SQL['tabla_resumen'],
+                       MAPA_PARTICIONES.filtro_sql(MAPA_PARTICIONES.particion_de_motor(MOTOR_SQLSERVER))),
+        })
         
-        cursor_sql = conn_sql.cursor()
-        cursor_sql.execute("SELECT COUNT(*), SUM(cdh_activos) FROM CreditosActuales")
-        total_actual, activos_actual = cursor_sql.fetchone()
+        # Estadísticas generales
+        total_historico = resultado.total('historico').get('total', 0)
+        activos_historico = resultado.total('historico').get('activos')
+        total_actual = resultado.total('actual').get('total', 0)
+        activos_actual = resultado.total('actual').get('activos')
         
         print(f"\n📊 RESUMEN GENERAL:")
-        print(f"  • Histórico (2022-2024) en PostgreSQL: {total_historico:,} créditos")
-        print(f"  • Actual (2025) en SQL Server:        {total_actual:,} créditos")
+        etiqueta_historico = f"Histórico ({MAPA_PARTICIONES.describir_motor(MOTOR_POSTGRESQL)}) en PostgreSQL:"
+        etiqueta_actual = f"Actual ({MAPA_PARTICIONES.describir_motor(MOTOR_SQLSERVER)}) en SQL Server:"
+        print(f"  • {etiqueta_historico:<36} {total_historico:,} créditos")
+        print(f"  • {etiqueta_actual:<36} {total_actual:,} créditos")
         print(f"  • TOTAL:                              {(total_historico + total_actual):,} créditos")
         print(f"  • CDH activos históricos:             {activos_historico or 0:,}")
         print(f"  • CDH activos actuales:               {activos_actual or 0:,}")
@@ -51,32 +77,17 @@ def generar_reporte():
         # Top provincias
         print(f"\n📍 TOP 10 PROVINCIAS:")
         
-        cursor_pg.execute("""
-            SELECT provincia, COUNT(*) as total, SUM(cdh_activos) as activos
-            FROM creditos_historicos
-            GROUP BY provincia
-            ORDER BY total DESC
-        """)
-        provincias_pg = {row[0]: {'historico': row[1], 'activos': row[2] or 0} for row in cursor_pg.fetchall()}
-        
-        cursor_sql.execute("""
-            SELECT provincia, COUNT(*) as total, SUM(cdh_activos) as activos
-            FROM CreditosActuales
-            GROUP BY provincia
-        """)
-        provincias_sql = {row[0]: {'actual': row[1], 'activos': row[2] or 0} for row in cursor_sql.fetchall()}
+        provincias_pg = resultado.grupo('provincia', 'historico')
+        provincias_sql = resultado.grupo('provincia', 'actual')
         
         # Consolidar
         todas_provincias = {}
-        for prov, datos in provincias_pg.items():
-            todas_provincias[prov] = {'historico': datos['historico'], 'actual': 0, 'activos': datos['activos']}
-        
-        for prov, datos in provincias_sql.items():
-            if prov in todas_provincias:
-                todas_provincias[prov]['actual'] = datos['actual']
-                todas_provincias[prov]['activos'] += datos['activos']
-            else:
-                todas_provincias[prov] = {'historico': 0, 'actual': datos['actual'], 'activos': datos['activos']}
+        for prov, datos in resultado.grupo('provincia').items():
+            todas_provincias[prov] = {
+                'historico': provincias_pg.get(prov, {}).get('total', 0),
+                'actual': provincias_sql.get(prov, {}).get('total', 0),
+                'activos': datos['activos'] or 0
+            }
         
         sorted_provinces = sorted(todas_provincias.items(), 
                                  key=lambda x: x[1]['historico'] + x[1]['actual'], 
@@ -91,83 +102,48 @@ def generar_reporte():
         
         # Distribución por año
         print(f"\n📅 DISTRIBUCIÓN POR AÑO:")
-        cursor_pg.execute("""
-            SELECT anio, COUNT(*) as total
-            FROM creditos_historicos
-            GROUP BY anio
-            ORDER BY anio
-        """)
         
         print(f"  {'Año':<10} {'Registros':>15} {'Base de Datos':<20}")
         print(f"  {'-'*10} {'-'*15} {'-'*20}")
         
-        for anio, total in cursor_pg.fetchall():
-            print(f"  {anio:<10} {total:>15,} {'PostgreSQL':<20}")
-        
-        cursor_sql.execute("""
-            SELECT anio, COUNT(*) as total
-            FROM CreditosActuales
-            GROUP BY anio
-        """)
+        for anio, datos in sorted(resultado.grupo('anio', 'historico').items()):
+            print(f"  {anio:<10} {datos['total']:>15,} {'PostgreSQL':<20}")
         
-        for anio, total in cursor_sql.fetchall():
-            print(f"  {anio:<10} {total:>15,} {'SQL Server':<20}")
+        for anio, datos in resultado.grupo('anio', 'actual').items():
+            print(f"  {anio:<10} {datos['total']:>15,} {'SQL Server':<20}")
         
         # Distribución por género
         print(f"\n👥 DISTRIBUCIÓN POR GÉNERO:")
         
-        cursor_pg.execute("""
-            SELECT genero, COUNT(*) as total
-            FROM creditos_historicos
-            GROUP BY genero
-        """)
-        genero_pg = dict(cursor_pg.fetchall())
-        
-        cursor_sql.execute("""
-            SELECT genero, COUNT(*) as total
-            FROM CreditosActuales
-            GROUP BY genero
-        """)
-        genero_sql = dict(cursor_sql.fetchall())
-        
+        genero = resultado.grupo('genero')
         total_general = total_historico + total_actual
-        femenino_total = genero_pg.get('FEMENINO', 0) + genero_sql.get('FEMENINO', 0)
-        masculino_total = genero_pg.get('MASCULINO', 0) + genero_sql.get('MASCULINO', 0)
+        femenino_total = genero.get('FEMENINO', {}).get('total', 0)
+        masculino_total = genero.get('MASCULINO', {}).get('total', 0)
         
         print(f"  • Femenino:  {femenino_total:>8,} ({femenino_total/total_general*100:.1f}%)")
         print(f"  • Masculino: {masculino_total:>8,} ({masculino_total/total_general*100:.1f}%)")
         
         # Top tipos de crédito
         print(f"\n💰 TOP 5 TIPOS DE CRÉDITO:")
-        cursor_pg.execute("""
-            SELECT tipo_credito, COUNT(*) as total
-            FROM creditos_historicos
-            GROUP BY tipo_credito
-            ORDER BY total DESC
-            LIMIT 5
-        """)
         
         print(f"  {'Tipo de Crédito':<40} {'Total':>15}")
         print(f"  {'-'*40} {'-'*15}")
         
-        for tipo, total in cursor_pg.fetchall():
-            print(f"  {tipo:<40} {total:>15,}")
+        tipos = sorted(resultado.grupo('tipo_credito', 'historico').items(),
+                       key=lambda x: x[1]['total'], reverse=True)[:5]
+        for tipo, datos in tipos:
+            print(f"  {tipo:<40} {datos['total']:>15,}")
         
         # Top tipos de subsidio
         print(f"\n🏆 TOP 5 TIPOS DE SUBSIDIO:")
-        cursor_pg.execute("""
-            SELECT tipo_subsidio, COUNT(*) as total
-            FROM creditos_historicos
-            GROUP BY tipo_subsidio
-            ORDER BY total DESC
-            LIMIT 5
-        """)
         
         print(f"  {'Tipo de Subsidio':<50} {'Total':>15}")
         print(f"  {'-'*50} {'-'*15}")
         
-        for tipo, total in cursor_pg.fetchall():
-            print(f"  {tipo:<50} {total:>15,}")
+        subsidios = sorted(resultado.grupo('tipo_subsidio', 'historico').items(),
+                           key=lambda x: x[1]['total'], reverse=True)[:5]
+        for tipo, datos in subsidios:
+            print(f"  {tipo:<50} {datos['total']:>15,}")
         
         print("\n" + "="*100)
         print("✓ REPORTE GENERADO EXITOSAMENTE")
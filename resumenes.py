@@ -0,0 +1,221 @@
+"""
+RESÚMENES MATERIALIZADOS POR PARTICIÓN
+Tablas de resumen (rollup) por (anio, provincia, genero, tipo_credito,
+tipo_subsidio) con la cantidad de créditos y SUM(cdh_activos):
+
+  • PostgreSQL: resumen_creditos_historicos (se calcula una vez)
+  • SQL Server: ResumenCreditosActuales (se mantiene con cada inserción)
+
+Las inserciones y la migración aplican un delta al resumen en la misma
+transacción que los datos, de modo que el resumen nunca queda a medias.
+Los reportes leen los resúmenes en lugar de las tablas base. El
+middleware crea y calcula los que falten al arrancar, antes del menú.
+
+Uso:
+    python resumenes.py               → verifica si los resúmenes están al día
+    python resumenes.py --reconstruir → recalcula ambos desde las tablas base
+"""
+
+import sys
+from typing import Dict, Iterable, Tuple
+
+DIMENSIONES_RESUMEN = ('anio', 'provincia', 'genero', 'tipo_credito', 'tipo_subsidio')
+
+# Posición de cada dimensión y de cdh_activos en una fila de crédito
+# (mismo orden que COLUMNAS_CREDITO / COLUMNAS_DESTINO)
+_POSICION = {'genero': 0, 'provincia': 5, 'tipo_credito': 9, 'tipo_subsidio': 13,
+             'cdh_activos': 14, 'anio': 15}
+
+MOTOR_PG = {
+    'nombre': 'PostgreSQL',
+    'tabla_base': 'creditos_historicos',
+    'tabla_resumen': 'resumen_creditos_historicos',
+    'p': '%s',
+    'existe': "SELECT to_regclass('resumen_creditos_historicos') IS NOT NULL",
+    'ddl': """
+        CREATE TABLE IF NOT EXISTS resumen_creditos_historicos (
+            anio INTEGER NOT NULL,
+            provincia VARCHAR(50) NOT NULL,
+            genero VARCHAR(20) NOT NULL,
+            tipo_credito VARCHAR(50) NOT NULL,
+            tipo_subsidio VARCHAR(100) NOT NULL,
+            total BIGINT NOT NULL,
+            activos BIGINT NOT NULL,
+            PRIMARY KEY (anio, provincia, genero, tipo_credito, tipo_subsidio)
+        );
+    """,
+    'upsert': """
+        INSERT INTO resumen_creditos_historicos AS r
+            (anio, provincia, genero, tipo_credito, tipo_subsidio, total, activos)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (anio, provincia, genero, tipo_credito, tipo_subsidio)
+        DO UPDATE SET total = r.total + EXCLUDED.total,
+                      activos = r.activos + EXCLUDED.activos
+    """,
+}
+
+MOTOR_SQL = {
+    'nombre': 'SQL Server',
+    'tabla_base': 'CreditosActuales',
+    'tabla_resumen': 'ResumenCreditosActuales',
+    'p': '?',
+    'existe': "SELECT CASE WHEN OBJECT_ID('dbo.ResumenCreditosActuales', 'U') IS NULL THEN 0 ELSE 1 END",
+    'ddl': """
+        IF OBJECT_ID('dbo.ResumenCreditosActuales', 'U') IS NULL
+        CREATE TABLE ResumenCreditosActuales (
+            anio INT NOT NULL,
+            provincia VARCHAR(50) NOT NULL,
+            genero VARCHAR(20) NOT NULL,
+            tipo_credito VARCHAR(50) NOT NULL,
+            tipo_subsidio VARCHAR(100) NOT NULL,
+            total BIGINT NOT NULL,
+            activos BIGINT NOT NULL,
+            PRIMARY KEY (anio, provincia, genero, tipo_credito, tipo_subsidio)
+        );
+    """,
+    'upsert': """
+        MERGE ResumenCreditosActuales WITH (HOLDLOCK) AS r
+        USING (SELECT ? AS anio, ? AS provincia, ? AS genero, ? AS tipo_credito,
+                      ? AS tipo_subsidio, ? AS total, ? AS activos) AS d
+        ON r.anio = d.anio AND r.provincia = d.provincia AND r.genero = d.genero
+           AND r.tipo_credito = d.tipo_credito AND r.tipo_subsidio = d.tipo_subsidio
+        WHEN MATCHED THEN
+            UPDATE SET total = r.total + d.total, activos = r.activos + d.activos
+        WHEN NOT MATCHED THEN
+            INSERT (anio, provincia, genero, tipo_credito, tipo_subsidio, total, activos)
+            VALUES (d.anio, d.provincia, d.genero, d.tipo_credito, d.tipo_subsidio,
+                    d.total, d.activos);
+    """,
+}
+
+# ============================================================
+# MANTENIMIENTO
+# ============================================================
+
+def asegurar_resumen(conn, motor):
+    """Crea la tabla de resumen si no existe."""
+    cursor = conn.cursor()
+    cursor.execute(motor['ddl'])
+    conn.commit()
+    cursor.close()
+
+def existe_resumen(conn, motor) -> bool:
+    """Indica si la tabla de resumen ya está creada."""
+    cursor = conn.cursor()
+    cursor.execute(motor['existe'])
+    fila = cursor.fetchone()
+    cursor.close()
+    conn.commit()
+    return bool(fila and fila[0])
+
+def preparar_resumen(conn, motor) -> bool:
+    """
+    Crea y calcula el resumen desde la tabla base si todavía no existe
+    (bases preparadas antes de existir los resúmenes). Los errores se
+    propagan: sin resumen las inserciones fallan al aplicar su delta.
+
+    Returns:
+        bool: True si hubo que crearlo
+    """
+    if existe_resumen(conn, motor):
+        return False
+    try:
+        asegurar_resumen(conn, motor)
+        reconstruir_resumen(conn, motor)
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+def reconstruir_resumen(conn, motor):
+    """Recalcula el resumen completo desde la tabla base en una transacción."""
+    # Los NULL se guardan como '' para poder formar la clave primaria
+    dimensiones = ', '.join(
+        d if d == 'anio' else f"COALESCE({d}, '')" for d in DIMENSIONES_RESUMEN
+    )
+    cursor = conn.cursor()
+    cursor.execute(f"DELETE FROM {motor['tabla_resumen']}")
+    cursor.execute(f"""
+        INSERT INTO {motor['tabla_resumen']}
+            ({', '.join(DIMENSIONES_RESUMEN)}, total, activos)
+        SELECT {dimensiones}, COUNT(*), COALESCE(SUM(cdh_activos), 0)
+        FROM {motor['tabla_base']}
+        WHERE anio IS NOT NULL
+        GROUP BY {dimensiones}
+    """)
+    conn.commit()
+    cursor.close()
+
+def calcular_delta(filas: Iterable[Tuple]) -> Dict[Tuple, list]:
+    """
+    Agrupa filas de crédito (16 columnas) por las dimensiones del resumen.
+
+    Returns:
+        Dict: {(anio, provincia, genero, tipo_credito, tipo_subsidio): [total, activos]}
+    """
+    delta = {}
+    for fila in filas:
+        clave = tuple(
+            fila[_POSICION[d]] if d == 'anio' else (fila[_POSICION[d]] or '')
+            for d in DIMENSIONES_RESUMEN
+        )
+        acumulado = delta.setdefault(clave, [0, 0])
+        acumulado[0] += 1
+        acumulado[1] += fila[_POSICION['cdh_activos']] or 0
+    return delta
+
+def aplicar_delta(cursor, motor, filas: Iterable[Tuple], signo: int = 1):
+    """
+    Suma al resumen las filas recién insertadas (o las resta con signo=-1
+    si se borraron). Debe ejecutarse con el mismo cursor y antes del commit
+    de la inserción o el borrado.
+    """
+    delta = calcular_delta(filas)
+    if delta:
+        cursor.executemany(motor['upsert'],
+                           [clave + (signo * total, signo * activos)
+                            for clave, (total, activos) in delta.items()])
+
+def borrar_anio(cursor, motor, anio: int):
+    """Quita un año del resumen (cuando se borran sus filas base)."""
+    cursor.execute(f"DELETE FROM {motor['tabla_resumen']} WHERE anio = {motor['p']}", (anio,))
+
+def verificar_resumen(conn, motor) -> Dict:
+    """
+    Compara la cantidad de filas de la tabla base con el total del resumen.
+
+    Returns:
+        Dict: {'filas_base', 'filas_resumen', 'al_dia'}
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {motor['tabla_base']} WHERE anio IS NOT NULL")
+    filas_base = cursor.fetchone()[0]
+    cursor.execute(f"SELECT COALESCE(SUM(total), 0) FROM {motor['tabla_resumen']}")
+    filas_resumen = cursor.fetchone()[0]
+    cursor.close()
+    conn.commit()
+    return {'filas_base': filas_base, 'filas_resumen': int(filas_resumen),
+            'al_dia': filas_base == filas_resumen}
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+if __name__ == "__main__":
+    from migrar_y_reportar import CONFIG_PG_HISTORICO, conectar_postgresql, conectar_sqlserver
+
+    conexiones = ((conectar_postgresql(CONFIG_PG_HISTORICO), MOTOR_PG),
+                  (conectar_sqlserver(), MOTOR_SQL))
+
+    for conn, motor in conexiones:
+        if not conn:
+            continue
+        asegurar_resumen(conn, motor)
+        if '--reconstruir' in sys.argv:
+            reconstruir_resumen(conn, motor)
+            print(f"✓ Resumen de {motor['nombre']} reconstruido")
+        estado = verificar_resumen(conn, motor)
+        marca = "✓" if estado['al_dia'] else "✗"
+        print(f"{marca} {motor['tabla_resumen']}: {estado['filas_resumen']:,} de "
+              f"{estado['filas_base']:,} registros base")
+        conn.close()
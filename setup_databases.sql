@@ -35,7 +35,22 @@ CREATE INDEX IX_CreditosActuales_Beneficiario ON dbo.CreditosActuales(Beneficiar
 CREATE INDEX IX_CreditosActuales_Estado ON dbo.CreditosActuales(Estado);
 GO
 
--- 1.4 Verificar tabla creada
+-- 1.4 Resumen materializado que leen los reportes y que cada inserción
+-- actualiza (ver resumenes.py)
+IF OBJECT_ID('dbo.ResumenCreditosActuales','U') IS NULL
+CREATE TABLE dbo.ResumenCreditosActuales (
+    anio          INT          NOT NULL,
+    provincia     VARCHAR(50)  NOT NULL,
+    genero        VARCHAR(20)  NOT NULL,
+    tipo_credito  VARCHAR(50)  NOT NULL,
+    tipo_subsidio VARCHAR(100) NOT NULL,
+    total         BIGINT       NOT NULL,
+    activos       BIGINT       NOT NULL,
+    PRIMARY KEY (anio, provincia, genero, tipo_credito, tipo_subsidio)
+);
+GO
+
+-- 1.5 Verificar tabla creada
 SELECT 
     TABLE_NAME, 
     COLUMN_NAME, 
@@ -46,7 +61,7 @@ WHERE TABLE_NAME = 'CreditosActuales'
 ORDER BY ORDINAL_POSITION;
 GO
 
--- 1.5 (OPCIONAL) Limpiar datos de pruebas anteriores
+-- 1.6 (OPCIONAL) Limpiar datos de pruebas anteriores
 -- TRUNCATE TABLE dbo.CreditosActuales;
 -- GO
 
@@ -61,18 +76,34 @@ GO
 
 -- 2.2 Conectarse a la base mdh_historico y ejecutar:
 
--- Crear tabla para créditos históricos (años 2022, 2023, 2024)
+-- Crear tabla para créditos históricos, particionada por año: cada año
+-- vive en su propia tabla hija (las consultas por año solo leen esa hija
+-- y un año se retira con DETACH PARTITION). Ver particionado_pg.py
 CREATE TABLE IF NOT EXISTS creditos_historicos (
-    credito_id     INT PRIMARY KEY,
-    anio           INT NOT NULL CHECK (anio IN (2022, 2023, 2024)),
+    credito_id     INT NOT NULL,
+    anio           INT NOT NULL,
     mes            INT NOT NULL CHECK (mes BETWEEN 1 AND 12),
     beneficiario   VARCHAR(100) NOT NULL,
     monto          NUMERIC(12,2) NOT NULL CHECK (monto > 0),
     estado         VARCHAR(20) NOT NULL DEFAULT 'ACTIVO',
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
--- 2.3 Crear índices para optimizar consultas
+    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (credito_id, anio)
+) PARTITION BY LIST (anio);
+
+-- Una partición por año histórico (2022, 2023, 2024)
+CREATE TABLE IF NOT EXISTS creditos_historicos_2022
+    PARTITION OF creditos_historicos FOR VALUES IN (2022);
+CREATE TABLE IF NOT EXISTS creditos_historicos_2023
+    PARTITION OF creditos_historicos FOR VALUES IN (2023);
+CREATE TABLE IF NOT EXISTS creditos_historicos_2024
+    PARTITION OF creditos_historicos FOR VALUES IN (2024);
+
+-- Años sin partición propia (p. ej. recién asignados a PostgreSQL en
+-- particiones.json); el middleware crea su hija y traslada las filas
+CREATE TABLE IF NOT EXISTS creditos_historicos_otros
+    PARTITION OF creditos_historicos DEFAULT;
+
+-- 2.3 Crear índices para optimizar consultas (se crean en cada partición)
 CREATE INDEX IF NOT EXISTS idx_creditos_historicos_anio_mes 
     ON creditos_historicos(anio, mes);
 
@@ -82,7 +113,20 @@ CREATE INDEX IF NOT EXISTS idx_creditos_historicos_beneficiario
 CREATE INDEX IF NOT EXISTS idx_creditos_historicos_estado 
     ON creditos_historicos(estado);
 
--- 2.4 Verificar tabla creada
+-- 2.4 Resumen materializado que leen los reportes y que cada inserción
+-- actualiza (ver resumenes.py)
+CREATE TABLE IF NOT EXISTS resumen_creditos_historicos (
+    anio          INTEGER      NOT NULL,
+    provincia     VARCHAR(50)  NOT NULL,
+    genero        VARCHAR(20)  NOT NULL,
+    tipo_credito  VARCHAR(50)  NOT NULL,
+    tipo_subsidio VARCHAR(100) NOT NULL,
+    total         BIGINT       NOT NULL,
+    activos       BIGINT       NOT NULL,
+    PRIMARY KEY (anio, provincia, genero, tipo_credito, tipo_subsidio)
+);
+
+-- 2.5 Verificar tabla creada
 SELECT 
     column_name, 
     data_type,
@@ -92,7 +136,7 @@ FROM information_schema.columns
 WHERE table_name = 'creditos_historicos'
 ORDER BY ordinal_position;
 
--- 2.5 (OPCIONAL) Limpiar datos de pruebas anteriores
+-- 2.6 (OPCIONAL) Limpiar datos de pruebas anteriores
 -- TRUNCATE TABLE creditos_historicos;
 
 
@@ -119,6 +163,10 @@ ORDER BY ordinal_position;
 -- GROUP BY anio
 -- ORDER BY anio;
 
+-- POSTGRESQL - Comprobar la poda de particiones (solo debe aparecer
+-- creditos_historicos_2023 en el plan)
+-- EXPLAIN SELECT * FROM creditos_historicos WHERE anio = 2023;
+
 
 -- ============================================================
 -- SCRIPTS DE LIMPIEZA (USAR CON PRECAUCIÓN)
@@ -138,6 +186,10 @@ ORDER BY ordinal_position;
 -- POSTGRESQL - Eliminar todos los datos
 -- TRUNCATE TABLE creditos_historicos;
 
+-- POSTGRESQL - Retirar un año completo (instantáneo, sin DELETE)
+-- ALTER TABLE creditos_historicos DETACH PARTITION creditos_historicos_2022;
+-- DROP TABLE creditos_historicos_2022;
+
 -- POSTGRESQL - Eliminar tabla y base de datos
 -- DROP TABLE IF EXISTS creditos_historicos;
 -- DROP DATABASE IF EXISTS mdh_historico;
@@ -0,0 +1,377 @@
+"""
+============================================================
+TRASPASO DE AÑO EN LÍNEA - SQL SERVER → POSTGRESQL
+============================================================
+
+Cierre anual: mueve un año de CreditosActuales (SQL Server)
+a creditos_historicos (PostgreSQL) sin detener el sistema.
+
+  1. Copia: el año se lee de SQL Server por bloques y se
+     inserta en PostgreSQL (execute_values) en UNA transacción,
+     junto con su resumen. Las consultas filtran cada partición
+     por los años que le asigna el mapa, así que la copia no es
+     visible todavía.
+  2. Verificación: cantidad de filas y suma de control (hash de
+     cada fila, independiente del orden) del origen y de la
+     copia, antes del commit.
+  3. Cambio de mapa: particiones.json pasa el año a PostgreSQL;
+     los demás procesos lo recargan en menos de revisar_cada s.
+  4. Puesta al día: pasado ese plazo se copian las filas que
+     hayan llegado a SQL Server con el mapa anterior.
+  5. Borrado: las filas se borran de SQL Server en lotes
+     pequeños (DELETE TOP, un commit por lote, por debajo del
+     umbral de escalamiento de bloqueos), restando cada lote
+     de su resumen.
+
+consultar_por_anio funciona en todo momento: antes del cambio
+de mapa lee SQL Server y después PostgreSQL, que ya tiene el
+año completo.
+
+El avance se guarda en traspaso_anio (PostgreSQL); si el
+proceso se interrumpe, volver a ejecutarlo retoma la fase
+pendiente.
+
+Uso:
+    python traspaso_anio.py 2025
+============================================================
+"""
+
+import hashlib
+import sys
+import time
+
+from psycopg2.extras import execute_values
+
+from mapa_particiones import MAPA_PARTICIONES, MOTOR_POSTGRESQL, MOTOR_SQLSERVER
+from migrar_y_reportar import (
+    CONFIG_PG_HISTORICO, COLUMNAS_DESTINO, conectar_postgresql, conectar_sqlserver
+)
+from particionado_pg import crear_particion_anio, vaciar_anio
+from resumenes import MOTOR_PG, MOTOR_SQL, asegurar_resumen, aplicar_delta, borrar_anio
+
+# Columnas copiadas (las 16 de datos y la fecha de migración original)
+COLUMNAS_TRASPASO = f"{COLUMNAS_DESTINO}, fecha_migracion"
+
+DDL_TRASPASO = """
+    CREATE TABLE IF NOT EXISTS traspaso_anio (
+        anio INTEGER PRIMARY KEY,
+        ultimo_id BIGINT NOT NULL,
+        registros BIGINT NOT NULL,
+        huella VARCHAR(30) NOT NULL,
+        completo BOOLEAN NOT NULL DEFAULT FALSE,
+        actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+# Filas por DELETE en SQL Server: menos de 5000 bloqueos evita que el
+# motor escale a un bloqueo de tabla sobre CreditosActuales
+LOTE_BORRADO = 4000
+
+_MODULO = 2 ** 64
+
+# ============================================================
+# SUMA DE CONTROL
+# ============================================================
+
+def huella_fila(fila) -> int:
+    """Hash de 64 bits de una fila; None y valores se normalizan a texto."""
+    texto = '\x1f'.join('\\N' if v is None else str(v) for v in fila)
+    return int.from_bytes(hashlib.blake2b(texto.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class SumaControl:
+    """Cantidad de filas y suma de sus hashes (no depende del orden de lectura)."""
+
+    def __init__(self, registros: int = 0, huella: int = 0):
+        self.registros = registros
+        self.huella = huella
+
+    def agregar(self, filas):
+        for fila in filas:
+            self.registros += 1
+            self.huella = (self.huella + huella_fila(fila)) % _MODULO
+
+    def __eq__(self, otra):
+        return (self.registros, self.huella) == (otra.registros, otra.huella)
+
+    def __repr__(self):
+        return f"{self.registros:,} filas, huella {self.huella:016x}"
+
+# ============================================================
+# ESTADO
+# ============================================================
+
+def leer_estado(conn_pg, anio):
+    """
+    Returns:
+        Tuple: (ultimo_id, SumaControl, completo) o None si el año no tiene traspaso
+    """
+    cursor = conn_pg.cursor()
+    cursor.execute("SELECT ultimo_id, registros, huella, completo FROM traspaso_anio "
+                   "WHERE anio = %s", (anio,))
+    fila = cursor.fetchone()
+    cursor.close()
+    conn_pg.commit()
+    if fila is None:
+        return None
+    return fila[0], SumaControl(fila[1], int(fila[2])), fila[3]
+
+def guardar_estado(cursor, anio, ultimo_id, control, completo=False):
+    """Registra el avance; debe ejecutarse en la misma transacción que la copia."""
+    cursor.execute("DELETE FROM traspaso_anio WHERE anio = %s", (anio,))
+    cursor.execute(
+        "INSERT INTO traspaso_anio (anio, ultimo_id, registros, huella, completo) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        (anio, ultimo_id, control.registros, str(control.huella), completo)
+    )
+
+# ============================================================
+# COPIA Y VERIFICACIÓN
+# ============================================================
+
+def leer_origen(conn_sql, anio, desde_id, tamano_lote):
+    """Lee de SQL Server las filas del año con id > desde_id, por bloques ordenados por id."""
+    cursor = conn_sql.cursor()
+    cursor.arraysize = tamano_lote
+    cursor.execute(f"SELECT id, {COLUMNAS_TRASPASO} FROM CreditosActuales "
+                   f"WHERE anio = ? AND id > ? ORDER BY id", anio, desde_id)
+    try:
+        while True:
+            lote = cursor.fetchmany(tamano_lote)
+            if not lote:
+                break
+            yield lote
+    finally:
+        cursor.close()
+        conn_sql.commit()
+
+def copiar(conn_sql, cursor_pg, anio, desde_id, tamano_lote):
+    """
+    Inserta en PostgreSQL las filas del año con id > desde_id, sin confirmar.
+
+    Returns:
+        Tuple[int, SumaControl, List[int]]: (último id copiado en SQL Server,
+        suma de control del origen, ids asignados en PostgreSQL)
+    """
+    control = SumaControl()
+    ultimo_id = desde_id
+    ids_destino = []
+    for lote in leer_origen(conn_sql, anio, desde_id, tamano_lote):
+        filas = [tuple(fila[1:]) for fila in lote]
+        ids_destino.extend(id_ for (id_,) in execute_values(
+            cursor_pg,
+            f"INSERT INTO creditos_historicos ({COLUMNAS_TRASPASO}) VALUES %s RETURNING id",
+            filas, page_size=tamano_lote, fetch=True
+        ))
+        aplicar_delta(cursor_pg, MOTOR_PG, filas)
+        control.agregar(filas)
+        ultimo_id = lote[-1][0]
+        print(f"  ✓ {control.registros:,} registros copiados...", end='\r')
+    return ultimo_id, control, ids_destino
+
+def control_destino(conn_pg, ids, tamano_lote) -> SumaControl:
+    """
+    Suma de control de las filas copiadas, releídas de PostgreSQL dentro de
+    la transacción en curso. Se verifican por id porque, tras el cambio de
+    mapa, el año también recibe inserciones nuevas en PostgreSQL.
+    """
+    control = SumaControl()
+    if not ids:
+        return control
+    cursor = conn_pg.cursor(name='verificar_traspaso')
+    cursor.itersize = tamano_lote
+    cursor.execute(f"SELECT {COLUMNAS_TRASPASO} FROM creditos_historicos WHERE id = ANY(%s)",
+                   (ids,))
+    control.agregar(cursor)
+    cursor.close()
+    return control
+
+def contar_origen(conn_sql, anio, desde_id=0, hasta_id=None) -> int:
+    """Filas del año en SQL Server con desde_id < id <= hasta_id."""
+    cursor = conn_sql.cursor()
+    if hasta_id is None:
+        cursor.execute("SELECT COUNT(*) FROM CreditosActuales WHERE anio = ? AND id > ?",
+                       anio, desde_id)
+    else:
+        cursor.execute("SELECT COUNT(*) FROM CreditosActuales WHERE anio = ? AND id > ? AND id <= ?",
+                       anio, desde_id, hasta_id)
+    cantidad = cursor.fetchone()[0]
+    cursor.close()
+    conn_sql.commit()
+    return cantidad
+
+def copiar_y_verificar(conn_sql, conn_pg, anio, desde_id, acumulado, tamano_lote,
+                       reemplazar=False):
+    """
+    Copia las filas con id > desde_id y confirma solo si la copia coincide
+    con el origen en cantidad y suma de control. El avance se guarda en la
+    misma transacción.
+
+    Args:
+        acumulado: Suma de control de lo ya copiado en pasadas anteriores
+        reemplazar: Borrar antes cualquier copia previa del año en PostgreSQL
+
+    Returns:
+        Tuple[int, SumaControl] o None si la verificación falló
+    """
+    if reemplazar:
+        # Fuera de la transacción de la copia: crear la hija bloquea la tabla madre
+        crear_particion_anio(conn_pg, anio)
+    cursor = conn_pg.cursor()
+    if reemplazar:
+        vaciar_anio(cursor, anio)
+        borrar_anio(cursor, MOTOR_PG, anio)
+
+    ultimo_id, nuevos, ids_destino = copiar(conn_sql, cursor, anio, desde_id, tamano_lote)
+    copiado = control_destino(conn_pg, ids_destino, tamano_lote)
+    en_origen = contar_origen(conn_sql, anio, desde_id, ultimo_id)
+
+    if copiado != nuevos or en_origen != nuevos.registros:
+        conn_pg.rollback()
+        cursor.close()
+        print(f"\n✗ La verificación falló: origen {nuevos} ({en_origen:,} en SQL Server), "
+              f"copia {copiado}")
+        return None
+
+    total = SumaControl(acumulado.registros + nuevos.registros,
+                        (acumulado.huella + nuevos.huella) % _MODULO)
+    guardar_estado(cursor, anio, ultimo_id, total)
+    conn_pg.commit()
+    cursor.close()
+    print(f"  ✓ {nuevos.registros:,} registros copiados y verificados ({nuevos})")
+    return ultimo_id, total
+
+# ============================================================
+# BORRADO EN EL ORIGEN
+# ============================================================
+
+def borrar_origen(conn_sql, anio, hasta_id, lote=LOTE_BORRADO) -> int:
+    """
+    Borra de SQL Server las filas del año con id <= hasta_id en lotes
+    pequeños, con un commit por lote. Cada lote se resta del resumen en
+    la misma transacción (OUTPUT devuelve las filas borradas).
+    """
+    columnas = ', '.join(f"deleted.{c.strip()}" for c in COLUMNAS_DESTINO.split(','))
+    cursor = conn_sql.cursor()
+    borrados = 0
+    while True:
+        cursor.execute(f"DELETE TOP ({int(lote)}) FROM CreditosActuales "
+                       f"OUTPUT {columnas} "
+                       f"WHERE anio = ? AND id <= ?", anio, hasta_id)
+        filas = cursor.fetchall()
+        if not filas:
+            break
+        aplicar_delta(cursor, MOTOR_SQL, filas, signo=-1)
+        conn_sql.commit()
+        borrados += len(filas)
+        print(f"  ✓ {borrados:,} registros borrados de SQL Server...", end='\r')
+    borrar_anio(cursor, MOTOR_SQL, anio)
+    conn_sql.commit()
+    cursor.close()
+    return borrados
+
+# ============================================================
+# TRASPASO
+# ============================================================
+
+def traspasar_anio(anio, tamano_lote=10000, espera=None):
+    """
+    Mueve un año cerrado de SQL Server a PostgreSQL en línea.
+
+    Args:
+        anio: Año a traspasar (debe estar asignado a SQL Server o a medio traspasar)
+        tamano_lote: Filas por bloque leído e insertado
+        espera: Segundos entre el cambio de mapa y el borrado; por defecto el
+                doble del intervalo de revisión del mapa
+
+    Returns:
+        bool: True si el año quedó completo en PostgreSQL
+    """
+    print("\n" + "="*80)
+    print(f"TRASPASO DEL AÑO {anio}: SQL SERVER → POSTGRESQL")
+    print("="*80)
+
+    origen = MAPA_PARTICIONES.particion_de_motor(MOTOR_SQLSERVER)
+    destino = MAPA_PARTICIONES.particion_de_motor(MOTOR_POSTGRESQL)
+    particion = MAPA_PARTICIONES.particion_de(anio)
+    if particion not in (origen, destino) or origen is None or destino is None:
+        print(f"✗ El año {anio} no pertenece a {origen} ni a {destino}")
+        return False
+
+    conn_pg = conectar_postgresql(CONFIG_PG_HISTORICO)
+    if not conn_pg:
+        return False
+
+    conn_sql = conectar_sqlserver()
+    if not conn_sql:
+        return False
+
+    cursor = conn_pg.cursor()
+    cursor.execute(DDL_TRASPASO)
+    conn_pg.commit()
+    cursor.close()
+    asegurar_resumen(conn_pg, MOTOR_PG)
+    asegurar_resumen(conn_sql, MOTOR_SQL)
+
+    estado = leer_estado(conn_pg, anio)
+
+    if particion == origen:
+        # Fases 1-2: una copia previa sin cambio de mapa no es visible; se rehace
+        print(f"\n→ Copiando {contar_origen(conn_sql, anio):,} registros a {destino}...")
+        resultado = copiar_y_verificar(conn_sql, conn_pg, anio, 0, SumaControl(),
+                                       tamano_lote, reemplazar=True)
+        if resultado is None:
+            return False
+        ultimo_id, control = resultado
+
+        # Fase 3
+        MAPA_PARTICIONES.guardar(MAPA_PARTICIONES.mover_anio(anio, destino))
+        print(f"  ✓ Mapa de particiones actualizado: {anio} → {destino}")
+    elif estado is None:
+        print(f"✗ El año {anio} ya está en {destino} y no tiene un traspaso registrado")
+        return False
+    else:
+        ultimo_id, control, completo = estado
+        if completo:
+            print(f"  Año {anio}: traspaso ya completado ({control})")
+            return True
+        print(f"  Año {anio}: retomando traspaso ({control})")
+
+    # Fase 4: dar tiempo a que los demás procesos recarguen el mapa
+    espera = MAPA_PARTICIONES.revisar_cada * 2 if espera is None else espera
+    print(f"\n→ Esperando {espera:.0f}s a que los procesos tomen el nuevo mapa...")
+    time.sleep(espera)
+
+    # Fases 4-5: hasta que no queden filas del año en SQL Server
+    while True:
+        resultado = copiar_y_verificar(conn_sql, conn_pg, anio, ultimo_id, control, tamano_lote)
+        if resultado is None:
+            return False
+        ultimo_id, control = resultado
+
+        print(f"\n→ Borrando el año {anio} de {origen}...")
+        borrados = borrar_origen(conn_sql, anio, ultimo_id)
+        print(f"  ✓ {borrados:,} registros borrados de {origen}          ")
+
+        restantes = contar_origen(conn_sql, anio)
+        if not restantes:
+            break
+        print(f"  {restantes:,} registros llegaron durante el borrado; copiando...")
+
+    cursor = conn_pg.cursor()
+    guardar_estado(cursor, anio, ultimo_id, control, completo=True)
+    conn_pg.commit()
+    cursor.close()
+
+    conn_pg.close()
+    conn_sql.close()
+
+    print(f"\n✓ TRASPASO COMPLETADO: {control} en {destino}")
+    return True
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or not sys.argv[1].isdigit():
+        print("Uso: python traspaso_anio.py <año>")
+        sys.exit(1)
+    if not traspasar_anio(int(sys.argv[1])):
+        print("\n✗ El traspaso falló")
+        sys.exit(1)